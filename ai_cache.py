@@ -0,0 +1,157 @@
+"""
+ai_cache.py — Cache of Gemini answers, keyed on the normalised question
+Most ai_mode questions are repeats ("what is the interest rate?"). A hit
+answers in microseconds and saves one of the 1,500 free requests/month.
+
+    • LRU + TTL eviction with a hard size cap
+    • Tied to a content version — when PRODUCT_INFO changes, call
+      cache.set_version(content_version(PRODUCT_INFO)) and old answers are dropped
+    • Optional SQLite file so the cache survives restarts
+
+Tuning (environment variables):
+    AI_CACHE_MAX   → Answers kept in memory          (default 1000)
+    AI_CACHE_TTL   → Seconds an answer stays valid   (default 86400)
+    AI_CACHE_PATH  → SQLite file for persistence     (default: off)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlite_db import SQLiteDB
+
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """'What is the  Interest rate??' → 'what is the interest rate'"""
+    return _SPACE.sub(" ", _PUNCT.sub(" ", text.lower())).strip()
+
+
+def content_version(*sources) -> str:
+    """Short stable hash of the bot's knowledge (dicts/strings)."""
+    blob = json.dumps(sources, sort_keys=True, ensure_ascii=False).encode()
+    return hashlib.sha1(blob).hexdigest()[:12]
+
+
+AI_CACHE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ai_cache (
+        key        TEXT PRIMARY KEY,
+        answer     TEXT NOT NULL,
+        version    TEXT NOT NULL,
+        stored_at  REAL NOT NULL
+    );
+"""
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1000, ttl: float = 86400,
+                 path: str | None = None, version: str = ""):
+        self.max_entries = max(1, max_entries)
+        self.ttl     = ttl
+        self.path    = path
+        self.version = version
+        # key → (answer, stored_at); least recently used first
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock   = threading.Lock()
+        self._db     = SQLiteDB(path, AI_CACHE_SCHEMA, timeout=5) if path else None
+        self._loaded = path is None
+        self.hits    = 0
+        self.misses  = 0
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+    def _load(self):
+        # Called with the lock held, once, on first use
+        self._loaded = True
+        try:
+            db = self._db.conn()
+            db.execute("DELETE FROM ai_cache WHERE version != ? OR stored_at < ?",
+                       (self.version, time.time() - self.ttl))
+            rows = db.execute(
+                "SELECT key, answer, stored_at FROM ai_cache"
+                " ORDER BY stored_at DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️  AI cache load error: {e}")
+            return
+        for key, answer, stored_at in reversed(rows):
+            self._entries[key] = (answer, stored_at)
+        if rows:
+            print(f"💾 Loaded {len(rows)} cached AI answer(s)")
+
+    # ── Cache API ────────────────────────────────────────────────────────────
+    def get(self, question: str) -> str | None:
+        key = normalize(question)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            item = self._entries.get(key)
+            if item is not None and time.time() - item[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, answer: str):
+        key = normalize(question)
+        if not key or not answer:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (answer, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path:
+                try:
+                    self._db.conn().execute(
+                        "INSERT OR REPLACE INTO ai_cache (key, answer, version, stored_at)"
+                        " VALUES (?, ?, ?, ?)", (key, answer, self.version, now))
+                except sqlite3.Error as e:
+                    print(f"⚠️  AI cache write error: {e}")
+
+    def invalidate(self):
+        """Forget every cached answer (memory and disk)."""
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                self._db.conn().execute("DELETE FROM ai_cache")
+
+    def set_version(self, version: str):
+        """New knowledge version → answers from the old one are dropped."""
+        with self._lock:
+            if version == self.version:
+                return
+            if not self._loaded:
+                # Rows from other versions are dropped when the file is loaded
+                self.version = version
+                return
+            self.version = version
+        self.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries":  len(self._entries),
+                "hits":     self.hits,
+                "misses":   self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "version":  self.version,
+            }
+
+
+ai_cache = ResponseCache(
+    max_entries = int(os.getenv("AI_CACHE_MAX", 1000)),
+    ttl         = float(os.getenv("AI_CACHE_TTL", 86400)),
+    path        = os.getenv("AI_CACHE_PATH") or None,
+)
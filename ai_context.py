@@ -0,0 +1,144 @@
+"""
+ai_context.py — Bounded per-customer conversation memory for Gemini prompts
+Each phone keeps a small ring of recent question/answer turns. When the turns
+outgrow the token budget, the oldest are folded into a one-line running
+summary, so every prompt stays roughly the same (small) size and Gemini's
+latency stays predictable. No system instruction is added here, so the
+part of every prompt that precedes the customer's turns can stay fixed.
+Reusing that instruction as a cached prefix is NOT done in this tree: it
+belongs in gemini_ai.py (where the model and its instruction are set up),
+which is not part of this repository.
+
+Memory is capped: idle conversations expire, and past the cap the least
+recently active conversation is dropped.
+
+Tuning (environment variables):
+    AI_CONTEXT_TOKENS          → Token budget for recent turns       (default 600)
+    AI_CONTEXT_SUMMARY_TOKENS  → Token budget for the summary line   (default 120)
+    AI_CONTEXT_MAX             → Conversations kept in memory        (default 5000)
+    AI_CONTEXT_TTL             → Seconds idle before a conversation is forgotten (default 1800)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def _first_sentence(text: str, limit: int = 80) -> str:
+    text = " ".join(text.split())
+    for stop in ".?!":
+        i = text.find(stop)
+        if 0 < i < limit:
+            return text[: i + 1]
+    return text[:limit].rstrip() + ("…" if len(text) > limit else "")
+
+
+class Conversation:
+    __slots__ = ("turns", "tokens", "summary", "touched")
+
+    def __init__(self):
+        self.turns: deque[tuple[str, str, int]] = deque()   # (question, answer, tokens)
+        self.tokens  = 0
+        self.summary = ""
+        self.touched = time.monotonic()
+
+
+class ConversationStore:
+    def __init__(self, token_budget: int = 600, summary_tokens: int = 120,
+                 max_conversations: int = 5000, ttl: float = 1800):
+        self.token_budget      = token_budget
+        self.summary_tokens    = summary_tokens
+        self.max_conversations = max(1, max_conversations)
+        self.ttl               = ttl
+        # phone → Conversation; least recently active first
+        self._convos: OrderedDict[str, Conversation] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, phone: str) -> Conversation | None:
+        convo = self._convos.get(phone)
+        if convo is not None and time.monotonic() - convo.touched >= self.ttl:
+            del self._convos[phone]
+            return None
+        return convo
+
+    def prompt(self, phone: str, question: str) -> str:
+        """The question as-is for a new conversation, else summary + recent turns + question."""
+        with self._lock:
+            convo = self._get(phone)
+            if convo is None or not (convo.turns or convo.summary):
+                return question
+            lines = ["Conversation so far with this customer:"]
+            if convo.summary:
+                lines.append(f"(Earlier: {convo.summary})")
+            for q, a, _ in convo.turns:
+                lines.append(f"Customer: {q}")
+                lines.append(f"You: {a}")
+        lines.append("")
+        lines.append(f"Customer's new message: {question}")
+        return "\n".join(lines)
+
+    def add_turn(self, phone: str, question: str, answer: str):
+        # One long answer may use at most half the budget
+        answer = answer[: self.token_budget * 2]
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        now = time.monotonic()
+        with self._lock:
+            convo = self._get(phone)
+            if convo is None:
+                convo = self._convos[phone] = Conversation()
+            convo.touched = now
+            self._convos.move_to_end(phone)
+
+            convo.turns.append((question, answer, tokens))
+            convo.tokens += tokens
+            # Over budget → fold the oldest turns into the summary
+            while convo.tokens > self.token_budget and len(convo.turns) > 1:
+                old_q, _, old_tokens = convo.turns.popleft()
+                convo.tokens -= old_tokens
+                self._summarise(convo, old_q)
+
+            self._evict(now)
+
+    def _summarise(self, convo: Conversation, question: str):
+        topic = _first_sentence(question)
+        summary = f"{convo.summary}; asked: {topic}" if convo.summary else f"asked: {topic}"
+        # Keep the newest topics when the summary itself outgrows its budget
+        while estimate_tokens(summary) > self.summary_tokens and "; " in summary:
+            summary = summary.split("; ", 1)[1]
+        convo.summary = summary[: self.summary_tokens * 4]
+
+    def _evict(self, now: float):
+        # Called with the lock held. Oldest-touched first, so stop at the
+        # first one that is still fresh and within the cap.
+        while self._convos:
+            phone, convo = next(iter(self._convos.items()))
+            if len(self._convos) <= self.max_conversations and now - convo.touched < self.ttl:
+                break
+            del self._convos[phone]
+
+    def forget(self, phone: str):
+        with self._lock:
+            self._convos.pop(phone, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            convos = list(self._convos.values())
+        return {
+            "conversations": len(convos),
+            "turns":         sum(len(c.turns) for c in convos),
+            "tokens":        sum(c.tokens + estimate_tokens(c.summary) for c in convos),
+        }
+
+
+conversations = ConversationStore(
+    token_budget      = int(os.getenv("AI_CONTEXT_TOKENS", 600)),
+    summary_tokens    = int(os.getenv("AI_CONTEXT_SUMMARY_TOKENS", 120)),
+    max_conversations = int(os.getenv("AI_CONTEXT_MAX", 5000)),
+    ttl               = float(os.getenv("AI_CONTEXT_TTL", 1800)),
+)
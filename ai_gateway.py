@@ -0,0 +1,174 @@
+"""
+ai_gateway.py — Guard rails around the upstream Gemini call
+    • Single-flight: identical (normalised) questions already in flight share
+      ONE upstream call — a marketing push no longer burns quota N times
+    • Global cap on concurrent Gemini calls
+    • Per-call deadline: past it the caller gets None (→ canned reply) while
+      the upstream call finishes in the background and still fills the cache
+
+AsyncGeminiGateway applies the same rules on an event loop (asgi.py).
+
+Tuning (environment variables):
+    GEMINI_MAX_CONCURRENT → Gemini calls allowed at once   (default 4)
+    GEMINI_DEADLINE       → Seconds a customer waits       (default 8)
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable
+
+from ai_cache import normalize
+
+
+class _Flight:
+    __slots__ = ("done", "result", "cacheable")
+
+    def __init__(self, cacheable: bool):
+        self.done      = threading.Event()
+        self.result    = None
+        self.cacheable = cacheable
+
+
+class GeminiGateway:
+    def __init__(self, ask: Callable, max_concurrent: int = 4, deadline: float = 8.0,
+                 on_result: Callable | None = None):
+        """
+        ask(phone, question) → answer     the real upstream call
+        on_result(question, answer)       called for every successful cacheable answer
+        """
+        self._ask       = ask
+        self.deadline   = deadline
+        self.on_result  = on_result
+        self._slots     = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._flights: dict[str, _Flight] = {}
+        self._lock      = threading.Lock()
+
+        self.calls      = 0      # upstream calls made
+        self.coalesced  = 0      # callers that joined an existing flight
+        self.timeouts   = 0      # callers that gave up at the deadline
+        self.errors     = 0      # upstream calls that raised
+        self.wait_total = 0.0    # seconds spent waiting for a free slot
+        self.wait_max   = 0.0
+
+    def ask(self, phone: str, question: str, cacheable: bool = True) -> str | None:
+        """
+        The answer, or None if it failed or missed the deadline.
+        cacheable=False for prompts carrying one customer's conversation history.
+        """
+        key = normalize(question)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(cacheable)
+            else:
+                self.coalesced += 1
+
+        if leader:
+            threading.Thread(target=self._fly, args=(key, flight, phone, question),
+                             name="gemini-call", daemon=True).start()
+
+        if flight.done.wait(self.deadline):
+            return flight.result
+        with self._lock:
+            self.timeouts += 1
+        print(f"⏰ Gemini deadline ({self.deadline:g}s) exceeded for {phone}")
+        return None
+
+    def _fly(self, key: str, flight: _Flight, phone: str, question: str):
+        start = time.monotonic()
+        try:
+            # Nobody is waiting any more once the deadline has passed
+            if not self._slots.acquire(timeout=self.deadline):
+                return
+            waited = time.monotonic() - start
+            with self._lock:
+                self.calls      += 1
+                self.wait_total += waited
+                self.wait_max    = max(self.wait_max, waited)
+            try:
+                flight.result = self._ask(phone, question)
+            finally:
+                self._slots.release()
+            if flight.result and flight.cacheable and self.on_result is not None:
+                self.on_result(question, flight.result)
+        except Exception as e:
+            flight.result = None
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️  Gemini error: {e}")
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls":       self.calls,
+                "coalesced":   self.coalesced,
+                "timeouts":    self.timeouts,
+                "errors":      self.errors,
+                "in_flight":   len(self._flights),
+                "wait_avg_ms": round(1000 * self.wait_total / self.calls, 2) if self.calls else 0.0,
+                "wait_max_ms": round(1000 * self.wait_max, 2),
+            }
+
+
+class AsyncGeminiGateway(GeminiGateway):
+    """
+    ask is a coroutine function here: await ask(phone, question) → answer.
+    A flight is an asyncio task; callers wait on it (shielded, so a caller
+    giving up at the deadline never cancels the upstream call).
+    """
+
+    def __init__(self, ask: Callable, max_concurrent: int = 4, deadline: float = 8.0,
+                 on_result: Callable | None = None):
+        super().__init__(ask, max_concurrent, deadline, on_result)
+        self._slots = asyncio.Semaphore(max(1, max_concurrent))
+
+    async def ask(self, phone: str, question: str, cacheable: bool = True) -> str | None:
+        key = normalize(question)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.get_running_loop().create_task(
+                self._fly(key, phone, question, cacheable))
+        else:
+            with self._lock:
+                self.coalesced += 1
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), self.deadline)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            print(f"⏰ Gemini deadline ({self.deadline:g}s) exceeded for {phone}")
+            return None
+
+    async def _fly(self, key: str, phone: str, question: str, cacheable: bool) -> str | None:
+        start = time.monotonic()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.deadline)
+            except asyncio.TimeoutError:
+                return None
+            waited = time.monotonic() - start
+            with self._lock:
+                self.calls      += 1
+                self.wait_total += waited
+                self.wait_max    = max(self.wait_max, waited)
+            try:
+                result = await self._ask(phone, question)
+            finally:
+                self._slots.release()
+            if result and cacheable and self.on_result is not None:
+                self.on_result(question, result)
+            return result
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️  Gemini error: {e}")
+            return None
+        finally:
+            self._flights.pop(key, None)
@@ -3,12 +3,55 @@ Xtenda Finance WhatsApp AI Bot
 Stack: Python + Flask + Meta Cloud API + Gemini AI + Google Sheets
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
 from dotenv import load_dotenv
-from bot_flow import handle_message
 
-load_dotenv()
+load_dotenv()   # before local imports — they read their config from env
+
+import metrics
+from ingest import batch_stats, dispatch_batch, track_statuses
+from delivery import delivery
+from dispatcher import dispatcher
+from dedup import dedup
+from whatsapp import http_stats, outbox, scheduler, warm_connections
+from warmup import WARMUP_CONNECTIONS, import_module, warmup
+from ai_cache import ai_cache
+from ai_context import conversations
+from bot_flow import gemini, lead_spool, store
+from media import media_store
+
+# Deliver / save anything left over from before a restart
+if outbox is not None:
+    outbox.start()
+if lead_spool is not None:
+    lead_spool.start()
+
+# Warm connections and the Google clients in the background — see warmup.py
+warmup.add("graph_api", lambda: warm_connections(WARMUP_CONNECTIONS))
+warmup.add("gemini", import_module("gemini_ai"))
+warmup.add("sheets", import_module("sheets"))
+warmup.start()
+
+# Existing stats() exposed as gauges on /metrics (read at scrape time only)
+metrics.collect("webhook", lambda: batch_stats)
+metrics.collect("dispatcher", dispatcher.stats)
+metrics.collect("dedup", dedup.stats)
+metrics.collect("sessions", store.stats)
+metrics.collect("whatsapp_http", http_stats)
+if scheduler is not None:
+    metrics.collect("outbound", scheduler.stats)
+if outbox is not None:
+    metrics.collect("outbox", outbox.stats)
+metrics.collect("ai_cache", ai_cache.stats)
+metrics.collect("gemini", gemini.stats)
+metrics.collect("ai_context", conversations.stats)
+if lead_spool is not None:
+    metrics.collect("lead_spool", lead_spool.stats)
+metrics.collect("delivery", delivery.stats)
+if media_store is not None:
+    metrics.collect("media", media_store.stats)
+metrics.collect("warmup", warmup.stats)
 
 app = Flask(__name__)
 
@@ -31,46 +74,40 @@ def verify_webhook():
 # ── Receive Incoming WhatsApp Messages ─────────────────────────────────────
 @app.route("/webhook", methods=["POST"])
 def receive_message():
-    data = request.get_json()
+    with metrics.stage("webhook"):
+        data = request.get_json(silent=True) or {}
 
-    try:
-        entry   = data["entry"][0]
-        changes = entry["changes"][0]["value"]
+        # Walk every entry / change / message — Meta batches deliveries under load.
+        counts = dispatch_batch(data)
+        # Delivered / read receipts for our own messages → delivery latency
+        track_statuses(data)
 
-        # Ignore status updates (delivered, read receipts)
-        if "messages" not in changes:
-            return jsonify({"status": "ok"}), 200
+    # If the pool is saturated, 503 makes Meta redeliver later
+    if counts["rejected"]:
+        print(f"🚦 Dispatcher full — deferred {counts['rejected']} message(s)")
+        return jsonify({"status": "busy"}), 503
 
-        message = changes["messages"][0]
-        contact = changes["contacts"][0]
+    return jsonify({"status": "ok"}), 200
 
-        phone_number = message["from"]          # e.g. 260971234567
-        display_name = contact["profile"]["name"]
-        msg_type     = message["type"]
 
-        # Extract text — handles regular text AND button/list replies
-        if msg_type == "text":
-            user_text = message["text"]["body"].strip()
-        elif msg_type == "interactive":
-            interactive = message["interactive"]
-            if interactive["type"] == "button_reply":
-                user_text = interactive["button_reply"]["id"]
-            elif interactive["type"] == "list_reply":
-                user_text = interactive["list_reply"]["id"]
-            else:
-                user_text = ""
-        else:
-            user_text = ""
+# ── Health: liveness + warm-up readiness ───────────────────────────────────
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok", **warmup.stats()}), 200
 
-        print(f"📩 From {display_name} ({phone_number}): {user_text}")
 
-        # Hand off to bot logic
-        handle_message(phone_number, display_name, user_text)
+@app.route("/ready", methods=["GET"])
+def ready():
+    status = warmup.stats()
+    return jsonify(status), 200 if status["ready"] else 503
 
-    except (KeyError, IndexError) as e:
-        print(f"⚠️  Parse error: {e}")
 
-    return jsonify({"status": "ok"}), 200
+# ── Prometheus metrics (METRICS_ENABLED=0 turns this off) ──────────────────
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    if not metrics.ENABLED:
+        return "Not Found", 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
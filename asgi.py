@@ -0,0 +1,159 @@
+"""
+asgi.py — Async entry point: the same bot on one event loop
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+app.py (Flask + dispatcher threads) suits small deployments: concurrency is
+gunicorn workers × threads, each mostly idle waiting on the Graph API or
+Gemini. Here every conversation is a task — waiting costs no thread, so one
+process holds thousands of conversations at once:
+
+    webhook → async_dispatcher (per-sender order) → handle_message_async
+            → whatsapp_async (pooled httpx client) / gemini_async
+
+Same routes as app.py: GET/POST /webhook, /healthz, /ready and /metrics.
+Sessions, dedup, outbox, lead spool, caches, warm-up and metrics are shared
+code and settings; the async connection pool is warmed at startup as well.
+
+Plain ASGI — no web framework needed. Requires httpx and uvicorn.
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+# First: load_dotenv, outbox / lead spool / warm-up start, shared /metrics collectors
+from app import VERIFY_TOKEN
+
+import metrics
+import whatsapp_async
+from bot_flow import gemini_async, handle_document_async, handle_message_async, lead_spool
+from dispatcher import async_dispatcher
+from ingest import dispatch_batch, track_statuses
+from warmup import WARMUP_CONNECTIONS, warmup
+
+SHUTDOWN_TIMEOUT = 10     # seconds to finish queued messages on shutdown
+
+_background: set[asyncio.Task] = set()    # the loop only keeps weak references
+
+warmup.add("graph_api_async")      # run on the event loop at startup
+
+metrics.collect("async_dispatcher", async_dispatcher.stats)
+metrics.collect("gemini_async", gemini_async.stats)
+if whatsapp_async.scheduler is not None:
+    metrics.collect("async_outbound", whatsapp_async.scheduler.stats)
+
+if lead_spool is None:
+    # Without the spool every lead is a blocking Sheets call on the event loop
+    print("⚠️  LEAD_SPOOL_PATH is empty — leads will be saved to Sheets inline, "
+          "stalling the event loop")
+
+
+async def _respond(send, status: int, body, content_type: str = "application/json"):
+    if isinstance(body, dict):
+        body = json.dumps(body)
+    if isinstance(body, str):
+        body = body.encode()
+    await send({
+        "type":    "http.response.start",
+        "status":  status,
+        "headers": [(b"content-type", content_type.encode()),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+# ── Webhook Verification (Meta requires this on setup) ─────────────────────
+async def verify_webhook(scope, send):
+    args      = parse_qs(scope.get("query_string", b"").decode())
+    mode      = args.get("hub.mode", [None])[0]
+    token     = args.get("hub.verify_token", [None])[0]
+    challenge = args.get("hub.challenge", [""])[0]
+
+    if mode == "subscribe" and token == VERIFY_TOKEN:
+        print("✅ Webhook verified!")
+        return await _respond(send, 200, challenge, "text/plain")
+    await _respond(send, 403, "Forbidden", "text/plain")
+
+
+# ── Receive Incoming WhatsApp Messages ─────────────────────────────────────
+async def receive_message(receive, send):
+    body = await _read_body(receive)
+    with metrics.stage("webhook"):
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+
+        counts = dispatch_batch(data, async_dispatcher, handle_message_async,
+                                handle_document_async)
+        track_statuses(data)
+
+    if counts["rejected"]:
+        print(f"🚦 Dispatcher full — deferred {counts['rejected']} message(s)")
+        return await _respond(send, 503, {"status": "busy"})
+    await _respond(send, 200, {"status": "ok"})
+
+
+async def healthz(send):
+    await _respond(send, 200, {"status": "ok", **warmup.stats()})
+
+
+async def ready(send):
+    status = warmup.stats()
+    await _respond(send, 200 if status["ready"] else 503, status)
+
+
+async def prometheus_metrics(send):
+    if not metrics.ENABLED:
+        return await _respond(send, 404, "Not Found", "text/plain")
+    await _respond(send, 200, metrics.render(), "text/plain; version=0.0.4")
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            print("⚡ Async mode — one event loop, pooled async Graph API client")
+            await send({"type": "lifespan.startup.complete"})
+            # In the background — the server is taking requests meanwhile
+            task = asyncio.get_running_loop().create_task(warmup.run_async(
+                "graph_api_async", lambda: whatsapp_async.warm_connections(WARMUP_CONNECTIONS)))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+        elif message["type"] == "lifespan.shutdown":
+            await async_dispatcher.join(SHUTDOWN_TIMEOUT)
+            await whatsapp_async.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"], scope["method"]
+    if path == "/webhook" and method == "POST":
+        await receive_message(receive, send)
+    elif path == "/webhook" and method == "GET":
+        await verify_webhook(scope, send)
+    elif path == "/healthz" and method == "GET":
+        await healthz(send)
+    elif path == "/ready" and method == "GET":
+        await ready(send)
+    elif path == "/metrics" and method == "GET":
+        await prometheus_metrics(send)
+    else:
+        await _respond(send, 404, "Not Found", "text/plain")
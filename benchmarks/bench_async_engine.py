@@ -0,0 +1,88 @@
+"""
+bench_async_engine.py — How many conversations one event loop holds at once
+Drives bot_flow.handle_message_async directly (no HTTP server, no driver
+threads) for N customers at the same moment. The Graph API call is replaced
+by an awaited sleep of --graph-latency seconds, so what is measured is the
+engine: routing, sessions, capture, scheduler, stages — and how many
+conversations can wait on the network together.
+
+Run from the project root:
+    python benchmarks/bench_async_engine.py --customers 5000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import stubs  # noqa: E402
+
+SCRIPT = ["hi", "menu_products", "prod_personal", "menu_apply", "apply_personal", "15000"]
+
+
+async def run(customers: int, graph_latency: float):
+    import bot_flow
+    import whatsapp_async
+
+    ids = itertools.count()
+    in_flight = peak = 0
+
+    async def fake_send(phone_number_id, payload):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(graph_latency)
+        in_flight -= 1
+        return 200, {"messages": [{"id": f"wamid.bench{next(ids)}"}]}
+
+    whatsapp_async._send_now = fake_send
+    if whatsapp_async.scheduler is not None:
+        whatsapp_async.scheduler._send = fake_send
+
+    async def customer(i: int):
+        phone = f"26097{i:07d}"
+        for text in SCRIPT:
+            await bot_flow.handle_message_async(phone, "Bench", text)
+
+    start = time.perf_counter()
+    cpu   = time.process_time()
+    await asyncio.gather(*(customer(i) for i in range(customers)))
+    return time.perf_counter() - start, time.process_time() - cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async engine capacity")
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--graph-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="xtenda-bench-")
+    os.environ.update({
+        "PHONE_NUMBER_ID":        "bench",
+        "OUTBOUND_RATE":          "0",       # measure the engine, not Meta's limit
+        "OUTBOX_DB_PATH":         "",
+        "LEAD_SPOOL_PATH":        os.path.join(tmp, "spool.db"),
+        "LEAD_LEDGER_PATH":       os.path.join(tmp, "leads.db"),
+        "CONSULTANT_COUNTS_PATH": "",
+    })
+    stubs.install(gemini_latency=1.0, sheets_latency=0.5)
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        # The bot logs every message
+        elapsed, cpu, peak = asyncio.run(run(args.customers, args.graph_latency))
+    messages = args.customers * len(SCRIPT)
+    print(
+        f"{args.customers} customers × {len(SCRIPT)} messages: {elapsed:.2f} s "
+        f"→ {messages / elapsed:,.0f} msg/s, {1e6 * cpu / messages:.0f} µs CPU per message, "
+        f"{peak} Graph API calls waiting at once (latency {args.graph_latency:g}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+bench_campaign.py — Bulk campaign throughput, memory and resume
+Sends to --recipients generated numbers through campaign.py against
+fake_graph.py, with OUTBOUND_RATE set to --rate:
+
+    loop          → the old way: whatsapp.send_text one blocking call at a time
+                    (first --loop recipients only)
+    campaign      → Campaign.run(), stopped half-way (as if Ctrl+C'd), then
+                    resumed from its checkpoint
+    check         → every number got exactly one message; Python memory held on
+                    the bot side after the run, which stays flat as --recipients
+                    grows (the in-process fake, which logs every send, is left out;
+                    delivery.py's receipt tracking is capped by DELIVERY_MAX_PENDING)
+
+Run from the project root:
+    python benchmarks/bench_campaign.py --recipients 20000 --rate 500
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fake_graph import FakeGraphAPI  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Campaign benchmark")
+    parser.add_argument("--recipients", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=500, help="OUTBOUND_RATE (msg/s)")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Graph API latency")
+    parser.add_argument("--loop", type=int, default=200, help="recipients for the one-at-a-time loop")
+    args = parser.parse_args()
+
+    fake = FakeGraphAPI(latency=args.latency, jitter=args.latency / 4).start()
+    tmp  = tempfile.mkdtemp(prefix="xtenda-campaign-")
+    os.environ.update({
+        "WHATSAPP_API_URL":     fake.url,
+        "PHONE_NUMBER_ID":      "bench",
+        "OUTBOUND_RATE":        str(args.rate),
+        "OUTBOUND_BURST":       str(args.workers),
+        "OUTBOUND_SENDERS":     str(args.workers),
+        "WHATSAPP_POOL_SIZE":   str(args.workers),
+        "OUTBOX_DB_PATH":       "",
+        "DELIVERY_MAX_PENDING": "1000",
+    })
+    import campaign
+    import whatsapp
+
+    path = os.path.join(tmp, "leads.csv")
+    with open(path, "w") as f:
+        f.write("phone,name\n")
+        for i in range(args.recipients):
+            f.write(f"+260 97 {i:07d},Customer {i}\n")
+    build = campaign.text_message("Hi {name}, our personal loan rates have dropped!")
+
+    quiet = open(os.devnull, "w")
+
+    # ── Before: one blocking send at a time ─────────────────────────────────
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(quiet):
+        for i in range(args.loop):
+            whatsapp.send_text(f"26098{i:07d}", "Hi, our rates have dropped!")
+    loop_rate = args.loop / (time.perf_counter() - start)
+    print(f"loop       {args.loop} sends one at a time: {loop_rate:.1f} msg/s")
+
+    # ── Campaign, stopped half-way, then resumed ─────────────────────────────
+    db = os.path.join(tmp, "leads.db")
+    tracemalloc.start()
+    first = campaign.Campaign(path, build, db, args.workers)
+
+    def stop_half_way():
+        while first.stats()["sent"] < args.recipients // 2:
+            time.sleep(0.01)
+        first.stop()
+
+    threading.Thread(target=stop_half_way, daemon=True).start()
+    with contextlib.redirect_stdout(quiet):
+        one = first.run()
+        two = campaign.Campaign(path, build, db, args.workers).run()
+    held = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, "*fake_graph.py"),
+        tracemalloc.Filter(False, "*http/server.py"),
+        tracemalloc.Filter(False, "*socketserver.py"),
+        tracemalloc.Filter(False, "*json/decoder.py"),     # the fake's per-recipient log keys
+    ])
+    held = sum(stat.size for stat in held.statistics("filename")) / 1024 / 1024
+    tracemalloc.stop()
+
+    print(f"run 1      {one['sent']:,} sent, stopped at row {one['watermark']:,}: "
+          f"{one['msgs_per_s']} msg/s")
+    print(f"run 2      {two['sent']:,} sent after resuming ({two['skipped']:,} skipped): "
+          f"{two['msgs_per_s']} msg/s   (rate limit {args.rate:g}/s, "
+          f"{two['msgs_per_s'] / loop_rate:.0f}× the loop)")
+
+    # Failed sends (e.g. the fake resetting a connection) are recorded, not retried
+    failed = one["failed"] + two["failed"]
+    sends = [len(fake.sends.get(f"26097{i:07d}", ())) for i in range(args.recipients)]
+    twice, missing = sum(n > 1 for n in sends), sum(n == 0 for n in sends) - failed
+    print(f"check      {args.recipients:,} recipients: {missing} missed, {twice} sent twice, "
+          f"{failed} failed (in the results); {held:.1f} MB held by the bot side")
+    fake.stop()
+    if twice or missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
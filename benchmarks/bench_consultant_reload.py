@@ -0,0 +1,112 @@
+"""
+bench_consultant_reload.py — Consultant lookups don't slow down during reloads
+Points CONSULTANTS_FILE at a temporary JSON copy of the directory, then times
+get_towns / get_branches / find_consultant / assign_consultant:
+    1. with the file left alone
+    2. while another thread rewrites the file (atomic rename) as fast as it can
+       and the watcher rebuilds and swaps the index every few milliseconds
+It also checks that no lookup ever saw a missing or half-built directory.
+p50/p99 are the numbers to watch; "max" includes GIL pauses from the writer
+and watcher threads, which share this process.
+
+Run from the project root:
+    python benchmarks/bench_consultant_reload.py [seconds_per_phase]
+"""
+
+import importlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["CONSULTANT_COUNTS_PATH"] = ""
+import consultants  # noqa: E402
+
+# The built-in table becomes the file content; re-import with the file in use
+CONSULTANTS = consultants.CONSULTANTS
+FILE = os.path.join(tempfile.mkdtemp(), "consultants.json")
+with open(FILE, "w", encoding="utf-8") as f:
+    json.dump(CONSULTANTS, f, ensure_ascii=False)
+os.environ["CONSULTANTS_FILE"]            = FILE
+os.environ["CONSULTANTS_RELOAD_INTERVAL"] = "0.005"
+consultants = importlib.reload(consultants)
+
+KEYS = [(p, t, b) for p, towns in CONSULTANTS.items()
+        for t, branches in towns.items() for b in branches]
+PHONES = [c["phone"] for towns in CONSULTANTS.values() for branches in towns.values()
+          for people in branches.values() for c in people]
+
+
+def writer(stop: threading.Event):
+    # Rewrites the file with a rename, alternating an extra consultant in/out
+    n = 0
+    while not stop.is_set():
+        n += 1
+        directory = json.loads(json.dumps(CONSULTANTS))
+        if n % 2:
+            p, t, b = KEYS[0]
+            directory[p][t][b].append({"name": "Temp Staff", "phone": f"26097999{n:04d}"})
+        tmp = FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(directory, f, ensure_ascii=False)
+        os.replace(tmp, FILE)
+        time.sleep(0.002)
+
+
+def measure(seconds: float) -> dict[str, list[float]]:
+    samples = {"get_towns": [], "get_branches": [], "find_consultant": [], "assign_consultant": []}
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        p, t, b = KEYS[i % len(KEYS)]
+        phone   = PHONES[i % len(PHONES)]
+        i += 1
+        s0 = time.perf_counter()
+        towns = consultants.get_towns(p)
+        s1 = time.perf_counter()
+        branches = consultants.get_branches(p, t)
+        s2 = time.perf_counter()
+        person = consultants.find_consultant(phone)
+        s3 = time.perf_counter()
+        chosen = consultants.assign_consultant(p, t, b)
+        s4 = time.perf_counter()
+        if t not in towns or b not in branches or person is None or chosen is None:
+            raise SystemExit(f"❌ Inconsistent directory seen at lookup {i}")
+        samples["get_towns"].append(s1 - s0)
+        samples["get_branches"].append(s2 - s1)
+        samples["find_consultant"].append(s3 - s2)
+        samples["assign_consultant"].append(s4 - s3)
+    return samples
+
+
+def report(title: str, samples: dict[str, list[float]]):
+    print(f"\n{title}")
+    print(f"  {'lookup':<18} {'calls':>9} {'p50 µs':>8} {'p99 µs':>8} {'max µs':>9}")
+    for name, values in samples.items():
+        q = statistics.quantiles(values, n=100)
+        print(f"  {name:<18} {len(values):>9,} {q[49] * 1e6:>8.2f} {q[98] * 1e6:>8.2f}"
+              f" {max(values) * 1e6:>9.1f}")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    consultants.get_provinces()          # starts the watcher
+    report("Steady directory", measure(seconds))
+
+    stop = threading.Event()
+    thread = threading.Thread(target=writer, args=(stop,), daemon=True)
+    reloads_before = consultants.watcher.reloads
+    thread.start()
+    samples = measure(seconds)
+    stop.set()
+    thread.join()
+    report(f"During reloads ({consultants.watcher.reloads - reloads_before} index swaps)", samples)
+
+
+if __name__ == "__main__":
+    main()
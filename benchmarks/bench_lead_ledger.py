@@ -0,0 +1,77 @@
+"""
+bench_lead_ledger.py — Lead ledger lookups stay flat as the table grows
+Fills a temporary ledger in steps up to N leads and times, at each size:
+    • record()          repeat-applicant check + insert (one transaction)
+    • recent(phone)     a phone's recent leads
+    • daily_counts()    leads per product per day for the last week
+
+Run from the project root:
+    python benchmarks/bench_lead_ledger.py [max_leads]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lead_ledger import LeadLedger, _day  # noqa: E402
+
+LOAN_TYPES = ["Personal Loan", "Business Loan", "Salary-Backed Loan",
+              "Asset Finance", "General Inquiry"]
+DAY = 86400
+
+
+def fill(ledger: LeadLedger, start: int, stop: int, now: float):
+    # Bulk load: leads spread over the last 90 days from ~20% as many phones
+    db = ledger._conn()
+    db.execute("BEGIN")
+    for i in range(start, stop):
+        ts = now - random.random() * 90 * DAY
+        db.execute(
+            "INSERT INTO leads (lead_id, phone, loan_type, day, created_at, lead)"
+            " VALUES (?, ?, ?, ?, ?, '{}')",
+            (f"b{i}", f"2609{random.randrange(stop // 5 + 1):08d}",
+             random.choice(LOAN_TYPES), _day(ts), ts),
+        )
+    db.execute("COMMIT")
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    max_leads = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = LeadLedger(os.path.join(tmp, "leads.db"))
+        week_ago = _day(now - 7 * DAY)
+        size, counter = 0, 0
+
+        print(f"{'rows':>9} {'record µs':>10} {'recent µs':>10} {'daily_counts µs':>16}")
+        for target in (1_000, 10_000, 100_000, max_leads):
+            if target > max_leads:
+                continue
+            fill(ledger, size, target, now)
+            size = target
+
+            def record():
+                nonlocal counter
+                counter += 1
+                ledger.record({"phone": f"2608{counter:08d}", "loan_type": "Personal Loan"})
+
+            def recent():
+                ledger.recent(f"2609{random.randrange(size // 5 + 1):08d}")
+
+            print(f"{size:>9,} {timed(record, 500):>10.1f} {timed(recent, 2000):>10.1f}"
+                  f" {timed(lambda: ledger.daily_counts(week_ago), 20):>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
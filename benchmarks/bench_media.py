@@ -0,0 +1,103 @@
+"""
+bench_media.py — Document uploads: memory per download and dedup
+Runs media.py's MediaStore against fake_graph.py (no WhatsApp account needed):
+
+    one large file   → peak Python memory while downloading --size-mb,
+                       streamed in chunks vs. read whole (response.content)
+    many uploads     → --uploads files from customers, only --distinct of them
+                       different (the same NRC / payslip sent again), through
+                       the bounded pool: downloads made, dedup hits, files on disk
+
+Run from the project root:
+    python benchmarks/bench_media.py --size-mb 50 --uploads 200 --distinct 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fake_graph import FakeGraphAPI  # noqa: E402
+
+
+def peak_mb(fn) -> tuple[float, float]:
+    """(seconds, peak MB allocated) for one call of fn."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Media download benchmark")
+    parser.add_argument("--size-mb", type=float, default=50, help="size of the large file")
+    parser.add_argument("--uploads", type=int, default=200, help="uploads in the dedup run")
+    parser.add_argument("--distinct", type=int, default=20, help="different files among them")
+    parser.add_argument("--upload-kb", type=int, default=512, help="size of each upload")
+    args = parser.parse_args()
+
+    fake = FakeGraphAPI(latency=0.05, jitter=0.01).start()
+    tmp  = tempfile.mkdtemp(prefix="xtenda-media-")
+    size = int(args.size_mb * 1024 * 1024)
+    os.environ.update({
+        "WHATSAPP_API_URL":      fake.url,
+        "WHATSAPP_ACCESS_TOKEN": "bench",
+        "MEDIA_DIR":             os.path.join(tmp, "media"),
+        "MEDIA_MAX_BYTES":       str(size + 1),
+        "MEDIA_MAX_PENDING":     str(args.uploads),
+    })
+    import media
+
+    store = media.media_store
+
+    # ── One large file ──────────────────────────────────────────────────────
+    fake.add_media("big", size, seed=1)
+    resolved = store.http.get(f"{fake.url}/big").json()
+
+    seconds, whole = peak_mb(lambda: store.http.get(resolved["url"]).content)
+    print(f"read whole       {args.size_mb:g} MB in {seconds:.2f} s, peak memory {whole:.1f} MB")
+
+    result = {}
+    seconds, streamed = peak_mb(lambda: result.update(store.fetch({"id": "big", "type": "document",
+                                                                   "mime_type": "application/pdf"})))
+    ok = result["sha256"] == resolved["sha256"] and os.path.getsize(result["path"]) == size
+    print(f"streamed         {args.size_mb:g} MB in {seconds:.2f} s "
+          f"({args.size_mb / seconds:.0f} MB/s), peak memory {streamed:.2f} MB "
+          f"(chunk {store.chunk_size // 1024} KB), sha256 {'ok' if ok else 'MISMATCH'}")
+
+    # ── Many uploads, few distinct ─────────────────────────────────────────
+    uploads = []
+    for i in range(args.uploads):
+        media_id = f"up{i}"
+        sha = fake.add_media(media_id, args.upload_kb * 1024, "image/jpeg", seed=100 + i % args.distinct)
+        # As in the webhook: Meta sends the hash along with the media id
+        uploads.append({"id": media_id, "type": "image", "mime_type": "image/jpeg", "sha256": sha})
+
+    before = store.stats()
+    downloads = fake.counts["media_downloads"]
+    start = time.perf_counter()
+    futures = [store.submit(u) for u in uploads]
+    stored = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    after = store.stats()
+
+    files = len([n for n in os.listdir(store.folder) if not n.startswith(".")])
+    print(f"{args.uploads} uploads ({args.distinct} distinct, {args.upload_kb} KB) in {elapsed:.2f} s "
+          f"on {store.workers} workers: "
+          f"{fake.counts['media_downloads'] - downloads} downloaded, "
+          f"{after['deduped'] - before['deduped']} deduped, "
+          f"{len({s['path'] for s in stored})} files stored ({files} in MEDIA_DIR incl. the large one)")
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
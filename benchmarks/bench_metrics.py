@@ -0,0 +1,52 @@
+"""
+bench_metrics.py — What instrumentation costs per message
+A typical message records: webhook + handler + answer stages, two sends
+(send + graph_send stages each), one state counter and two message counters.
+
+Run from the project root:
+    python benchmarks/bench_metrics.py [iterations]
+    METRICS_ENABLED=0 python benchmarks/bench_metrics.py     (the "off" cost)
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from metrics import ANSWERS, MESSAGES, SENT, stage  # noqa: E402
+
+
+def one_message():
+    with stage("webhook"):
+        pass
+    with stage("handler"):
+        MESSAGES.inc("ai_mode")
+        with stage("answer"):
+            ANSWERS.inc("faq")
+        for kind in ("ai_text", "text"):
+            SENT.inc(kind)
+            with stage("send"):
+                with stage("graph_send"):
+                    pass
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        one_message()
+    per_msg = (time.perf_counter() - start) / n * 1e6
+
+    start = time.perf_counter()
+    text = metrics.render()
+    render_ms = (time.perf_counter() - start) * 1000
+
+    state = "on" if metrics.ENABLED else "off"
+    print(f"metrics {state}: {per_msg:.2f} µs per message, "
+          f"/metrics render {render_ms:.2f} ms ({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
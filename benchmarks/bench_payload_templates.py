@@ -0,0 +1,96 @@
+"""
+bench_payload_templates.py — Per-message CPU cost of building menu payloads
+Compares the old path (build the nested dict, then JSON-encode it the way
+requests does for json=...) with the pre-serialized templates.
+
+Run from the project root:
+    python benchmarks/bench_payload_templates.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whatsapp  # noqa: E402
+
+TO   = "260971234567"
+NAME = "Chanda Mutale"
+
+
+def _requests_encode(payload: dict) -> bytes:
+    # What requests does with json=payload
+    return json.dumps(payload, allow_nan=False).encode("utf-8")
+
+
+def old_main_menu() -> bytes:
+    return _requests_encode(whatsapp._list_payload(
+        to   = TO,
+        body = (
+            f"Hello {NAME}! 👋 Welcome to *Xtenda Finance*.\n\n"
+            "We offer fast, affordable loans in Zambia 🇿🇲\n"
+            "How can we help you today?"
+        ),
+        button_label = "Choose an Option",
+        sections = [{
+            "title": "Main Menu",
+            "rows": [
+                {"id": "menu_products",    "title": "💰 Our Loan Products",   "description": "View all loan types & rates"},
+                {"id": "menu_eligibility", "title": "✅ Check Eligibility",   "description": "See if you qualify"},
+                {"id": "menu_apply",       "title": "📋 Apply / Get a Quote", "description": "Start your loan application"},
+                {"id": "menu_callback",    "title": "📞 Book a Callback",     "description": "Speak to our sales team"},
+                {"id": "menu_consultant",  "title": "📍 Find a Consultant",   "description": "Your nearest branch & consultant"},
+                {"id": "menu_ai",          "title": "❓ Ask a Question",      "description": "Ask us anything"},
+            ],
+        }],
+    ))
+
+
+def old_back_prompt() -> bytes:
+    return _requests_encode(whatsapp._buttons_payload(
+        to      = TO,
+        body    = "What would you like to do next?",
+        buttons = [
+            {"id": "menu_apply",    "title": "📋 Apply Now"},
+            {"id": "menu_callback", "title": "📞 Book Callback"},
+            {"id": "menu_main",     "title": "🔙 Main Menu"},
+        ],
+    ))
+
+
+def new_main_menu() -> bytes:
+    return whatsapp.MAIN_MENU.render(to=TO, name=NAME)
+
+
+def new_back_prompt() -> bytes:
+    return whatsapp.BACK_PROMPT_BUTTONS.render(to=TO)
+
+
+def _cpu_per_call(fn, n: int) -> float:
+    start = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - start) / n * 1e6   # µs
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    # Same message on the wire either way
+    assert json.loads(old_main_menu()) == json.loads(new_main_menu())
+    assert json.loads(old_back_prompt()) == json.loads(new_back_prompt())
+
+    print(f"{'payload':<14}{'before µs':>12}{'after µs':>12}{'speed-up':>10}")
+    for label, old, new in (
+        ("main menu",   old_main_menu,   new_main_menu),
+        ("back prompt", old_back_prompt, new_back_prompt),
+    ):
+        before = _cpu_per_call(old, n)
+        after  = _cpu_per_call(new, n)
+        print(f"{label:<14}{before:>12.2f}{after:>12.2f}{before / after:>9.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+bench_startup.py — Cold start: import time and time to first reply
+What the customer who wakes a sleeping instance waits for:
+
+    import app        → fresh interpreter, `import app` (median of --runs)
+    listening         → process start → first answer on /healthz
+    ready             → process start → /ready says 200 (warm-up finished)
+    first reply       → "hi" posted → main menu sent to the (fake) Graph API
+    first AI answer   → question posted --think seconds later → answer sent
+
+The server runs as a real subprocess (python app.py) against fake_graph.py.
+gemini_ai / sheets are stand-ins that sleep --import-delay seconds on import,
+like google-generativeai / gspread + google-auth do, so the warm-up thread's
+effect shows up: compare the WARMUP_ENABLED=1 and =0 rows.
+
+Run from the project root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --max-import-ms 600 --max-first-reply-ms 1500   (CI budget)
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from fake_graph import FakeGraphAPI  # noqa: E402
+
+HEAVY_MODULE = '''
+import time
+time.sleep({delay})      # stands in for importing + configuring the Google client
+
+
+def {fn}(*args):
+    return {result}
+'''
+
+QUESTION = "can I use a loan to buy a tractor for my farm"
+
+
+def write_stand_ins(folder: str, delay: float):
+    with open(os.path.join(folder, "gemini_ai.py"), "w") as f:
+        f.write(HEAVY_MODULE.format(delay=delay, fn="ask_gemini",
+                                    result='"(stand-in answer) Yes, see Asset Finance."'))
+    with open(os.path.join(folder, "sheets.py"), "w") as f:
+        f.write(HEAVY_MODULE.format(delay=delay, fn="save_lead", result="True"))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def base_env(tmp: str, fake_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH":             os.pathsep.join([tmp, ROOT]),
+        "WHATSAPP_API_URL":       fake_url,
+        "PHONE_NUMBER_ID":        "startup",
+        "WHATSAPP_ACCESS_TOKEN":  "startup",
+        "OUTBOX_DB_PATH":         os.path.join(tmp, "outbox.db"),
+        "LEAD_SPOOL_PATH":        os.path.join(tmp, "spool.db"),
+        "LEAD_LEDGER_PATH":       os.path.join(tmp, "leads.db"),
+        "CONSULTANT_COUNTS_PATH": os.path.join(tmp, "consultants.db"),
+    })
+    return env
+
+
+def import_time(env: dict, runs: int) -> list[float]:
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], env=env, cwd=env["PYTHONPATH"].split(os.pathsep)[0],
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def message(phone: str, text: str, msg_id: str) -> dict:
+    if text.startswith("menu_"):
+        body = {"type": "interactive",
+                "interactive": {"type": "list_reply", "list_reply": {"id": text, "title": text}}}
+    else:
+        body = {"type": "text", "text": {"body": text}}
+    body.update({"from": phone, "id": msg_id, "timestamp": str(int(time.time()))})
+    return {"entry": [{"changes": [{"field": "messages", "value": {
+        "contacts": [{"wa_id": phone, "profile": {"name": "Startup"}}], "messages": [body]}}]}]}
+
+
+def cold_start(env: dict, fake: FakeGraphAPI, think: float, warmup: bool) -> dict:
+    env  = dict(env, WARMUP_ENABLED="1" if warmup else "0", PORT=str(free_port()))
+    base = f"http://127.0.0.1:{env['PORT']}"
+    phone = f"2609{int(time.time() * 1000) % 10**8:08d}"
+    result = {}
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "app.py")], env=env,
+                            cwd=env["PYTHONPATH"].split(os.pathsep)[0],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        http = requests.Session()
+        while True:
+            try:
+                http.get(f"{base}/healthz", timeout=1)
+                break
+            except requests.ConnectionError:
+                if time.perf_counter() - start > 30:
+                    raise RuntimeError("server did not start within 30 s")
+                time.sleep(0.01)
+        result["listening_ms"] = (time.perf_counter() - start) * 1000
+
+        # The customer who woke the instance says hi straight away
+        sent = fake.sent_count(phone)
+        posted = time.perf_counter()
+        http.post(f"{base}/webhook", json=message(phone, "hi", "wamid.s1"), timeout=30)
+        first = fake.wait_for_send(phone, sent, 30)
+        result["first_reply_ms"] = (first - posted) * 1000 if first else None
+
+        # Reads the menu, taps "Ask a Question", types
+        time.sleep(think)
+        http.post(f"{base}/webhook", json=message(phone, "menu_ai", "wamid.s2"), timeout=30)
+        sent = fake.sent_count(phone) + 1
+        fake.wait_for_send(phone, sent - 1, 30)
+        time.sleep(think)
+        posted = time.perf_counter()
+        http.post(f"{base}/webhook", json=message(phone, QUESTION, "wamid.s3"), timeout=30)
+        answer = fake.wait_for_send(phone, sent, 30)
+        result["first_ai_answer_ms"] = (answer - posted) * 1000 if answer else None
+
+        while http.get(f"{base}/ready", timeout=5).status_code != 200:
+            time.sleep(0.05)
+        ready = http.get(f"{base}/ready", timeout=5).json()
+        result["warmup_steps"] = {name: step["ms"] for name, step in ready["steps"].items()}
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="fresh imports to time")
+    parser.add_argument("--import-delay", type=float, default=1.5,
+                        help="seconds each stand-in Google module takes to import")
+    parser.add_argument("--think", type=float, default=2.0,
+                        help="seconds the customer takes between messages")
+    parser.add_argument("--max-import-ms", type=float, help="fail if import app is slower")
+    parser.add_argument("--max-first-reply-ms", type=float, help="fail if the first reply is slower")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    fake = FakeGraphAPI(latency=0.05, jitter=0.0).start()
+    tmp  = tempfile.mkdtemp(prefix="xtenda-startup-")
+    write_stand_ins(tmp, args.import_delay)
+    env  = base_env(tmp, fake.url)
+
+    imports = import_time(dict(env, WARMUP_ENABLED="0"), args.runs)
+    report = {"import_app_ms": {"median": round(1000 * statistics.median(imports)),
+                                "min": round(1000 * min(imports)), "runs": len(imports)}}
+    print(f"import app          median {report['import_app_ms']['median']} ms "
+          f"(min {report['import_app_ms']['min']}, {len(imports)} runs)")
+
+    for warm in (True, False):
+        r = cold_start(env, fake, args.think, warm)
+        label = "warm-up on " if warm else "warm-up off"
+        report[label.strip().replace(" ", "_").replace("-", "")] = r
+        fmt = lambda v: "—" if v is None else f"{v:.0f} ms"   # noqa: E731
+        print(f"{label}         listening {fmt(r['listening_ms'])}, "
+              f"first reply {fmt(r['first_reply_ms'])}, "
+              f"first AI answer {fmt(r['first_ai_answer_ms'])}   steps {r['warmup_steps']}")
+    fake.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failed = []
+    if args.max_import_ms and report["import_app_ms"]["median"] > args.max_import_ms:
+        failed.append(f"import app {report['import_app_ms']['median']} ms > {args.max_import_ms:g} ms")
+    first = report["warmup_on"]["first_reply_ms"]
+    if args.max_first_reply_ms and (first is None or first > args.max_first_reply_ms):
+        failed.append(f"first reply {first} ms > {args.max_first_reply_ms:g} ms")
+    if failed:
+        print("❌ Over budget: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+eval_faq.py — Offline evaluation of the local FAQ index
+For each question in the corpus, checks whether the index answers locally,
+whether it picked the right document, and how long it took.
+
+Corpus: built-in sample below, or a TSV file with one "question<TAB>expected_id"
+per line (leave expected_id empty for questions that SHOULD go to Gemini).
+
+Run from the project root:
+    python benchmarks/eval_faq.py [corpus.tsv]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_flow import faq  # noqa: E402
+
+SAMPLE_CORPUS = [
+    ("What is the interest rate?",                   "faq_rates"),
+    ("how much interest do you charge",              "faq_rates"),
+    ("rates for business loans?",                    "prod_business"),
+    ("How long does approval take",                  "faq_approval"),
+    ("can i get approved the same day",              "faq_approval"),
+    ("What documents do I need?",                    "faq_documents"),
+    ("do i need a bank statement",                   "faq_documents"),
+    ("What are the requirements",                    "faq_documents"),
+    ("How much can I borrow?",                       "faq_amounts"),
+    ("what is the maximum amount",                   "faq_amounts"),
+    ("how many months to repay",                     "faq_terms"),
+    ("repayment period for asset finance",           "prod_asset"),
+    ("How do I apply",                               "faq_apply"),
+    ("i want to speak to a human",                   "faq_callback"),
+    ("can someone call me",                          "faq_callback"),
+    ("Am I eligible?",                               "eligibility"),
+    ("who qualifies for a loan",                     "eligibility"),
+    ("tell me about the salary backed loan",         "prod_salary"),
+    ("do you finance cars",                          "prod_asset"),
+    ("I need a loan for my shop stock",              "prod_business"),
+    ("personal loan details",                        "prod_personal"),
+    # Should fall back to Gemini
+    ("where is your office in Lusaka",               None),
+    ("are you open on sunday",                       None),
+    ("can foreigners open an account",               None),
+    ("what happens if I miss a payment",             None),
+    ("thank you so much",                            None),
+    # One shared word with the wrong document — must not be answered locally
+    ("how much is the processing fee",               None),
+    ("I want to cancel my application",              None),
+    ("is there a penalty for early settlement",      None),
+    ("my application was declined, why",             None),
+]
+
+
+def load_corpus(path: str) -> list[tuple[str, str | None]]:
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            question, _, expected = line.rstrip("\n").partition("\t")
+            corpus.append((question, expected.strip() or None))
+    return corpus
+
+
+def main():
+    corpus = load_corpus(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_CORPUS
+
+    answered = correct = wrong = missed = 0
+    timings = []
+    for question, expected in corpus:
+        start = time.perf_counter()
+        doc   = faq.answer(question)
+        timings.append(time.perf_counter() - start)
+
+        got = doc["id"] if doc else None
+        if got:
+            answered += 1
+        if got == expected:
+            correct += expected is not None
+        elif got is None:
+            missed += 1
+            print(f"  ↪ Gemini   {question!r} (expected {expected})")
+        else:
+            wrong += 1
+            print(f"  ✗ wrong    {question!r} → {got} (expected {expected})")
+
+    timings.sort()
+    n = len(corpus)
+    answerable = sum(1 for _, e in corpus if e)
+    print()
+    print(f"questions          {n}")
+    print(f"answered locally   {answered} ({answered / n:.0%} hit rate)")
+    print(f"correct            {correct}/{answerable} answerable")
+    print(f"wrong answers      {wrong}")
+    print(f"missed → Gemini    {missed}")
+    print(f"latency p50        {timings[n // 2] * 1e6:.1f} µs")
+    print(f"latency p99        {timings[min(n - 1, int(n * 0.99))] * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
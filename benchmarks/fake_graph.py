@@ -0,0 +1,257 @@
+"""
+fake_graph.py — Local stand-in for the WhatsApp Graph API
+Accepts POST /<version>/<phone_number_id>/messages like graph.facebook.com,
+waits a configurable latency, then answers 200 with a wamid — or, at the
+configured rates, a 429 (code 130429, rate limited) or a 500.
+
+Optionally posts "delivered" and "read" status webhooks back to the bot, the way Meta does,
+so delivery tracking gets load-tested as well.
+
+Uploads registered with add_media() resolve like Meta's media endpoint
+(GET /<version>/<media_id> → url, sha256, file_size) and download from /media/<id>,
+generated on the fly so a large file costs the fake no memory either.
+
+Used by loadtest.py; can also run on its own:
+    python benchmarks/fake_graph.py --port 8099 --latency 0.08
+    WHATSAPP_API_URL=http://127.0.0.1:8099/v19.0 gunicorn app:app
+"""
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+class FakeGraphAPI:
+    def __init__(self, port: int = 0, latency: float = 0.08, jitter: float = 0.04,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 status_webhook: str | None = None, delivery_delay: float = 1.0,
+                 read_delay: float = 4.0):
+        self.latency         = latency
+        self.jitter          = jitter
+        self.error_rate      = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.status_webhook  = status_webhook
+        self.delivery_delay  = delivery_delay
+        self.read_delay      = read_delay
+
+        self._ids   = itertools.count(1)
+        self._lock  = threading.Lock()
+        self._cond  = threading.Condition(self._lock)
+        self.sends: dict[str, list[float]] = {}     # recipient → send times
+        self.counts = {"ok": 0, "rate_limited": 0, "errors": 0, "statuses_posted": 0,
+                       "media_resolved": 0, "media_downloads": 0}
+        self.media: dict[str, dict] = {}     # media id → {"size", "mime_type", "seed", "sha256"}
+
+        self._statuses: list[tuple[float, int, dict]] = []   # (due, seq, status)
+        self._status_wake = threading.Event()
+        self._stopped     = threading.Event()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"      # keep-alive, like the real API
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, reply = fake._handle(self.path, body)
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                last = self.path.rsplit("/", 1)[-1]
+                if self.path.startswith("/media/") and last in fake.media:
+                    return self._stream(fake.media[last])
+                if last in fake.media:
+                    reply = fake._resolve(last)
+                else:
+                    # GET /<version>/<phone_number_id> — what the bot's warm-up calls
+                    reply = {"id": last}
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, media: dict):
+                with fake._lock:
+                    fake.counts["media_downloads"] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", media["mime_type"])
+                self.send_header("Content-Length", str(media["size"]))
+                self.end_headers()
+                for chunk in fake._media_chunks(media):
+                    self.wfile.write(chunk)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                pass         # the bot hung up mid-reply (e.g. stopped by a benchmark)
+
+        self.server = Server(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url  = f"http://127.0.0.1:{self.port}/v19.0"
+
+    # ── Request handling ────────────────────────────────────────────────────
+    def _handle(self, path: str, body: bytes) -> tuple[int, dict]:
+        if not path.endswith("/messages"):
+            return 404, {"error": {"message": "unknown path"}}
+        try:
+            payload = json.loads(body)
+            to = payload["to"]
+        except (ValueError, KeyError):
+            return 400, {"error": {"message": "bad payload", "code": 100}}
+
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            with self._lock:
+                self.counts["rate_limited"] += 1
+            return 429, {"error": {"message": "rate limit hit", "code": 130429}}
+        if roll < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.counts["errors"] += 1
+            return 500, {"error": {"message": "internal error", "code": 1}}
+
+        wamid = f"wamid.fake{next(self._ids)}"
+        with self._cond:
+            self.counts["ok"] += 1
+            self.sends.setdefault(to, []).append(time.perf_counter())
+            self._cond.notify_all()
+        if self.status_webhook:
+            self._schedule_statuses(wamid, to)
+        return 200, {"messaging_product": "whatsapp",
+                     "contacts": [{"input": to, "wa_id": to}],
+                     "messages": [{"id": wamid}]}
+
+    # ── Media ───────────────────────────────────────────────────────────────
+    def add_media(self, media_id: str, size: int, mime_type: str = "application/pdf",
+                  seed: int = 0) -> str:
+        """Register an upload of `size` bytes. Same seed + size → same bytes. Returns its sha256."""
+        media = {"size": size, "mime_type": mime_type, "seed": seed}
+        sha = hashlib.sha256()
+        for chunk in self._media_chunks(media):
+            sha.update(chunk)
+        media["sha256"] = sha.hexdigest()
+        with self._lock:
+            self.media[media_id] = media
+        return media["sha256"]
+
+    def _resolve(self, media_id: str) -> dict:
+        media = self.media[media_id]
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        with self._lock:
+            self.counts["media_resolved"] += 1
+        return {"messaging_product": "whatsapp", "id": media_id,
+                "url": f"{self.url.rsplit('/', 1)[0]}/media/{media_id}",
+                "mime_type": media["mime_type"], "sha256": media["sha256"],
+                "file_size": media["size"]}
+
+    @staticmethod
+    def _media_chunks(media: dict, chunk_size: int = 64 * 1024):
+        block = hashlib.sha256(str(media["seed"]).encode()).digest() * (chunk_size // 32)
+        left = media["size"]
+        while left > 0:
+            yield block[:min(left, chunk_size)]
+            left -= chunk_size
+
+    # ── For the driver ──────────────────────────────────────────────────────
+    def sent_count(self, to: str) -> int:
+        with self._lock:
+            return len(self.sends.get(to, ()))
+
+    def wait_for_send(self, to: str, after: int, timeout: float) -> float | None:
+        """Block until `to` has more than `after` sends; perf_counter time of the next one."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self.sends.get(to, ())) <= after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self.sends[to][after]
+
+    # ── Status webhooks back to the bot ────────────────────────────────────
+    def _schedule_statuses(self, wamid: str, to: str):
+        now = time.time()
+        with self._lock:
+            for status, delay in (("delivered", self.delivery_delay), ("read", self.read_delay)):
+                heapq.heappush(self._statuses, (now + delay, next(self._ids), {
+                    "id": wamid, "status": status, "recipient_id": to,
+                    "timestamp": str(int(now + delay)),
+                }))
+        self._status_wake.set()
+
+    def _post_statuses(self):
+        http = requests.Session()
+        while not self._stopped.is_set():
+            self._status_wake.wait(0.2)
+            self._status_wake.clear()
+            now, due = time.time(), []
+            with self._lock:
+                while self._statuses and self._statuses[0][0] <= now and len(due) < 100:
+                    due.append(heapq.heappop(self._statuses)[2])
+            if not due:
+                continue
+            body = {"object": "whatsapp_business_account",
+                    "entry": [{"changes": [{"field": "messages", "value": {"statuses": due}}]}]}
+            try:
+                http.post(self.status_webhook, json=body, timeout=10)
+                with self._lock:
+                    self.counts["statuses_posted"] += len(due)
+            except requests.RequestException as e:
+                print(f"⚠️  Fake Graph API could not post statuses: {e}")
+            self._status_wake.set()     # more may be due
+
+    def start(self) -> "FakeGraphAPI":
+        threading.Thread(target=self.server.serve_forever, name="fake-graph",
+                         daemon=True).start()
+        if self.status_webhook:
+            threading.Thread(target=self._post_statuses, name="fake-graph-statuses",
+                             daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.08, help="mean seconds per send")
+    parser.add_argument("--jitter", type=float, default=0.04)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--status-webhook", help="bot /webhook URL to post delivered/read statuses to")
+    args = parser.parse_args()
+
+    fake = FakeGraphAPI(args.port, args.latency, args.jitter, args.error_rate,
+                        args.rate_limit_rate, args.status_webhook).start()
+    print(f"🧪 Fake Graph API on {fake.url} — Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {fake.counts}")
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+loadtest.py — How many concurrent conversations can one instance take?
+Runs the real app.py in this process (threaded WSGI server, standing in for
+a gunicorn gthread worker) — or asgi.py under uvicorn with --asgi — with
+everything outside the box replaced locally:
+
+    Graph API  → fake_graph.py   (configurable latency, 429s, 500s, status webhooks)
+    Gemini     → stubs.py        (configurable latency / errors)
+    Sheets     → stubs.py        (configurable latency)
+
+Virtual customers each replay a conversation script against POST /webhook
+(default: greeting → apply flow → callback → ai_mode questions) while a
+global pacer holds the target message rate. Reported:
+    • throughput (messages/s acknowledged and fully handled)
+    • webhook-ack latency p50/p95/p99     (POST → 200)
+    • first-reply latency p50/p95/p99     (POST → first message the customer gets)
+    • handled latency p50/p95/p99         (POST → bot finished with the message)
+    • handler time per conversation state, and server-side stage averages
+
+Run from the project root:
+    python benchmarks/loadtest.py --customers 100 --concurrency 50 --rate 40
+    python benchmarks/loadtest.py --asgi --customers 2000 --concurrency 2000 --rate 400
+    python benchmarks/loadtest.py --script my_script.json --json results.json
+
+A script file is a JSON list of messages (text or button/list ids); "{name}"
+is replaced with the customer's name.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import socket
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import requests  # noqa: E402
+
+from fake_graph import FakeGraphAPI  # noqa: E402
+import stubs  # noqa: E402
+
+DEFAULT_SCRIPT = [
+    "hi",
+    "menu_apply", "apply_personal", "15000", "emp_employed", "{name}", "time_morning",
+    "menu_callback", "{name}", "time_afternoon",
+    "menu_ai", "what is the interest rate", "can I use a loan to buy a tractor for my farm",
+    "menu",
+]
+
+NAMES = ["Chanda Mutale", "Bwalya Mwape", "Mwamba Banda", "Thandiwe Moyo",
+         "Mulenga Kasonde", "Mirriam Lungu", "Joseph Ngosa", "Harriet Mutale"]
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"n": 0}
+    s = sorted(values)
+    pick = lambda q: s[min(len(s) - 1, int(len(s) * q))]   # noqa: E731
+    return {"n": len(s), "p50_ms": round(pick(0.50) * 1000, 1),
+            "p95_ms": round(pick(0.95) * 1000, 1), "p99_ms": round(pick(0.99) * 1000, 1),
+            "max_ms": round(s[-1] * 1000, 1)}
+
+
+class Pacer:
+    """Hands out send slots at `rate` per second across all customers."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next    = time.perf_counter()
+        self._lock    = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            slot = max(self._next, time.perf_counter())
+            self._next = slot + self.interval
+        delay = slot - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def webhook_body(phone: str, name: str, text: str, msg_id: str) -> dict:
+    if text.startswith(("menu_", "apply_", "emp_", "time_", "prod_", "pk:")):
+        message = {"type": "interactive", "interactive": {
+            "type": "list_reply", "list_reply": {"id": text, "title": text}}}
+    else:
+        message = {"type": "text", "text": {"body": text}}
+    message.update({"from": phone, "id": msg_id, "timestamp": str(int(time.time()))})
+    return {"object": "whatsapp_business_account", "entry": [{"changes": [{
+        "field": "messages",
+        "value": {"contacts": [{"wa_id": phone, "profile": {"name": name}}],
+                  "messages": [message]},
+    }]}]}
+
+
+class WsgiServer:
+    """app.py on werkzeug's threaded server (one thread per request)."""
+
+    def __init__(self, wsgi_app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args):
+                pass
+
+        self.server = make_server("127.0.0.1", 0, wsgi_app, threaded=True,
+                                  request_handler=QuietHandler)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, name="wsgi", daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class AsgiServer:
+    """asgi.py on uvicorn, its event loop on a background thread."""
+
+    def __init__(self, asgi_app):
+        import uvicorn
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        config = uvicorn.Config(asgi_app, host="127.0.0.1", port=self.port,
+                                log_level="warning", access_log=False, backlog=4096)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.server.serve()),
+                                       name="asgi", daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the WhatsApp bot")
+    parser.add_argument("--customers", type=int, default=60, help="conversations in total")
+    parser.add_argument("--concurrency", type=int, default=30, help="conversations at once")
+    parser.add_argument("--rate", type=float, default=50, help="target inbound messages/s")
+    parser.add_argument("--script", help="JSON list of messages per customer")
+    parser.add_argument("--reply-timeout", type=float, default=30)
+    parser.add_argument("--graph-latency", type=float, default=0.08)
+    parser.add_argument("--graph-jitter", type=float, default=0.04)
+    parser.add_argument("--graph-error-rate", type=float, default=0.0)
+    parser.add_argument("--graph-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--statuses", action="store_true",
+                        help="fake Graph API posts delivered/read statuses back")
+    parser.add_argument("--gemini-latency", type=float, default=1.2)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--sheets-latency", type=float, default=0.6)
+    parser.add_argument("--outbound-rate", type=float, default=80,
+                        help="OUTBOUND_RATE for the bot (Meta's per-number limit, 0 = off)")
+    parser.add_argument("--asgi", action="store_true",
+                        help="serve asgi.py with uvicorn instead of app.py")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+
+    # ── Local stand-ins, then the app itself ────────────────────────────────
+    fake = FakeGraphAPI(latency=args.graph_latency, jitter=args.graph_jitter,
+                        error_rate=args.graph_error_rate,
+                        rate_limit_rate=args.graph_rate_limit_rate)
+    tmp = tempfile.mkdtemp(prefix="xtenda-loadtest-")
+    os.environ.update({
+        "WHATSAPP_API_URL":       fake.url,
+        "OUTBOUND_RATE":          str(args.outbound_rate),
+        "PHONE_NUMBER_ID":        "loadtest",
+        "WHATSAPP_ACCESS_TOKEN":  "loadtest",
+        "SESSION_DB_PATH":        os.path.join(tmp, "sessions.db"),
+        "OUTBOX_DB_PATH":         os.path.join(tmp, "outbox.db"),
+        "LEAD_SPOOL_PATH":        os.path.join(tmp, "leads_spool.db"),
+        "LEAD_LEDGER_PATH":       os.path.join(tmp, "leads.db"),
+        "CONSULTANT_COUNTS_PATH": os.path.join(tmp, "consultants.db"),
+        "AI_CACHE_PATH":          "",
+        "DEDUP_DB_PATH":          "",
+    })
+    stubs.install(args.gemini_latency, args.sheets_latency, args.gemini_error_rate)
+
+    import bot_flow
+    import metrics
+    from delivery import delivery
+
+    # Per-state handler timings + "done" signal per customer
+    handled: dict[str, threading.Event] = {}
+    by_state: dict[str, list[float]] = {}
+    state_lock = threading.Lock()
+
+    def before(phone: str) -> tuple[str, float]:
+        session = bot_flow.store.load(phone)
+        return (session.state.value if session is not None else "new"), time.perf_counter()
+
+    def after(phone: str, state: str, start: float):
+        elapsed = time.perf_counter() - start
+        with state_lock:
+            by_state.setdefault(state, []).append(elapsed)
+        event = handled.get(phone)
+        if event is not None:
+            event.set()
+
+    if args.asgi:
+        import asgi
+        original_async = asgi.handle_message_async
+
+        async def traced_async(phone: str, display_name: str, text: str):
+            state, start = before(phone)
+            try:
+                await original_async(phone, display_name, text)
+            finally:
+                after(phone, state, start)
+
+        asgi.handle_message_async = traced_async
+        server = AsgiServer(asgi.app)
+    else:
+        import app
+        import ingest
+        original = ingest.handle_message
+
+        def traced(phone: str, display_name: str, text: str):
+            state, start = before(phone)
+            try:
+                original(phone, display_name, text)
+            finally:
+                after(phone, state, start)
+
+        ingest.handle_message = traced
+        server = WsgiServer(app.app)
+    webhook = f"http://127.0.0.1:{server.port}/webhook"
+    if args.statuses:
+        fake.status_webhook = webhook
+    fake.start()
+
+    # ── Drive ───────────────────────────────────────────────────────────────
+    pacer   = Pacer(args.rate)
+    results = {"ack": [], "first_reply": [], "handled": [],
+               "ack_errors": 0, "no_reply": 0, "messages": 0}
+    res_lock = threading.Lock()
+    queue = list(range(args.customers))
+    queue_lock = threading.Lock()
+    local = threading.local()
+
+    def customer(index: int):
+        phone = f"26099{index:07d}"
+        name  = random.choice(NAMES)
+        event = handled[phone] = threading.Event()
+        http  = local.__dict__.setdefault("http", requests.Session())
+        for step, text in enumerate(script):
+            pacer.wait()
+            event.clear()
+            before = fake.sent_count(phone)
+            body   = webhook_body(phone, name, text.replace("{name}", name),
+                                  f"wamid.in.{index}.{step}")
+            start  = time.perf_counter()
+            try:
+                r = http.post(webhook, json=body, timeout=30)
+                ok = r.status_code == 200
+            except requests.RequestException:
+                ok = False
+            ack = time.perf_counter() - start
+            if not ok:
+                with res_lock:
+                    results["ack_errors"] += 1
+                continue
+            first = fake.wait_for_send(phone, before, args.reply_timeout)
+            done  = event.wait(args.reply_timeout)
+            end   = time.perf_counter()
+            with res_lock:
+                results["messages"] += 1
+                results["ack"].append(ack)
+                if first is None:
+                    results["no_reply"] += 1
+                else:
+                    results["first_reply"].append(first - start)
+                if done:
+                    results["handled"].append(end - start)
+
+    def worker():
+        while True:
+            with queue_lock:
+                if not queue:
+                    return
+                index = queue.pop(0)
+            customer(index)
+
+    print(f"🚀 {args.customers} customers × {len(script)} messages, "
+          f"{args.concurrency} at once, target {args.rate:g} msg/s "
+          f"({'asgi.py' if args.asgi else 'app.py'})")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    # ── Report ──────────────────────────────────────────────────────────────
+    with metrics.STAGES._lock:
+        series = {key[0]: list(values) for key, values in metrics.STAGES._series.items()}
+    stages = {}
+    for name, values in series.items():
+        count = sum(values[:-1])        # bucket counts, then the sum of seconds
+        stages[name] = {"count": count, "avg_ms": round(1000 * values[-1] / max(1, count), 2)}
+    report = {
+        "config":        vars(args),
+        "elapsed_s":     round(elapsed, 2),
+        "throughput":    round(results["messages"] / elapsed, 1),
+        "messages":      results["messages"],
+        "ack_errors":    results["ack_errors"],
+        "no_reply":      results["no_reply"],
+        "webhook_ack":   percentiles(results["ack"]),
+        "first_reply":   percentiles(results["first_reply"]),
+        "handled":       percentiles(results["handled"]),
+        "by_state":      {s: percentiles(v) for s, v in sorted(by_state.items())},
+        "stages":        stages,
+        "fake_graph":    dict(fake.counts),
+        "stubs":         dict(stubs.calls),
+    }
+    if args.statuses:
+        report["delivery"] = delivery.stats()
+
+    print(f"\n✅ {report['messages']} messages in {report['elapsed_s']} s "
+          f"→ {report['throughput']} msg/s "
+          f"({report['ack_errors']} ack errors, {report['no_reply']} without a reply)")
+    print(f"\n{'latency':<34} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = [("webhook ack", report["webhook_ack"]), ("first reply", report["first_reply"]),
+            ("handled", report["handled"])]
+    rows += [(f"  state {s}", p) for s, p in report["by_state"].items()]
+    for label, p in rows:
+        if p["n"]:
+            print(f"{label:<34} {p['n']:>6} {p['p50_ms']:>9} {p['p95_ms']:>9}"
+                  f" {p['p99_ms']:>9} {p['max_ms']:>9}")
+    print("\nServer stages (avg ms / count): " + ", ".join(
+        f"{name} {s['avg_ms']}/{s['count']}" for name, s in sorted(stages.items())))
+    print(f"Fake Graph API: {report['fake_graph']}   Stubs: {report['stubs']}")
+    if args.statuses:
+        legs = [f"{kind} {leg} p50 {p['p50_s']:.2f}s"
+                for kind, by_leg in report["delivery"].items() if isinstance(by_leg, dict)
+                for leg, p in by_leg.items() if isinstance(p, dict) and "p50_s" in p]
+        print("Delivery: " + (", ".join(legs) or "no statuses matched"))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+    fake.stop()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
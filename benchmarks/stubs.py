@@ -0,0 +1,74 @@
+"""
+stubs.py — Local stand-ins for gemini_ai.py and sheets.py
+bot_flow imports gemini_ai / sheets on first use, so registering these fakes
+in sys.modules BEFORE the first question or lead is enough — the real
+wrappers, gateway, cache, spool and metrics all still run. The Gemini stub
+has an ask_gemini_async too, like a native async client (asgi.py uses it).
+
+    install(gemini_latency=1.2, sheets_latency=0.6)
+"""
+
+import asyncio
+import random
+import sys
+import threading
+import time
+import types
+
+calls = {"gemini": 0, "save_lead": 0, "save_leads": 0, "leads_saved": 0}
+_lock = threading.Lock()
+saved_ids: set[str] = set()
+
+
+def _sleep(mean: float):
+    time.sleep(max(0.0, random.gauss(mean, mean / 4)))
+
+
+def install(gemini_latency: float = 1.2, sheets_latency: float = 0.6,
+            gemini_error_rate: float = 0.0):
+    gemini = types.ModuleType("gemini_ai")
+    sheets = types.ModuleType("sheets")
+
+    def ask_gemini(phone: str, question: str) -> str:
+        with _lock:
+            calls["gemini"] += 1
+        _sleep(gemini_latency)
+        if random.random() < gemini_error_rate:
+            raise RuntimeError("stub Gemini error")
+        return f"(stub answer) Thanks for asking about: {question[:60]}"
+
+    async def ask_gemini_async(phone: str, question: str) -> str:
+        with _lock:
+            calls["gemini"] += 1
+        await asyncio.sleep(max(0.0, random.gauss(gemini_latency, gemini_latency / 4)))
+        if random.random() < gemini_error_rate:
+            raise RuntimeError("stub Gemini error")
+        return f"(stub answer) Thanks for asking about: {question[:60]}"
+
+    def save_lead(lead: dict) -> bool:
+        with _lock:
+            calls["save_lead"] += 1
+            calls["leads_saved"] += 1
+        _sleep(sheets_latency)
+        return True
+
+    def save_leads(leads: list[dict]) -> bool:
+        with _lock:
+            calls["save_leads"] += 1
+            calls["leads_saved"] += len(leads)
+            saved_ids.update(lead.get("lead_id") for lead in leads)
+        _sleep(sheets_latency)      # one append_rows call, whatever the batch size
+        return True
+
+    def saved_lead_ids(lead_ids: list[str]) -> set[str]:
+        _sleep(sheets_latency)      # one read of the lead_id column
+        with _lock:
+            return {i for i in lead_ids if i in saved_ids}
+
+    gemini.ask_gemini       = ask_gemini
+    gemini.ask_gemini_async = ask_gemini_async
+    sheets.save_lead      = save_lead
+    sheets.save_leads     = save_leads
+    sheets.saved_lead_ids = saved_lead_ids
+    sys.modules["gemini_ai"] = gemini
+    sys.modules["sheets"]    = sheets
@@ -2,35 +2,156 @@
 bot_flow.py — Hybrid bot logic for Xtenda Finance
 Rules handle menus & structured flows. Gemini AI handles open questions.
 
-CONVERSATION STATES:
+CONVERSATION STATES (session_store.State):
     idle             → Show welcome / main menu
     awaiting_amount  → Collecting loan amount (free text)
     awaiting_name    → Collecting full name
     awaiting_callback_name → Collecting name for callback
     awaiting_callback_time → Waiting for time selection
     ai_mode          → Open Q&A with Gemini
+    finding_consultant → Province → town → branch picker (consultant_picker.py)
+
+handle_message() runs on a dispatcher thread (app.py). handle_message_async()
+is the same bot on an event loop (asgi.py): routing is the same code, run on a
+worker thread (asyncio.to_thread) because its local state lives in SQLite,
+with its sends captured; then the network waits (Graph API, Gemini) are
+awaited in order on the loop.
+
+handle_document() / handle_document_async() take an image or document upload
+once media.py's pool has finished downloading it and attach the stored file
+to the customer's lead — in any state, without changing it.
 """
 
+import asyncio
+import os
+import sqlite3
+
+import whatsapp_async
 from whatsapp import (
     send_text, send_main_menu, send_product_menu,
     send_loan_type_selection, send_employment_status,
-    send_callback_time, send_back_prompt
+    send_callback_time, send_back_prompt, send_template, capture, captured
+)
+from session_store import Session, State, make_store
+from ai_cache import ai_cache, content_version
+from faq_index import build_index
+from ai_gateway import AsyncGeminiGateway, GeminiGateway
+from ai_context import conversations
+from lead_spool import LeadSpool
+from lead_ledger import lead_ledger
+from consultants import assign_consultant, current_index
+from consultant_picker import picker_for
+from media import EXTENSIONS, MediaError, media_store
+from metrics import ANSWERS, MESSAGES, stage
+
+
+# ── Gemini & Sheets ─────────────────────────────────────────────────────────
+# gemini_ai.py and sheets.py (see README) pull in the Google client libraries,
+# so they are imported on first use rather than when the bot starts.
+def ask_gemini(phone: str, user_input: str) -> str:
+    from gemini_ai import ask_gemini as _ask_gemini
+    with stage("gemini"):
+        return _ask_gemini(phone, user_input)
+
+
+async def ask_gemini_async(phone: str, user_input: str) -> str:
+    # gemini_ai.ask_gemini_async if it has one; else the sync call on a thread
+    # (at most GEMINI_MAX_CONCURRENT of those at a time — see the gateway)
+    import gemini_ai
+    with stage("gemini"):
+        if hasattr(gemini_ai, "ask_gemini_async"):
+            return await gemini_ai.ask_gemini_async(phone, user_input)
+        return await asyncio.to_thread(gemini_ai.ask_gemini, phone, user_input)
+
+
+# Coalesces identical questions, caps concurrency, enforces a deadline.
+# Every answer Gemini returns (even after the deadline) lands in the cache.
+gemini = GeminiGateway(
+    ask            = lambda phone, question: ask_gemini(phone, question),
+    max_concurrent = int(os.getenv("GEMINI_MAX_CONCURRENT", 4)),
+    deadline       = float(os.getenv("GEMINI_DEADLINE", 8)),
+    on_result      = ai_cache.put,
 )
+gemini_async = AsyncGeminiGateway(
+    ask            = ask_gemini_async,
+    max_concurrent = int(os.getenv("GEMINI_MAX_CONCURRENT", 4)),
+    deadline       = float(os.getenv("GEMINI_DEADLINE", 8)),
+    on_result      = ai_cache.put,
+)
+
+AI_FALLBACK_REPLY = (
+    "🙏 Sorry, I couldn't get you an answer just now.\n\n"
+    "Please try again in a moment, or type *menu* and choose "
+    "*Book a Callback* — our team will gladly help 📞"
+)
+
+
+def save_lead(lead: dict) -> bool:
+    from sheets import save_lead as _save_lead
+    with stage("sheets"):
+        return _save_lead(lead)
+
+
+def save_leads(leads: list[dict]) -> int:
+    """Batch write for the spool flusher. Returns how many leads were saved."""
+    import sheets
+    with stage("sheets"):
+        return _save_leads(sheets, leads)
+
+
+def saved_lead_ids(lead_ids: list[str]) -> set[str] | None:
+    """Which of these leads are already in the sheet — None if sheets.py can't say."""
+    import sheets
+    if not hasattr(sheets, "saved_lead_ids"):
+        return None
+    with stage("sheets"):
+        return set(sheets.saved_lead_ids(lead_ids))
+
+
+def _save_leads(sheets, leads: list[dict]) -> int:
+    if hasattr(sheets, "save_leads"):
+        # One append_rows call for the whole batch — all or nothing
+        return len(leads) if sheets.save_leads(leads) else 0
+    saved = 0
+    for lead in leads:
+        if not sheets.save_lead(lead):
+            break
+        saved += 1
+    return saved
+
 
+# ── Write-behind lead saving (see lead_spool.py) ───────────────────────────
+_spool_path = os.getenv("LEAD_SPOOL_PATH", "leads_spool.db")
+lead_spool = LeadSpool(
+    path     = _spool_path,
+    write    = lambda leads: save_leads(leads),
+    interval = float(os.getenv("LEAD_FLUSH_INTERVAL", 2)),
+    batch    = int(os.getenv("LEAD_FLUSH_BATCH", 50)),
+    lease    = float(os.getenv("LEAD_FLUSH_LEASE", 120)),
+    saved    = saved_lead_ids,
+) if _spool_path else None
 
-# ── In-memory session store ─────────────────────────────────────────────────
-# Format: { phone: {"state": "...", "lead": {...}, "name": "..."} }
-sessions: dict[str, dict] = {}
 
+# ── Session store (memory or SQLite — see session_store.py) ─────────────────
+store = make_store()
 
-def get_session(phone: str, display_name: str) -> dict:
-    if phone not in sessions:
-        sessions[phone] = {"state": "idle", "lead": {}, "name": display_name}
-    return sessions[phone]
 
+def get_session(phone: str, display_name: str) -> Session:
+    session = store.load(phone)
+    if session is None:
+        session = Session(display_name)
+    return session
 
-def reset_session(phone: str, display_name: str):
-    sessions[phone] = {"state": "idle", "lead": {}, "name": display_name}
+
+def reset_session(phone: str, session: Session, display_name: str, keep_documents: bool = True):
+    # In place — handle_message saves this same object once at the end.
+    # Uploaded documents wait for the next application unless it was just saved.
+    documents = session.lead.get("documents") if keep_documents else None
+    session.reset(display_name)
+    if documents:
+        session.lead["documents"] = documents
+    # A fresh start: earlier Q&A no longer frames the next question
+    conversations.forget(phone)
 
 
 # ── Product Info Texts ───────────────────────────────────────────────────────
@@ -88,6 +209,119 @@ CALLBACK_TIME_LABELS = {
     "time_evening":   "Evening (5pm–7pm)",
 }
 
+ELIGIBILITY_INFO = (
+    "✅ *Eligibility Requirements*\n\n"
+    "To qualify for an Xtenda Finance loan:\n\n"
+    "• 🎂 Age 18 or above\n"
+    "• 🇿🇲 Zambian citizen or resident\n"
+    "• 💼 Employed OR running a business for 6+ months\n"
+    "• 🪪 Valid NRC\n"
+    "• 🏦 Active bank account\n\n"
+    "If you meet these, you're likely eligible! 🎉"
+)
+
+# Extra search words per product for the FAQ index (how customers ask)
+PRODUCT_KEYWORDS = {
+    "prod_personal": "personal loan individual school fees emergency",
+    "prod_business": "business loan sme company shop stock expansion capital",
+    "prod_salary":   "salary backed loan payroll deduction civil servant employee payslip",
+    "prod_asset":    "asset finance car vehicle truck machinery equipment",
+}
+
+# ── Curated FAQ — answered locally, no Gemini call ──────────────────────────
+# "questions" are the ways customers ask; only facts from the texts above.
+FAQ_ENTRIES = [
+    {
+        "id": "faq_rates",
+        "questions": "interest rate rates charge percentage how much interest cost per month",
+        "answer": (
+            "📊 *Our interest rates*\n\n"
+            "• Personal Loan: from 4.5% per month\n"
+            "• Business Loan: from 3.8% per month\n"
+            "• Asset Finance: competitive rates\n\n"
+            "Your exact rate depends on the amount and term 💬"
+        ),
+    },
+    {
+        "id": "faq_approval",
+        "questions": "how long approval take time fast quick same day when approved wait",
+        "answer": (
+            "⏱️ *Approval times*\n\n"
+            "• Salary-Backed Loan: same-day approval in most cases 🚀\n"
+            "• Personal Loan: within 24–48 hours\n\n"
+            "Apply now and our team will keep you updated ✅"
+        ),
+    },
+    {
+        "id": "faq_documents",
+        "questions": "documents required requirements what do i need bring paperwork nrc payslip bank statement",
+        "answer": (
+            "📄 *Documents you will need*\n\n"
+            "• Personal Loan: NRC, payslip, 3-month bank statement\n"
+            "• Business Loan: business registration, financials, NRC\n\n"
+            "Our consultant will confirm the list for your loan type 👍"
+        ),
+    },
+    {
+        "id": "faq_amounts",
+        "questions": "how much can borrow maximum minimum amount limit",
+        "answer": (
+            "💵 *How much you can borrow*\n\n"
+            "• Personal Loan: ZMW 1,000 – 50,000\n"
+            "• Business Loan: ZMW 5,000 – 500,000\n"
+            "• Salary-Backed Loan: up to 3× your net monthly salary"
+        ),
+    },
+    {
+        "id": "faq_terms",
+        "questions": "repayment period term months how long repay pay back duration",
+        "answer": (
+            "📅 *Repayment terms*\n\n"
+            "• Personal Loan: 3 – 24 months\n"
+            "• Business Loan: 6 – 36 months\n"
+            "• Asset Finance: up to 60 months\n"
+            "• Salary-Backed Loan: repaid via payroll deduction"
+        ),
+    },
+    {
+        "id": "faq_apply",
+        "questions": "how apply application start quote sign up register",
+        "answer": (
+            "📋 *How to apply*\n\n"
+            "Type *menu* and choose *Apply / Get a Quote*. "
+            "We'll ask a few quick questions and a consultant will call you 📞"
+        ),
+    },
+    {
+        "id": "faq_callback",
+        "questions": "call me callback speak agent human person someone talk consultant phone",
+        "answer": (
+            "📞 Type *menu* and choose *Book a Callback* — "
+            "one of our sales agents will call you at your preferred time."
+        ),
+    },
+]
+
+# Cached AI answers are only valid for this version of the product texts
+ai_cache.set_version(content_version(PRODUCT_INFO, LOAN_TYPE_NAMES,
+                                     ELIGIBILITY_INFO, FAQ_ENTRIES))
+
+
+def _faq_documents() -> list[dict]:
+    docs = [
+        {"id": pid, "text": f"{text} {PRODUCT_KEYWORDS.get(pid, '')}", "answer": text}
+        for pid, text in PRODUCT_INFO.items()
+    ]
+    docs.append({"id": "eligibility",
+                 "text": ELIGIBILITY_INFO + " eligible qualify who can apply age citizen",
+                 "answer": ELIGIBILITY_INFO})
+    docs += [{"id": f["id"], "text": f["questions"], "answer": f["answer"]}
+             for f in FAQ_ENTRIES]
+    return docs
+
+
+faq = build_index(_faq_documents())
+
 # Keywords that reset to main menu
 MENU_KEYWORDS = {"menu", "hi", "hello", "start", "hie", "hey", "muli bwanji",
                  "mwabonwa", "howzit", "back", "restart", "home"}
@@ -95,25 +329,141 @@ MENU_KEYWORDS = {"menu", "hi", "hello", "start", "hie", "hey", "muli bwanji",
 
 # ── Main Handler ─────────────────────────────────────────────────────────────
 def handle_message(phone: str, display_name: str, user_input: str):
+    # One keyed read + one write per message, whatever the backend. The lease
+    # keeps another worker from routing this customer between the two.
+    with stage("handler"), store.leased(phone):
+        session = get_session(phone, display_name)
+        MESSAGES.inc(session.state.value)
+        try:
+            _route(phone, session, user_input, display_name)
+        finally:
+            store.save(phone, session)
+
+
+async def handle_message_async(phone: str, display_name: str, user_input: str):
+    # Routing does blocking local work (session, spool, ledger and counter
+    # writes in SQLite), so it runs on a worker thread; sends stay captured
+    # and are awaited here afterwards
+    with stage("handler"):
+        async with store.leased_async(phone):
+            steps = await asyncio.to_thread(
+                _in_session, phone, display_name, _route, user_input, display_name)
+        await _send_steps(phone, steps)
+
+
+def _in_session(phone: str, display_name: str, fn, *args) -> list:
+    """load → fn(phone, session, *args) → save, with every send captured."""
     session = get_session(phone, display_name)
-    state   = session["state"]
+    MESSAGES.inc(session.state.value)
+    try:
+        with capture() as steps:
+            fn(phone, session, *args)
+    finally:
+        store.save(phone, session)
+    return steps
+
+
+async def _send_steps(phone: str, steps: list):
+    for step in steps:
+        if isinstance(step, _Question):
+            reply = await _answer_question_async(phone, step.text)
+            await whatsapp_async.send_text(phone, reply, kind="ai_text")
+            await whatsapp_async.send_text(phone, step.footer)
+        else:
+            await whatsapp_async.post(*step)
+
+
+# ── Document uploads (media.py) ──────────────────────────────────────────────
+def handle_document(phone: str, display_name: str, download):
+    # Queued by submit_when_done: the download has already finished
+    stored, error = _download_result(download)
+    with stage("handler"), store.leased(phone):
+        session = get_session(phone, display_name)
+        MESSAGES.inc(session.state.value)
+        try:
+            _attach_document(phone, session, stored, error)
+        finally:
+            store.save(phone, session)
+
+
+async def handle_document_async(phone: str, display_name: str, download):
+    stored, error = _download_result(download)
+    with stage("handler"):
+        async with store.leased_async(phone):
+            steps = await asyncio.to_thread(
+                _in_session, phone, display_name, _attach_document, stored, error)
+        await _send_steps(phone, steps)
+
+
+def _download_result(download) -> tuple[dict | None, MediaError | None]:
+    try:
+        return download.result(timeout=0), None
+    except MediaError as e:
+        return None, e
+    except Exception as e:      # bad webhook payload, bug in the worker… still answer
+        return None, MediaError("failed", repr(e))
+
+
+# What the "unsupported file" reply lists — straight from what media.py accepts
+_PHOTO_FORMATS    = " / ".join(ext[1:].upper() for mime, ext in EXTENSIONS.items()
+                               if mime.startswith("image/"))
+_DOCUMENT_FORMATS = " / ".join(ext[1:].upper() for mime, ext in EXTENSIONS.items()
+                               if not mime.startswith("image/"))
+
+
+def _attach_document(phone: str, session: Session, stored: dict | None,
+                     error: MediaError | None):
+    if stored is None:
+        print(f"⚠️  Upload from {phone} not stored: {error}")
+        if error.reason == "too_large":
+            limit = media_store.max_bytes // (1024 * 1024) if media_store else 0
+            send_text(phone,
+                f"😕 That file is too big for us to receive (max {limit} MB).\n"
+                f"Please send a smaller photo or PDF.")
+        elif error.reason == "unsupported":
+            send_text(phone,
+                f"😕 We can only receive photos ({_PHOTO_FORMATS}) and {_DOCUMENT_FORMATS} documents.\n"
+                f"Please send your document in one of those formats.")
+        else:
+            send_text(phone, "😕 We couldn't receive that file — please try sending it again.")
+        return
+
+    documents = session.lead.setdefault("documents", [])
+    filename  = stored["filename"]
+    if any(d["sha256"] == stored["sha256"] for d in documents):
+        send_text(phone, f"👍 We already have *{filename}* — no need to send it again.")
+        return
+    documents.append(stored)
+    print(f"📎 {phone}: {filename} → {stored['path']} ({len(documents)} on lead)")
+
+    loan_type = session.lead.get("loan_type")
+    if loan_type:
+        send_text(phone, f"📎 Got *{filename}* — it's attached to your *{loan_type}* application ✅")
+    else:
+        send_text(phone,
+            f"📎 Thanks — we've received *{filename}* ✅\n"
+            f"It will go with your application. Type *menu* to apply or see other options.")
+
+
+def _route(phone: str, session: Session, user_input: str, display_name: str):
+    state   = session.state
     text    = user_input.lower().strip()
 
     # Global escape — any greeting/menu keyword resets to main menu
     if text in MENU_KEYWORDS or user_input == "menu_main":
-        reset_session(phone, display_name)
+        reset_session(phone, session, display_name)
         send_main_menu(phone, display_name)
         return
 
     # ── IDLE: Show main menu ─────────────────────────────────────────────────
-    if state == "idle":
+    if state == State.IDLE:
         _handle_menu(phone, session, user_input, display_name)
 
     # ── APPLY FLOW ────────────────────────────────────────────────────────────
-    elif state == "awaiting_loan_type":
+    elif state == State.AWAITING_LOAN_TYPE:
         if user_input in LOAN_TYPE_NAMES:
-            session["lead"]["loan_type"] = LOAN_TYPE_NAMES[user_input]
-            session["state"] = "awaiting_amount"
+            session.lead["loan_type"] = LOAN_TYPE_NAMES[user_input]
+            session.state = State.AWAITING_AMOUNT
             send_text(phone,
                 f"How much would you like to borrow? 💵\n"
                 f"Please enter the amount in ZMW\n"
@@ -122,69 +472,72 @@ def handle_message(phone: str, display_name: str, user_input: str):
         else:
             send_loan_type_selection(phone)
 
-    elif state == "awaiting_amount":
+    elif state == State.AWAITING_AMOUNT:
         # Accept any numeric-ish text as amount
         amount = user_input.replace(",", "").replace("zmw", "").replace("k", "000").strip()
         if amount.isdigit():
-            session["lead"]["loan_amount"] = f"ZMW {int(amount):,}"
-            session["state"] = "awaiting_employment"
+            session.lead["loan_amount"] = f"ZMW {int(amount):,}"
+            session.state = State.AWAITING_EMPLOYMENT
             send_employment_status(phone)
         else:
             send_text(phone, "Please enter a number — e.g. *15000* (no letters or symbols)")
 
-    elif state == "awaiting_employment":
+    elif state == State.AWAITING_EMPLOYMENT:
         if user_input in EMPLOYMENT_LABELS:
-            session["lead"]["employment"] = EMPLOYMENT_LABELS[user_input]
-            session["state"] = "awaiting_name"
+            session.lead["employment"] = EMPLOYMENT_LABELS[user_input]
+            session.state = State.AWAITING_NAME
             send_text(phone, "Almost done! 😊\n\nWhat is your *full name*?")
         else:
             send_employment_status(phone)
 
-    elif state == "awaiting_name":
-        session["lead"]["name"]  = user_input
-        session["lead"]["phone"] = phone
-        session["state"] = "awaiting_callback_time"
+    elif state == State.AWAITING_NAME:
+        session.lead["name"]  = user_input
+        session.lead["phone"] = phone
+        session.state = State.AWAITING_CALLBACK_TIME
         send_callback_time(phone)
 
-    elif state == "awaiting_callback_time":
+    elif state == State.AWAITING_CALLBACK_TIME:
         if user_input in CALLBACK_TIME_LABELS:
-            session["lead"]["callback_time"] = CALLBACK_TIME_LABELS[user_input]
+            session.lead["callback_time"] = CALLBACK_TIME_LABELS[user_input]
             _save_and_confirm(phone, session, display_name)
         else:
             send_callback_time(phone)
 
     # ── CALLBACK FLOW ─────────────────────────────────────────────────────────
-    elif state == "awaiting_callback_name":
-        session["lead"]["name"]  = user_input
-        session["lead"]["phone"] = phone
-        session["state"] = "awaiting_callback_time_only"
+    elif state == State.AWAITING_CALLBACK_NAME:
+        session.lead["name"]  = user_input
+        session.lead["phone"] = phone
+        session.state = State.AWAITING_CALLBACK_TIME_ONLY
         send_callback_time(phone)
 
-    elif state == "awaiting_callback_time_only":
+    elif state == State.AWAITING_CALLBACK_TIME_ONLY:
         if user_input in CALLBACK_TIME_LABELS:
-            session["lead"]["callback_time"] = CALLBACK_TIME_LABELS[user_input]
-            session["lead"]["loan_type"]  = session["lead"].get("loan_type", "General Inquiry")
-            session["lead"]["loan_amount"] = "TBD"
-            session["lead"]["employment"]  = "TBD"
+            session.lead["callback_time"] = CALLBACK_TIME_LABELS[user_input]
+            session.lead["loan_type"]  = session.lead.get("loan_type", "General Inquiry")
+            session.lead["loan_amount"] = "TBD"
+            session.lead["employment"]  = "TBD"
             _save_and_confirm(phone, session, display_name)
         else:
             send_callback_time(phone)
 
+    # ── FIND A CONSULTANT ────────────────────────────────────────────────────
+    elif state == State.FINDING_CONSULTANT:
+        _handle_picker(phone, session, user_input, display_name)
+
     # ── AI MODE ───────────────────────────────────────────────────────────────
-    elif state == "ai_mode":
-        ai_reply = ask_gemini(phone, user_input)
-        send_text(phone, ai_reply)
+    elif state == State.AI_MODE:
         # After AI reply, offer to go back to menu
-        send_text(phone, "─────────────────\nType *menu* anytime to go back to the main menu 🏠")
+        _reply_to_question(phone, user_input,
+                           "─────────────────\nType *menu* anytime to go back to the main menu 🏠")
 
     else:
         # Unknown state — reset
-        reset_session(phone, display_name)
+        reset_session(phone, session, display_name)
         send_main_menu(phone, display_name)
 
 
 # ── Menu Handler ──────────────────────────────────────────────────────────────
-def _handle_menu(phone: str, session: dict, user_input: str, display_name: str):
+def _handle_menu(phone: str, session: Session, user_input: str, display_name: str):
 
     # First message (new user or greeting)
     if not user_input:
@@ -200,32 +553,27 @@ def _handle_menu(phone: str, session: dict, user_input: str, display_name: str):
         send_back_prompt(phone)
 
     elif user_input == "menu_eligibility":
-        send_text(phone,
-            "✅ *Eligibility Requirements*\n\n"
-            "To qualify for an Xtenda Finance loan:\n\n"
-            "• 🎂 Age 18 or above\n"
-            "• 🇿🇲 Zambian citizen or resident\n"
-            "• 💼 Employed OR running a business for 6+ months\n"
-            "• 🪪 Valid NRC\n"
-            "• 🏦 Active bank account\n\n"
-            "If you meet these, you're likely eligible! 🎉"
-        )
+        send_text(phone, ELIGIBILITY_INFO)
         send_back_prompt(phone)
 
     elif user_input == "menu_apply":
-        session["state"] = "awaiting_loan_type"
+        session.state = State.AWAITING_LOAN_TYPE
         send_loan_type_selection(phone)
 
     elif user_input == "menu_callback":
-        session["state"] = "awaiting_callback_name"
+        session.state = State.AWAITING_CALLBACK_NAME
         send_text(phone,
             "📞 *Book a Callback*\n\n"
             "One of our sales agents will call you!\n\n"
             "First, what is your *full name*?"
         )
 
+    elif user_input == "menu_consultant":
+        session.state = State.FINDING_CONSULTANT
+        send_template(phone, picker_for(current_index()).first_page)
+
     elif user_input == "menu_ai":
-        session["state"] = "ai_mode"
+        session.state = State.AI_MODE
         send_text(phone,
             "🤖 You can ask me anything about Xtenda Finance!\n\n"
             "Go ahead — type your question 👇\n"
@@ -234,25 +582,172 @@ def _handle_menu(phone: str, session: dict, user_input: str, display_name: str):
 
     elif user_input in ("menu_apply", "apply_personal", "apply_business",
                         "apply_salary", "apply_asset"):
-        session["state"] = "awaiting_loan_type"
+        session.state = State.AWAITING_LOAN_TYPE
         send_loan_type_selection(phone)
 
     else:
         # Unknown input in idle → route to AI or show menu
         if len(user_input) > 5:
             # Treat as a question — use Gemini
-            session["state"] = "ai_mode"
-            ai_reply = ask_gemini(phone, user_input)
-            send_text(phone, ai_reply)
-            send_text(phone, "─────────────────\nType *menu* to go back to the main menu 🏠")
+            session.state = State.AI_MODE
+            _reply_to_question(phone, user_input,
+                               "─────────────────\nType *menu* to go back to the main menu 🏠")
         else:
             send_main_menu(phone, display_name)
 
 
+# ── Consultant Picker ─────────────────────────────────────────────────────────
+def _handle_picker(phone: str, session: Session, user_input: str, display_name: str):
+    # Every page is pre-built — a tap is one lookup plus one render
+    picker = picker_for(current_index())
+    hit    = picker.decode(user_input)
+    if hit is None:
+        send_template(phone, picker.first_page)
+        return
+
+    kind, value = hit
+    if kind == "page":
+        send_template(phone, value)
+        return
+
+    consultant = assign_consultant(*value)
+    if consultant is None:
+        send_text(phone, "😕 That branch has no consultants right now — please pick another.")
+        send_template(phone, picker.first_page)
+        return
+
+    send_text(phone,
+        f"👤 *Your consultant: {consultant['name']}*\n"
+        f"🏦 {consultant['branch']}, {consultant['town']}\n\n"
+        f"📞 Call: +{consultant['phone']}\n"
+        f"💬 WhatsApp: https://wa.me/{consultant['phone']}\n\n"
+        f"Mention Xtenda Finance when you get in touch 😊"
+    )
+    reset_session(phone, session, display_name)
+    send_back_prompt(phone)
+
+
+# ── Free-text questions ───────────────────────────────────────────────────────
+class _Question:
+    """A captured question — handle_message_async answers it after routing."""
+    __slots__ = ("text", "footer")
+
+    def __init__(self, text: str, footer: str):
+        self.text   = text
+        self.footer = footer
+
+
+def _reply_to_question(phone: str, user_input: str, footer: str):
+    steps = captured()
+    if steps is not None:
+        steps.append(_Question(user_input, footer))
+        return
+    send_text(phone, _answer_question(phone, user_input), kind="ai_text")
+    send_text(phone, footer)
+
+
+def _answer_question(phone: str, user_input: str) -> str:
+    with stage("answer"):
+        ai_reply, prompt, standalone = _local_answer(phone, user_input)
+        if ai_reply is None:
+            ai_reply = gemini.ask(phone, prompt, cacheable=standalone)
+            _gemini_answered(phone, user_input, ai_reply)
+    return _finish_answer(ai_reply)
+
+
+async def _answer_question_async(phone: str, user_input: str) -> str:
+    with stage("answer"):
+        ai_reply, prompt, standalone = _local_answer(phone, user_input)
+        if ai_reply is None:
+            ai_reply = await gemini_async.ask(phone, prompt, cacheable=standalone)
+            _gemini_answered(phone, user_input, ai_reply)
+    return _finish_answer(ai_reply)
+
+
+def _local_answer(phone: str, user_input: str) -> tuple[str | None, str, bool]:
+    """(answer from the FAQ or cache or None, prompt for Gemini, cacheable)."""
+    # Questions our own texts answer confidently never reach Gemini
+    local = faq.answer(user_input)
+    if local is not None:
+        ANSWERS.inc("faq")
+        return local["answer"], user_input, True
+
+    # First question of a conversation → shareable, so try the cache.
+    # Follow-ups carry this customer's recent turns and are never cached.
+    prompt = conversations.prompt(phone, user_input)
+    standalone = prompt is user_input
+    if standalone:
+        cached = ai_cache.get(user_input)
+        if cached is not None:
+            ANSWERS.inc("cache")
+            return cached, prompt, True
+    return None, prompt, standalone
+
+
+def _gemini_answered(phone: str, user_input: str, ai_reply: str | None):
+    # Only Gemini's own turns become context — FAQ and cached answers are
+    # self-contained and would just crowd the token budget
+    if ai_reply:
+        ANSWERS.inc("gemini")
+        conversations.add_turn(phone, user_input, ai_reply)
+
+
+def _finish_answer(ai_reply: str | None) -> str:
+    if not ai_reply:
+        ANSWERS.inc("fallback")
+        return AI_FALLBACK_REPLY
+    return ai_reply
+
+
 # ── Save Lead & Confirm ───────────────────────────────────────────────────────
-def _save_and_confirm(phone: str, session: dict, display_name: str):
-    lead   = session["lead"]
-    saved  = save_lead(lead)
+def _find_repeat(lead: dict) -> dict | None:
+    # Same phone + loan type recently? The ledger answers from its index and
+    # records this lead in the same transaction (_forget_lead undoes that).
+    if lead_ledger is None:
+        return None
+    try:
+        return lead_ledger.record(lead)
+    except sqlite3.Error as e:
+        print(f"⚠️  Lead ledger error: {e}")
+        return None
+
+
+def _forget_lead(lead: dict):
+    if lead_ledger is None or "lead_id" not in lead:
+        return
+    try:
+        lead_ledger.forget(lead["lead_id"])
+    except sqlite3.Error as e:
+        print(f"⚠️  Lead ledger error: {e}")
+
+
+def _save_and_confirm(phone: str, session: Session, display_name: str):
+    lead   = session.lead
+    earlier = _find_repeat(lead)
+    if earlier is not None:
+        print(f"🔁 Repeat application from {phone} — not saved again")
+        send_text(phone,
+            f"👍 We already have your *{earlier.get('loan_type', 'loan')}* request "
+            f"from earlier — no need to apply again!\n\n"
+            f"Our sales team will call you during your preferred time "
+            f"({earlier.get('callback_time', '')}) 📞\n\n"
+            f"_Reference #XF{phone[-4:].upper()}_ | Xtenda Finance 🇿🇲",
+            durable=True,
+        )
+        reset_session(phone, session, display_name)
+        return
+
+    # Spooled locally (fast, durable); a background flusher writes to Sheets.
+    # If even the local spool fails, fall back to saving directly.
+    saved  = lead_spool is not None and lead_spool.enqueue(lead)
+    if not saved:
+        try:
+            saved = save_lead(lead)
+        except Exception as e:      # Sheets / network / import errors alike
+            print(f"❌ Direct lead save failed: {e}")
+            saved = False
+    if not saved:
+        _forget_lead(lead)      # so the customer's retry isn't refused as a repeat
 
     name          = lead.get("name", display_name)
     loan_type     = lead.get("loan_type", "")
@@ -266,14 +761,16 @@ def _save_and_confirm(phone: str, session: dict, display_name: str):
         f"• Amount: {loan_amount}\n"
         f"• Callback: {callback_time}\n\n"
         f"Our sales team will call you during your preferred time 📞\n\n"
-        f"_Reference #XF{phone[-4:].upper()}_ | Xtenda Finance 🇿🇲"
+        f"_Reference #XF{phone[-4:].upper()}_ | Xtenda Finance 🇿🇲",
+        durable=True,   # via the outbox — retried until Meta accepts it
     )
 
     if not saved:
         send_text(phone,
             "⚠️ Note: There was a small issue saving your details.\n"
-            "Our team will still follow up — but please also call us on *+260 XXX XXX XXX* to confirm."
+            "Our team will still follow up — but please also call us on *+260 XXX XXX XXX* to confirm.",
+            durable=True,
         )
 
-    # Reset session after completion
-    reset_session(phone, display_name)
+    # Reset session after completion (documents went with the lead)
+    reset_session(phone, session, display_name, keep_documents=False)
@@ -0,0 +1,361 @@
+"""
+campaign.py — Bulk follow-ups to past leads (callback reminders, new rates)
+Reads a recipient file as a stream and sends through worker threads at BULK
+priority, inside the same Graph API rate limit as everything else
+(whatsapp.scheduler, OUTBOUND_RATE). Run inside the bot, live replies still
+go first.
+
+Fixed memory, however long the list: rows are read one at a time into a
+small queue (2 × workers), so only the rows being sent are held.
+
+Resumable without double-sending: every recipient's result is committed to
+a SQLite file (<recipients>.campaign.db) together with a watermark — the
+last row up to which everything is finished. A stopped or crashed run
+started again skips rows up to the watermark, and the few finished beyond
+it. Only a send in flight at the very moment of a crash can go out twice.
+
+Recipient file: CSV with a header that has a `phone` column; the other
+columns fill the message ({name}, template parameters). A plain list of
+numbers, one per line, works too.
+
+Business-initiated messages outside the 24 h customer service window must
+be approved templates (--template); --text only reaches customers who wrote
+to us in the last 24 h.
+
+Usage:
+    python campaign.py leads.csv --template callback_reminder --params name,callback_time
+    python campaign.py leads.csv --text "Hi {name}, our rates have dropped!" --rate 40
+    python campaign.py leads.csv --export results.csv      (per-recipient results only)
+
+Tuning: --workers (default 16), --rate (OUTBOUND_RATE for this process — the
+bot and a CLI campaign share Meta's limit, so leave the bot room).
+"""
+
+import argparse
+import csv
+import os
+import queue
+import re
+import signal
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterator
+
+from outbound import BULK
+
+PHONE_COLUMNS = ("phone", "wa_id", "number", "msisdn")
+_NOT_DIGITS   = re.compile(r"\D")
+
+
+# ── Messages ─────────────────────────────────────────────────────────────────
+def text_message(body: str) -> Callable[[dict], dict]:
+    """Plain text; {column} placeholders are filled from the recipient's row."""
+    def build(row: dict) -> dict:
+        return {
+            "messaging_product": "whatsapp",
+            "to":   row["phone"],
+            "type": "text",
+            "text": {"preview_url": False, "body": body.format_map(row)},
+        }
+    return build
+
+
+def template_message(name: str, language: str = "en",
+                     params: tuple[str, ...] = ()) -> Callable[[dict], dict]:
+    """An approved template; params name the columns for {{1}}, {{2}}, … in its body."""
+    def build(row: dict) -> dict:
+        template = {"name": name, "language": {"code": language}}
+        missing = [p for p in params if not row.get(p)]
+        if missing:
+            raise ValueError(f"empty {', '.join(missing)}")     # Meta rejects empty parameters
+        if params:
+            template["components"] = [{
+                "type": "body",
+                "parameters": [{"type": "text", "text": row[p]} for p in params],
+            }]
+        return {"messaging_product": "whatsapp", "to": row["phone"],
+                "type": "template", "template": template}
+    return build
+
+
+def read_recipients(path: str) -> Iterator[tuple[int, dict]]:
+    """Yield (row number, row) from a CSV with a phone column, or one number per line.
+    A blank line comes through as an empty row (recorded as invalid)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        names = [h.strip() for h in header]
+        lower = [n.lower() for n in names]
+        phone = next((lower.index(c) for c in PHONE_COLUMNS if c in lower), None)
+        if phone is None:
+            # No header: the first line is already a recipient
+            names = ["phone"] + [f"col{i}" for i in range(1, len(header))]
+            yield 1, dict(zip(names, header))
+            start = 2
+        else:
+            names[phone] = "phone"
+            start = 1
+        for n, values in enumerate(reader, start):
+            # Blank lines too: every row number must be finished for the watermark to pass it
+            yield n, dict(zip(names, values))
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+class Campaign:
+    def __init__(self, recipients: str, build: Callable[[dict], dict],
+                 db_path: str | None = None, workers: int = 16,
+                 send: Callable | None = None, report_every: float = 10.0):
+        """send(payload) → (status, body); defaults to whatsapp.send_payload at BULK priority."""
+        self.recipients   = recipients
+        self.build        = build
+        self.db_path      = db_path or recipients + ".campaign.db"
+        self.workers      = max(1, workers)
+        self.send         = send
+        self.report_every = report_every
+
+        self._lock   = threading.Lock()
+        self._stop   = threading.Event()     # stop() — leave the rest for a resumed run
+        self._ended  = threading.Event()
+        self._queue: queue.Queue = queue.Queue(maxsize=2 * self.workers)
+        self._db     = self._open()
+
+        self.watermark = self._state("watermark", 0)
+        self._finished: set[int] = set()     # rows done beyond the watermark (≤ window)
+
+        self.counts  = {"sent": 0, "failed": 0, "invalid": 0, "skipped": 0}
+        self.started = None
+
+    def _open(self) -> sqlite3.Connection:
+        # One connection, used under self._lock: a result and the watermark
+        # are committed together, one transaction per recipient.
+        db = sqlite3.connect(self.db_path, timeout=10, isolation_level=None,
+                             check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")     # survives a crash of this process
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " row INTEGER PRIMARY KEY,"
+            " phone TEXT NOT NULL,"
+            " status TEXT NOT NULL,"           # sent | failed | invalid
+            " http_status TEXT,"
+            " message_id TEXT,"
+            " error TEXT,"
+            " at REAL NOT NULL)"
+        )
+        db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)")
+        owner = db.execute("SELECT value FROM state WHERE key = 'recipients'").fetchone()
+        if owner is None:
+            db.execute("INSERT INTO state VALUES ('recipients', ?)", (os.path.abspath(self.recipients),))
+        elif owner[0] != os.path.abspath(self.recipients):
+            raise ValueError(f"{self.db_path} belongs to a campaign over {owner[0]}")
+        return db
+
+    def _state(self, key: str, default):
+        row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    # ── Run ──────────────────────────────────────────────────────────────────
+    def run(self) -> dict:
+        """Send to every recipient not done yet. Blocks; returns the summary."""
+        if self.send is None:
+            import whatsapp      # here, so the CLI can set OUTBOUND_RATE first
+            self.send = lambda payload: whatsapp.send_payload(payload, BULK, kind="campaign")
+
+        # Rows finished past the watermark before a stop/crash — a window's worth at most
+        done = {r for (r,) in self._db.execute("SELECT row FROM results WHERE row > ?",
+                                               (self.watermark,))}
+        self.started = time.monotonic()
+        threads = [threading.Thread(target=self._work, name=f"campaign-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        reporter = threading.Thread(target=self._report, name="campaign-report", daemon=True)
+        reporter.start()
+
+        resume_at = self.watermark
+        try:
+            for row, recipient in read_recipients(self.recipients):
+                if row <= resume_at:
+                    self.counts["skipped"] += 1
+                    continue
+                if row in done:
+                    done.discard(row)
+                    self._finish(row, None)
+                    continue
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put((row, recipient), timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if self._stop.is_set():
+                    break
+        except KeyboardInterrupt:
+            self._stop.set()         # Ctrl+C: finish the sends in flight, keep the checkpoint
+        finally:
+            for _ in threads:
+                self._queue.put(None)
+            for t in threads:
+                t.join()
+            self._ended.set()
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO state VALUES ('watermark', ?)",
+                                 (self.watermark,))
+        summary = self.stats()
+        print(f"📣 Campaign {'stopped' if summary['stopped'] else 'finished'}: "
+              f"{summary['sent']} sent, {summary['failed']} failed, {summary['invalid']} invalid, "
+              f"{summary['skipped']} already done — {summary['msgs_per_s']} msg/s "
+              f"over {summary['elapsed_s']} s (results in {self.db_path})")
+        return summary
+
+    def stop(self):
+        """Finish the sends in flight and return from run(); run again to resume."""
+        self._stop.set()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._stop.is_set():
+                continue             # queued, not sent → not finished; a resumed run sends it
+            row, recipient = item
+            self._finish(row, self._send_one(recipient))
+
+    def _send_one(self, recipient: dict) -> tuple:
+        """(phone, status, http_status, message_id, error) for the results table."""
+        if not recipient:
+            return "", "invalid", None, None, "blank line"
+        phone = _NOT_DIGITS.sub("", recipient.get("phone") or "")
+        if not 8 <= len(phone) <= 15:
+            return phone, "invalid", None, None, "bad phone number"
+        try:
+            payload = self.build(dict(recipient, phone=phone))
+        except Exception as e:       # any build error must still finish the row
+            return phone, "invalid", None, None, f"cannot fill message: {e!r}"
+        try:
+            status, body = self.send(payload)
+        except Exception as e:
+            return phone, "failed", None, None, str(e)
+        if status == 200:
+            try:
+                message_id = body["messages"][0]["id"]
+            except (KeyError, IndexError, TypeError):
+                message_id = None
+            return phone, "sent", "200", message_id, None
+        error = (body or {}).get("error", {}).get("message") if isinstance(body, dict) else None
+        return phone, "failed", str(status), None, error
+
+    def _finish(self, row: int, result: tuple | None):
+        with self._lock:
+            self._finished.add(row)
+            while self.watermark + 1 in self._finished:
+                self.watermark += 1
+                self._finished.discard(self.watermark)
+            if result is None:
+                self.counts["skipped"] += 1
+                return
+            self.counts[result[1]] += 1
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (row, *result, time.time()))
+            self._db.execute("INSERT OR REPLACE INTO state VALUES ('watermark', ?)",
+                             (self.watermark,))
+            self._db.execute("COMMIT")
+
+    # ── Progress ─────────────────────────────────────────────────────────────
+    def _report(self):
+        last_done, last_at = 0, time.monotonic()
+        while not self._ended.wait(self.report_every):
+            s = self.stats()
+            done = s["sent"] + s["failed"]
+            now = time.monotonic()
+            print(f"📣 Campaign: {s['sent']:,} sent, {s['failed']} failed, {s['invalid']} invalid "
+                  f"— {(done - last_done) / (now - last_at):.1f} msg/s now, "
+                  f"{s['msgs_per_s']} msg/s overall (row {s['watermark']:,})")
+            last_done, last_at = done, now
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+            watermark = self.watermark
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        attempted = counts["sent"] + counts["failed"]
+        return {
+            **counts,
+            "watermark":  watermark,
+            "elapsed_s":  round(elapsed, 1),
+            "msgs_per_s": round(attempted / elapsed, 1) if elapsed else 0.0,
+            "stopped":    self._stop.is_set(),
+        }
+
+
+def run_campaign(recipients: str, build: Callable[[dict], dict], **kwargs) -> dict:
+    """Campaign(recipients, build, **kwargs).run() — the module API in one call."""
+    return Campaign(recipients, build, **kwargs).run()
+
+
+def export_results(db_path: str, out_path: str) -> int:
+    """Write the per-recipient results to CSV (streamed). Returns the number of rows."""
+    db = sqlite3.connect(db_path)
+    n = 0
+    try:
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "phone", "status", "http_status", "message_id", "error", "at"])
+            for record in db.execute("SELECT * FROM results ORDER BY row"):
+                writer.writerow(record)
+                n += 1
+    finally:
+        db.close()
+    return n
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Send a WhatsApp campaign to a recipient file")
+    parser.add_argument("recipients", help="CSV with a phone column, or one number per line")
+    message = parser.add_mutually_exclusive_group()
+    message.add_argument("--text", help="message text; {column} placeholders are filled per row")
+    message.add_argument("--template", help="approved template name")
+    parser.add_argument("--language", default="en", help="template language code")
+    parser.add_argument("--params", default="", help="comma-separated columns for the template body")
+    parser.add_argument("--db", help="results / checkpoint file (default <recipients>.campaign.db)")
+    parser.add_argument("--workers", type=int, default=16, help="sends in flight at once")
+    parser.add_argument("--rate", type=float, help="messages/sec for this run (sets OUTBOUND_RATE)")
+    parser.add_argument("--export", help="write per-recipient results to this CSV")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.rate is not None:
+        os.environ["OUTBOUND_RATE"] = str(args.rate)
+    # Enough scheduler threads and connections for every worker
+    os.environ.setdefault("OUTBOUND_SENDERS", str(args.workers))
+    os.environ.setdefault("WHATSAPP_POOL_SIZE", str(args.workers))
+
+    db_path = args.db or args.recipients + ".campaign.db"
+    if args.text or args.template:
+        if args.text:
+            build = text_message(args.text)
+        else:
+            params = tuple(p.strip() for p in args.params.split(",") if p.strip())
+            build = template_message(args.template, args.language, params)
+        campaign = Campaign(args.recipients, build, db_path, args.workers)
+        # Ctrl+C / SIGTERM: finish what is in flight, keep the checkpoint
+        signal.signal(signal.SIGTERM, lambda *_: campaign.stop())
+        campaign.run()
+    elif not args.export:
+        parser.error("give --text or --template (or --export alone)")
+
+    if args.export:
+        if not os.path.exists(db_path):
+            parser.error(f"no campaign results at {db_path}")
+        print(f"📄 {export_results(db_path, args.export)} results written to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
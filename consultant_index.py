@@ -0,0 +1,292 @@
+"""
+consultant_index.py — Flattened consultant directory + load-aware assignment
+The nested Province → Town → Branch → [consultants] dict is walked ONCE into
+flat lookup tables:
+
+    • branch key (province, town, branch) → consultant pool    O(1)
+    • consultant phone → consultant (with its branch)         O(1)
+    • province → towns, (province, town) → branches           precomputed
+
+Assignment strategies (CONSULTANT_STRATEGY):
+    round_robin     → each branch hands out consultants in turn
+    least_assigned  → whoever in the branch has had the fewest leads
+    weighted        → fewest leads relative to "weight" (default 1), so a
+                      consultant with weight 2 gets twice the share
+    random          → the old behaviour
+
+Assignment counts live in a small SQLite file shared by all gunicorn
+workers (or in memory when CONSULTANT_COUNTS_PATH is empty). Choosing and
+counting happen in one transaction, so two workers never both pick the same
+"least assigned" consultant on stale counts.
+
+The directory can also come from a JSON or CSV file (CONSULTANTS_FILE).
+DirectoryWatcher stats it every few seconds; when it changes, a NEW index is
+built off to the side and swapped in with one reference assignment — readers
+never see a half-built index and never wait for a reload.
+"""
+
+import csv
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+from ai_cache import content_version
+from sqlite_db import SQLiteDB
+
+BranchKey = tuple[str, str, str]      # (province, town, branch)
+
+
+class ConsultantIndex:
+    """Read-only once built — share it freely between threads."""
+
+    def __init__(self, directory: dict):
+        self.version = content_version(directory)
+        self.pools:     dict[BranchKey, tuple[dict, ...]] = {}
+        self.weights:   dict[BranchKey, tuple[float, ...]] = {}
+        self.by_phone:  dict[str, dict] = {}
+        self.branch_of: dict[str, BranchKey] = {}
+        self.provinces: tuple[str, ...] = tuple(directory)
+        self.towns:     dict[str, tuple[str, ...]] = {}
+        self.branches:  dict[tuple[str, str], tuple[str, ...]] = {}
+
+        for province, towns in directory.items():
+            self.towns[province] = tuple(towns)
+            for town, branches in towns.items():
+                self.branches[(province, town)] = tuple(branches)
+                for branch, people in branches.items():
+                    key  = (province, town, branch)
+                    pool = tuple(
+                        {**person, "province": province, "town": town, "branch": branch}
+                        for person in people
+                    )
+                    self.pools[key]   = pool
+                    self.weights[key] = tuple(max(float(p.get("weight", 1)), 0.01) for p in pool)
+                    for person in pool:
+                        self.by_phone[person["phone"]]  = person
+                        self.branch_of[person["phone"]] = key
+
+    def __len__(self) -> int:
+        return len(self.by_phone)
+
+
+# ── Directory files ─────────────────────────────────────────────────────────
+def load_directory(path: str) -> dict:
+    """
+    JSON: the same nested shape as consultants.CONSULTANTS.
+    CSV:  header row province,town,branch,name,phone[,weight] — one consultant per row.
+    """
+    if path.lower().endswith(".csv"):
+        directory: dict = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person = {"name": row["name"].strip(), "phone": row["phone"].strip()}
+                if (row.get("weight") or "").strip():
+                    person["weight"] = float(row["weight"])
+                (directory.setdefault(row["province"].strip(), {})
+                          .setdefault(row["town"].strip(), {})
+                          .setdefault(row["branch"].strip(), [])
+                          .append(person))
+        return directory
+    with open(path, encoding="utf-8") as f:
+        directory = json.load(f)
+    if not isinstance(directory, dict):
+        raise ValueError("consultant file must hold a Province → Town → Branch object")
+    return directory
+
+
+# What a malformed file can raise while loading or indexing
+LOAD_ERRORS = (OSError, ValueError, KeyError, AttributeError, TypeError)
+
+
+def _signature(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class DirectoryWatcher:
+    """
+    Rebuilds the index when the file changes; on_change(new_index) swaps it in.
+    Write the file with a rename (save as .tmp, then mv) so it is never read
+    half-written; a file that fails to parse is ignored until it changes again.
+    """
+
+    def __init__(self, path: str, on_change: Callable, interval: float = 5.0):
+        self.path      = path
+        self.on_change = on_change
+        self.interval  = interval
+        self._seen     = _signature(path)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.reloads   = 0
+        self.errors    = 0
+
+    def start(self):
+        # Started lazily so it runs in the gunicorn worker, not the master
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="consultant-watcher",
+                                                daemon=True)
+                self._thread.start()
+
+    def check(self) -> bool:
+        """Reload if the file changed since last time. True if a new index was swapped in."""
+        sig = _signature(self.path)
+        if sig is None or sig == self._seen:
+            return False
+        self._seen = sig
+        start = time.perf_counter()
+        try:
+            index = ConsultantIndex(load_directory(self.path))
+        except LOAD_ERRORS as e:
+            self.errors += 1
+            print(f"⚠️  Consultant file not reloaded ({e}) — keeping the current directory")
+            return False
+        self.on_change(index)
+        self.reloads += 1
+        print(f"🔄 Consultant directory reloaded: {len(index)} consultant(s) "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Consultant watcher error: {e}")
+
+
+# ── Strategies: pick(pool, weights, counts, turn) → index into pool ─────────
+def _round_robin(pool, weights, counts, turn) -> int:
+    return turn % len(pool)
+
+
+def _least_assigned(pool, weights, counts, turn) -> int:
+    # Ties rotate with the branch's turn so they don't always go to the first
+    n = len(pool)
+    return min(range(n), key=lambda i: (counts[i], (i - turn) % n))
+
+
+def _weighted(pool, weights, counts, turn) -> int:
+    n = len(pool)
+    return min(range(n), key=lambda i: ((counts[i] + 1) / weights[i], (i - turn) % n))
+
+
+def _random(pool, weights, counts, turn) -> int:
+    return random.randrange(len(pool))
+
+
+STRATEGIES: dict[str, Callable] = {
+    "round_robin":    _round_robin,
+    "least_assigned": _least_assigned,
+    "weighted":       _weighted,
+    "random":         _random,
+}
+
+
+# ── Assignment counters ─────────────────────────────────────────────────────
+class MemoryCounters:
+    """Per-process counts — fine for a single gunicorn worker."""
+
+    def __init__(self):
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def assign(self, turn_key: str, phones: list[str], choose: Callable) -> int:
+        """Atomically: i = choose(counts, turn); count phones[i] and the turn."""
+        with self._lock:
+            counts = [self._counts.get(p, 0) for p in phones]
+            i = choose(counts, self._counts.get(turn_key, 0))
+            self._counts[phones[i]] = counts[i] + 1
+            self._counts[turn_key]  = self._counts.get(turn_key, 0) + 1
+            return i
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+COUNTERS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS assignments (
+        key  TEXT PRIMARY KEY,
+        n    INTEGER NOT NULL
+    ) WITHOUT ROWID;
+"""
+
+
+class SQLiteCounters:
+    """Counts in one SQLite file — shared by every worker on the box."""
+
+    def __init__(self, path: str = "consultants.db"):
+        self.path   = path
+        self._db    = SQLiteDB(path, COUNTERS_SCHEMA, timeout=5)
+
+    def assign(self, turn_key: str, phones: list[str], choose: Callable) -> int:
+        db = self._db.conn()
+        keys = [turn_key, *phones]
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            found = dict(db.execute(
+                f"SELECT key, n FROM assignments WHERE key IN ({','.join('?' * len(keys))})",
+                keys,
+            ).fetchall())
+            i = choose([found.get(p, 0) for p in phones], found.get(turn_key, 0))
+            db.executemany(
+                "INSERT INTO assignments (key, n) VALUES (?, 1)"
+                " ON CONFLICT(key) DO UPDATE SET n = n + 1",
+                [(phones[i],), (turn_key,)],
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return i
+
+    def counts(self) -> dict[str, int]:
+        with self._db.shared() as db:
+            return dict(db.execute("SELECT key, n FROM assignments").fetchall())
+
+
+def make_counters() -> MemoryCounters | SQLiteCounters:
+    path = os.getenv("CONSULTANT_COUNTS_PATH", "consultants.db")
+    return SQLiteCounters(path) if path else MemoryCounters()
+
+
+class Assigner:
+    def __init__(self, counters, strategy: str = "least_assigned"):
+        if strategy not in STRATEGIES:
+            print(f"⚠️  Unknown CONSULTANT_STRATEGY '{strategy}' — using least_assigned")
+            strategy = "least_assigned"
+        self.counters = counters
+        self.strategy = strategy
+        self._pick    = STRATEGIES[strategy]
+
+    def assign(self, index: ConsultantIndex, key: BranchKey) -> dict | None:
+        pool = index.pools.get(key)
+        if not pool:
+            return None
+        weights = index.weights[key]
+        try:
+            chosen = self.counters.assign(
+                "turn:" + "/".join(key), [p["phone"] for p in pool],
+                lambda counts, turn: self._pick(pool, weights, counts, turn),
+            )
+        except sqlite3.Error as e:
+            # Never leave a customer without a consultant over a counter
+            print(f"⚠️  Consultant counter error: {e}")
+            chosen = random.randrange(len(pool))
+        return dict(pool[chosen])
+
+    def load(self, index: ConsultantIndex) -> dict[str, int]:
+        """Leads assigned per consultant phone (for the sales manager)."""
+        counts = self.counters.counts()
+        return {phone: counts.get(phone, 0) for phone in index.by_phone}
@@ -0,0 +1,142 @@
+"""
+consultant_picker.py — Province → Town → Branch picker as ready-made list pages
+WhatsApp list messages hold at most 10 rows, so long levels are split into
+pages with a "More…" row. Every page of every level is built and pre-encoded
+(payload_templates.PayloadTemplate) ONCE per consultant-directory version;
+a tap costs one dict lookup to decode the row id and one render to send.
+
+Row ids are "pk:" + a short hash of the place, so they survive reloads that
+don't touch that place — a customer tapping a list sent before a reload still
+lands in the right branch.
+"""
+
+import hashlib
+import threading
+
+from consultant_index import ConsultantIndex
+from payload_templates import PayloadTemplate, slot
+from whatsapp import _list_payload
+
+ROW_PREFIX  = "pk:"
+PAGE_ITEMS  = 8          # + "More…" + "Back" = 10 rows, the WhatsApp maximum
+TITLE_MAX   = 24         # WhatsApp row title limit
+BUTTON_MAX  = 20         # WhatsApp list button limit
+
+ROOT = ROW_PREFIX + "root"
+
+
+def _row_id(*names: str) -> str:
+    return ROW_PREFIX + hashlib.sha1("\x1f".join(names).encode()).hexdigest()[:10]
+
+
+def _title(text: str) -> str:
+    return text if len(text) <= TITLE_MAX else text[: TITLE_MAX - 1] + "…"
+
+
+def _plural(n: int, word: str) -> str:
+    return f"{n} {word}" + ("" if n == 1 else "s")
+
+
+class ConsultantPicker:
+    """
+    decode(row_id) → one of
+        ("page",   PayloadTemplate)             show this page next
+        ("branch", (province, town, branch))    customer picked a branch
+    or None if the id isn't one of ours.
+    """
+
+    def __init__(self, index: ConsultantIndex):
+        self.version = index.version
+        self._rows: dict[str, tuple[str, object]] = {}
+        self.pages = 0
+
+        provinces = [
+            (_row_id(p), _title(p), _plural(len(index.towns[p]), "town"))
+            for p in index.provinces
+        ]
+        self.first_page = self._level(
+            ROOT, provinces,
+            body   = "📍 *Find a Consultant*\n\nWhich province are you in?",
+            button = "Choose Province",
+            back   = ("menu_main", "🔙 Main Menu"),
+        )
+
+        for p in index.provinces:
+            towns = []
+            for t in index.towns[p]:
+                branches = index.branches[(p, t)]
+                if len(branches) == 1:
+                    # One branch in town → the town row picks it directly
+                    self._rows[_row_id(p, t)] = ("branch", (p, t, branches[0]))
+                else:
+                    self._branch_level(index, p, t, back=_row_id(p))
+                towns.append((_row_id(p, t), _title(t), _plural(len(branches), "branch")))
+            self._level(
+                _row_id(p), towns,
+                body   = f"📍 *{p}*\n\nWhich town is closest to you?",
+                button = "Choose Town",
+                back   = (ROOT, "🔙 Provinces"),
+            )
+
+    def _branch_level(self, index: ConsultantIndex, p: str, t: str, back: str):
+        rows = []
+        for b in index.branches[(p, t)]:
+            self._rows[_row_id(p, t, b)] = ("branch", (p, t, b))
+            rows.append((_row_id(p, t, b), _title(b),
+                         _plural(len(index.pools[(p, t, b)]), "consultant")))
+        self._level(
+            _row_id(p, t), rows,
+            body   = f"🏦 *{t}*\n\nWhich branch would you like?",
+            button = "Choose Branch",
+            back   = (back, "🔙 Towns"),
+        )
+
+    def _level(self, level_id: str, items: list[tuple[str, str, str]],
+               body: str, button: str, back: tuple[str, str]) -> PayloadTemplate:
+        """Build every page of one level; the level's own id opens page 1."""
+        chunks = [items[i:i + PAGE_ITEMS] for i in range(0, len(items), PAGE_ITEMS)] or [[]]
+        templates = []
+        for n, chunk in enumerate(chunks, 1):
+            rows = [{"id": rid, "title": title, "description": desc}
+                    for rid, title, desc in chunk]
+            if n < len(chunks):
+                rows.append({"id": f"{level_id}~{n + 1}", "title": "➡️ More…",
+                             "description": f"Page {n + 1} of {len(chunks)}"})
+            rows.append({"id": back[0], "title": back[1], "description": ""})
+            page_body = body if len(chunks) == 1 else f"{body}\n_(page {n} of {len(chunks)})_"
+            templates.append(PayloadTemplate(_list_payload(
+                to           = slot("to"),
+                body         = page_body,
+                button_label = button[:BUTTON_MAX],
+                sections     = [{"title": button[:TITLE_MAX], "rows": rows}],
+            )))
+        self._rows[level_id] = ("page", templates[0])
+        for n, template in enumerate(templates[1:], 2):
+            self._rows[f"{level_id}~{n}"] = ("page", template)
+        self.pages += len(templates)
+        return templates[0]
+
+    def decode(self, row_id: str) -> tuple[str, object] | None:
+        return self._rows.get(row_id)
+
+
+# ── One picker per directory version ────────────────────────────────────────
+_picker: ConsultantPicker | None = None
+_lock = threading.Lock()
+
+
+def picker_for(index: ConsultantIndex) -> ConsultantPicker:
+    """The picker for this directory version, built on first use after a reload."""
+    picker = _picker
+    if picker is not None and picker.version == index.version:
+        return picker
+    return _rebuild(index)
+
+
+def _rebuild(index: ConsultantIndex) -> ConsultantPicker:
+    global _picker
+    with _lock:
+        if _picker is None or _picker.version != index.version:
+            _picker = ConsultantPicker(index)
+            print(f"📍 Consultant picker built: {_picker.pages} page(s)")
+        return _picker
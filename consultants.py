@@ -6,11 +6,18 @@ Each consultant has:
   - name: Display name
   - phone: International format (260XXXXXXXXX) — links directly to phone book
   - wa: WhatsApp number (same or different)
+  - weight: optional share of new leads (default 1 — see consultant_index.py)
 
-Add/remove consultants here. Bot will pick one RANDOMLY from the branch pool.
+Add/remove consultants here. Leads are spread across a branch's pool by
+CONSULTANT_STRATEGY (default least_assigned — see consultant_index.py).
 """
 
-import random
+import os
+
+from consultant_index import (
+    LOAD_ERRORS, Assigner, BranchKey, ConsultantIndex, DirectoryWatcher,
+    load_directory, make_counters,
+)
 
 CONSULTANTS = {
     "🌆 Lusaka Province": {
@@ -190,20 +197,71 @@ CONSULTANTS = {
 }
 
 
+# ── Flat index + assignment ─────────────────────────────────────────────────
+# CONSULTANTS_FILE (JSON or CSV) overrides the table above and is reloaded
+# when it changes. Readers take `index` once per call; a reload replaces it
+# whole, so they never see a half-built directory.
+CONSULTANTS_FILE = os.getenv("CONSULTANTS_FILE", "")
+
+
+def _initial_index() -> ConsultantIndex:
+    if CONSULTANTS_FILE:
+        try:
+            return ConsultantIndex(load_directory(CONSULTANTS_FILE))
+        except LOAD_ERRORS as e:
+            print(f"⚠️  Could not load {CONSULTANTS_FILE} ({e}) — using built-in consultants")
+    return ConsultantIndex(CONSULTANTS)
+
+
+def _swap(new_index: ConsultantIndex):
+    global index
+    index = new_index
+
+
+index    = _initial_index()
+assigner = Assigner(make_counters(), os.getenv("CONSULTANT_STRATEGY", "least_assigned"))
+watcher  = DirectoryWatcher(
+    CONSULTANTS_FILE, _swap,
+    interval = float(os.getenv("CONSULTANTS_RELOAD_INTERVAL", 5)),
+) if CONSULTANTS_FILE else None
+
+
+def current_index() -> ConsultantIndex:
+    if watcher is not None:
+        watcher.start()
+    return index
+
+
 def get_provinces() -> list[str]:
-    return list(CONSULTANTS.keys())
+    return list(current_index().provinces)
 
 
 def get_towns(province: str) -> list[str]:
-    return list(CONSULTANTS.get(province, {}).keys())
+    return list(current_index().towns.get(province, ()))
 
 
 def get_branches(province: str, town: str) -> list[str]:
-    return list(CONSULTANTS.get(province, {}).get(town, {}).keys())
+    return list(current_index().branches.get((province, town), ()))
+
+
+def assign_consultant(province: str, town: str, branch: str) -> dict | None:
+    """Next consultant for a lead in this branch, per CONSULTANT_STRATEGY."""
+    return assigner.assign(current_index(), (province, town, branch))
+
+
+# Old name — kept so existing callers keep working
+get_random_consultant = assign_consultant
+
+
+def find_consultant(phone: str) -> dict | None:
+    """Consultant by phone, with their province / town / branch."""
+    person = current_index().by_phone.get(phone)
+    return dict(person) if person is not None else None
+
+
+def branch_of(phone: str) -> BranchKey | None:
+    return current_index().branch_of.get(phone)
 
 
-def get_random_consultant(province: str, town: str, branch: str) -> dict | None:
-    pool = CONSULTANTS.get(province, {}).get(town, {}).get(branch, [])
-    if not pool:
-        return None
-    return random.choice(pool)
+def assignment_counts() -> dict[str, int]:
+    return assigner.load(current_index())
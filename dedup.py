@@ -0,0 +1,152 @@
+"""
+dedup.py — Message-id deduplication in front of handle_message
+When our ack is slow, Meta redelivers the same message (same message["id"]).
+Each id is let through ONCE; repeats are dropped in O(1).
+
+Two layers:
+    • In-process LRU/TTL set  → fixed memory, catches redeliveries to this worker
+    • Optional SQLite file    → shared by all gunicorn workers on the host
+
+Tuning (environment variables):
+    DEDUP_MAX_IDS  → Ids remembered in memory          (default 10000)
+    DEDUP_TTL      → Seconds an id is remembered       (default 3600)
+    DEDUP_DB_PATH  → SQLite file for the shared layer  (default: off)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlite_db import SQLiteDB
+
+
+class SeenIds:
+    """Fixed-size set of recently seen ids with LRU + TTL eviction."""
+
+    def __init__(self, max_ids: int = 10000, ttl: float = 3600):
+        self.max_ids = max(1, max_ids)
+        self.ttl     = ttl
+        self._ids: OrderedDict[str, float] = OrderedDict()   # id → first seen
+        self._lock = threading.Lock()
+
+    def add(self, msg_id: str) -> bool:
+        """Remember msg_id. Returns False if it was already remembered."""
+        now = time.monotonic()
+        with self._lock:
+            seen_at = self._ids.get(msg_id)
+            if seen_at is not None and now - seen_at < self.ttl:
+                return False
+            self._ids[msg_id] = now
+            self._ids.move_to_end(msg_id)
+            # Oldest first → pop expired ids and anything over the cap
+            while self._ids:
+                at = next(iter(self._ids.values()))
+                if len(self._ids) <= self.max_ids and now - at < self.ttl:
+                    break
+                self._ids.popitem(last=False)
+            return True
+
+    def discard(self, msg_id: str):
+        with self._lock:
+            self._ids.pop(msg_id, None)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+SEEN_IDS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS seen_ids (
+        msg_id   TEXT PRIMARY KEY,
+        seen_at  REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS seen_ids_at ON seen_ids(seen_at);
+"""
+
+
+class SQLiteSeenIds:
+    """Shared layer — one row per id; INSERT OR IGNORE decides who wins."""
+
+    PRUNE_EVERY = 500   # inserts between expired-row cleanups
+
+    def __init__(self, path: str, ttl: float = 3600):
+        self.path  = path
+        self.ttl   = ttl
+        self._lock = threading.Lock()
+        self._db   = SQLiteDB(path, SEEN_IDS_SCHEMA, timeout=5)
+        self._inserts = 0
+
+    def add(self, msg_id: str) -> bool:
+        now = time.time()
+        with self._lock:
+            db = self._db.conn()
+            # An expired row no longer counts as a duplicate
+            db.execute("DELETE FROM seen_ids WHERE msg_id = ? AND seen_at < ?",
+                             (msg_id, now - self.ttl))
+            cur = db.execute(
+                "INSERT OR IGNORE INTO seen_ids (msg_id, seen_at) VALUES (?, ?)",
+                (msg_id, now),
+            )
+            self._inserts += 1
+            if self._inserts % self.PRUNE_EVERY == 0:
+                db.execute("DELETE FROM seen_ids WHERE seen_at < ?", (now - self.ttl,))
+            return cur.rowcount == 1
+
+    def discard(self, msg_id: str):
+        with self._lock:
+            self._db.conn().execute("DELETE FROM seen_ids WHERE msg_id = ?", (msg_id,))
+
+
+class Deduplicator:
+    def __init__(self, local: SeenIds, shared: SQLiteSeenIds | None = None):
+        self.local  = local
+        self.shared = shared
+        self._lock  = threading.Lock()
+        self.checked    = 0
+        self.duplicates = 0
+
+    def first_seen(self, msg_id: str | None) -> bool:
+        """True the first time msg_id arrives, False for every redelivery."""
+        if not msg_id:
+            return True      # nothing to key on — let it through
+        fresh = self.local.add(msg_id)
+        if fresh and self.shared is not None:
+            try:
+                fresh = self.shared.add(msg_id)
+            except sqlite3.Error as e:
+                print(f"⚠️  Dedup store error: {e}")
+        with self._lock:
+            self.checked += 1
+            self.duplicates += not fresh
+        return fresh
+
+    def forget(self, msg_id: str | None):
+        """Undo first_seen — used when a message could not be queued after all."""
+        if not msg_id:
+            return
+        self.local.discard(msg_id)
+        if self.shared is not None:
+            try:
+                self.shared.discard(msg_id)
+            except sqlite3.Error as e:
+                print(f"⚠️  Dedup store error: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            checked, dups = self.checked, self.duplicates
+        return {
+            "checked":    checked,
+            "duplicates": dups,
+            "hit_rate":   dups / checked if checked else 0.0,
+            "remembered": len(self.local),
+        }
+
+
+_ttl = float(os.getenv("DEDUP_TTL", 3600))
+_db_path = os.getenv("DEDUP_DB_PATH")
+
+dedup = Deduplicator(
+    local  = SeenIds(max_ids=int(os.getenv("DEDUP_MAX_IDS", 10000)), ttl=_ttl),
+    shared = SQLiteSeenIds(_db_path, ttl=_ttl) if _db_path else None,
+)
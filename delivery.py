@@ -0,0 +1,128 @@
+"""
+delivery.py — End-to-end delivery latency from Meta's status webhooks
+Every message we send gets a wamid back from the Graph API. Meta later posts
+"delivered" and "read" statuses for that wamid. Matching the two gives the
+latency the customer actually sees:
+
+    sent → delivered   (our send completed → on the customer's phone)
+    delivered → read   (on the phone → opened)
+
+reported as percentiles per message type (list, buttons, text, ai_text, …).
+
+Statuses outnumber inbound messages several times over, so handling one is a
+dict lookup under a lock — no parsing beyond the fields we need, no I/O.
+Memory is bounded: at most DELIVERY_MAX_PENDING messages are waiting for a
+status (oldest dropped first) and each percentile works off a fixed-size
+sample ring.
+
+Meta's status timestamps have one-second resolution. Statuses for a message
+sent by another gunicorn worker don't match here and are counted as unmatched.
+
+Tuning (environment variables):
+    DELIVERY_MAX_PENDING  → Sent messages remembered while awaiting statuses (default 20000)
+    DELIVERY_SAMPLES      → Latency samples kept per type and leg           (default 1024)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from metrics import Counter, Histogram, register
+
+DELIVERY_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0, 3600.0)
+
+DELIVERY_SECONDS = register(Histogram(
+    "delivery_seconds", "Sent→delivered and delivered→read time by message type",
+    ("kind", "leg"), buckets=DELIVERY_BUCKETS,
+))
+STATUSES = register(Counter(
+    "delivery_statuses_total", "Status webhooks by status and message type", ("status", "kind"),
+))
+
+
+class _Sent:
+    __slots__ = ("kind", "sent_at", "delivered_at")
+
+    def __init__(self, kind: str, sent_at: float):
+        self.kind         = kind
+        self.sent_at      = sent_at
+        self.delivered_at = None
+
+
+class DeliveryTracker:
+    def __init__(self, max_pending: int = 20000, samples: int = 1024):
+        self.max_pending = max(1, max_pending)
+        self.samples     = max(1, samples)
+        # wamid → _Sent; oldest first
+        self._pending: OrderedDict[str, _Sent] = OrderedDict()
+        # (kind, leg) → recent latencies in seconds
+        self._latency: dict[tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+        self.unmatched = 0
+        self.dropped   = 0
+        self.failed: dict[str, int] = {}
+
+    def sent(self, message_id: str | None, kind: str, at: float | None = None):
+        if not message_id:
+            return
+        record = _Sent(kind, time.time() if at is None else at)
+        with self._lock:
+            self._pending[message_id] = record
+            if len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+
+    def status(self, message_id: str, status: str, timestamp: float | None = None):
+        at = time.time() if timestamp is None else timestamp
+        leg = None
+        with self._lock:
+            record = self._pending.get(message_id)
+            if record is None:
+                self.unmatched += 1
+                return
+            kind = record.kind
+            if status == "delivered" and record.delivered_at is None:
+                record.delivered_at = at
+                leg, start = "sent_to_delivered", record.sent_at
+            elif status == "read":
+                # Read is final; if "delivered" never arrived, read implies it
+                del self._pending[message_id]
+                if record.delivered_at is not None:
+                    leg, start = "delivered_to_read", record.delivered_at
+            elif status == "failed":
+                del self._pending[message_id]
+                self.failed[kind] = self.failed.get(kind, 0) + 1
+            if leg is not None:
+                elapsed = max(0.0, at - start)
+                ring = self._latency.get((kind, leg))
+                if ring is None:
+                    ring = self._latency[(kind, leg)] = deque(maxlen=self.samples)
+                ring.append(elapsed)
+        STATUSES.inc(status, kind)
+        if leg is not None:
+            DELIVERY_SECONDS.observe(elapsed, kind, leg)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rings = {key: sorted(ring) for key, ring in self._latency.items()}
+            out = {
+                "pending":   len(self._pending),
+                "unmatched": self.unmatched,
+                "dropped":   self.dropped,
+                "failed":    dict(self.failed),
+            }
+        for (kind, leg), s in rings.items():
+            out.setdefault(kind, {})[leg] = {
+                "samples": len(s),
+                "p50_s":   s[len(s) // 2],
+                "p95_s":   s[min(len(s) - 1, int(len(s) * 0.95))],
+                "p99_s":   s[min(len(s) - 1, int(len(s) * 0.99))],
+            }
+        return out
+
+
+delivery = DeliveryTracker(
+    max_pending = int(os.getenv("DELIVERY_MAX_PENDING", 20000)),
+    samples     = int(os.getenv("DELIVERY_SAMPLES", 1024)),
+)
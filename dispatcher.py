@@ -0,0 +1,253 @@
+"""
+dispatcher.py — Background dispatcher for incoming WhatsApp messages
+The webhook hands each parsed message here and returns 200 straight away.
+
+Ordering rules:
+    • Messages from the SAME phone run one at a time, in arrival order
+    • Messages from DIFFERENT phones run in parallel on the worker pool
+
+Tuning (environment variables):
+    DISPATCH_WORKERS         → Worker threads                    (default 8)
+    DISPATCH_MAX_QUEUE       → Max messages waiting in total     (default 1000)
+    DISPATCH_MAX_PER_SENDER  → Max messages waiting per phone    (default 20)
+    DISPATCH_SUBMIT_TIMEOUT  → Seconds submit() waits for space  (default 0.05)
+
+Async mode (asgi.py) uses AsyncDispatcher: the same ordering rules with one
+task per active sender instead of a thread pool.
+    ASYNC_CONCURRENCY        → Messages handled at once          (default 1000)
+    ASYNC_MAX_QUEUE          → Max messages waiting in total     (default 10000)
+    (DISPATCH_MAX_PER_SENDER applies as well)
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Callable
+
+
+class Dispatcher:
+    def __init__(self, workers: int = 8, max_queue: int = 1000,
+                 max_per_sender: int = 20, submit_timeout: float = 0.05):
+        self.workers        = max(1, workers)
+        self.max_queue      = max(1, max_queue)
+        self.max_per_sender = max(1, max_per_sender)
+        self.submit_timeout = submit_timeout
+
+        self._lock      = threading.Lock()
+        self._not_full  = threading.Condition(self._lock)
+        self._has_ready = threading.Condition(self._lock)
+
+        # { key: deque[(fn, args)] } — one FIFO per sender
+        self._lanes: dict[str, deque] = {}
+        # Senders with pending work that no worker currently owns
+        self._ready: deque[str] = deque()
+        self._depth   = 0
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+
+        self.processed = 0
+        self.rejected  = 0
+        self.failed    = 0
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"dispatch-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout: float | None = None):
+        """Let workers finish what is queued, then exit."""
+        with self._lock:
+            self._stopping = True
+            self._has_ready.notify_all()
+            threads, self._threads = self._threads, []
+        for t in threads:
+            t.join(timeout)
+
+    # ── Producer side ────────────────────────────────────────────────────────
+    def submit(self, key: str, fn: Callable, *args) -> bool:
+        """
+        Queue fn(*args) behind any earlier work for `key`.
+        Returns False (backpressure) if the queue stays full for submit_timeout.
+        """
+        if not self._threads:
+            self.start()
+
+        with self._lock:
+            ok = self._not_full.wait_for(
+                lambda: self._depth < self.max_queue
+                and len(self._lanes.get(key, ())) < self.max_per_sender,
+                timeout=self.submit_timeout,
+            )
+            if not ok:
+                self.rejected += 1
+                return False
+            self._append(key, fn, args)
+            return True
+
+    def submit_when_done(self, future, key: str, fn: Callable, *args):
+        """
+        Queue fn(*args, future) for `key` once `future` has finished, so no
+        worker waits on it (media.py downloads). It was admitted when it
+        started, so the queue limits do not apply a second time.
+        """
+        if not self._threads:
+            self.start()
+
+        def done(f):
+            with self._lock:
+                self._append(key, fn, args + (f,))
+        future.add_done_callback(done)
+
+    def _append(self, key: str, fn: Callable, args: tuple):
+        # Caller holds self._lock
+        lane = self._lanes.get(key)
+        if lane is None:
+            # Nobody owns this sender right now → make it runnable
+            lane = self._lanes[key] = deque()
+            self._ready.append(key)
+            self._has_ready.notify()
+        lane.append((fn, args))
+        self._depth += 1
+
+    # ── Worker side ──────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            with self._lock:
+                self._has_ready.wait_for(lambda: self._ready or self._stopping)
+                if not self._ready:
+                    return
+                key = self._ready.popleft()
+                fn, args = self._lanes[key][0]
+
+            failed = False
+            try:
+                fn(*args)
+            except Exception as e:
+                failed = True
+                print(f"⚠️  Dispatch error for {key}: {e}")
+
+            with self._lock:
+                self.failed += failed
+                lane = self._lanes[key]
+                lane.popleft()
+                self._depth -= 1
+                self.processed += 1
+                if lane:
+                    # More from this sender → back of the line, order kept
+                    self._ready.append(key)
+                    self._has_ready.notify()
+                else:
+                    del self._lanes[key]
+                self._not_full.notify_all()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers":        len(self._threads),
+                "queued":         self._depth,
+                "active_senders": len(self._lanes),
+                "processed":      self.processed,
+                "rejected":       self.rejected,
+                "failed":         self.failed,
+            }
+
+
+class AsyncDispatcher:
+    """
+    fn is a coroutine function. A sender's messages are awaited one after the
+    other by that sender's task; at most `concurrency` run at once in total.
+    submit() never waits — it is called on the event loop — so a full queue
+    is rejected straight away (→ 503, Meta redelivers).
+    """
+
+    def __init__(self, concurrency: int = 1000, max_queue: int = 10000,
+                 max_per_sender: int = 20):
+        self.concurrency    = max(1, concurrency)
+        self.max_queue      = max(1, max_queue)
+        self.max_per_sender = max(1, max_per_sender)
+
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._lanes: dict[str, deque] = {}
+        self._tasks: set[asyncio.Task] = set()    # the loop only keeps weak references
+        self._depth = 0
+
+        self.processed = 0
+        self.rejected  = 0
+        self.failed    = 0
+
+    def submit(self, key: str, fn: Callable, *args) -> bool:
+        """Queue fn(*args) behind any earlier work for `key`. False when full."""
+        lane = self._lanes.get(key)
+        if self._depth >= self.max_queue or (lane is not None
+                                             and len(lane) >= self.max_per_sender):
+            self.rejected += 1
+            return False
+
+        self._append(key, fn, args)
+        return True
+
+    def submit_when_done(self, future, key: str, fn: Callable, *args):
+        """Dispatcher.submit_when_done; future may finish on another thread."""
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._append, key, fn, args + (f,)))
+
+    def _append(self, key: str, fn: Callable, args: tuple):
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            task = asyncio.get_running_loop().create_task(self._drain(key, lane))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        lane.append((fn, args))
+        self._depth += 1
+
+    async def _drain(self, key: str, lane: deque):
+        while lane:
+            fn, args = lane[0]
+            try:
+                async with self._slots:
+                    await fn(*args)
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️  Dispatch error for {key}: {e}")
+            lane.popleft()
+            self._depth    -= 1
+            self.processed += 1
+        del self._lanes[key]
+
+    async def join(self, timeout: float | None = None):
+        """Wait (up to timeout) for everything queued to finish — for shutdown."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "workers":        self.concurrency,
+            "queued":         self._depth,
+            "active_senders": len(self._lanes),
+            "processed":      self.processed,
+            "rejected":       self.rejected,
+            "failed":         self.failed,
+        }
+
+
+dispatcher = Dispatcher(
+    workers        = int(os.getenv("DISPATCH_WORKERS", 8)),
+    max_queue      = int(os.getenv("DISPATCH_MAX_QUEUE", 1000)),
+    max_per_sender = int(os.getenv("DISPATCH_MAX_PER_SENDER", 20)),
+    submit_timeout = float(os.getenv("DISPATCH_SUBMIT_TIMEOUT", 0.05)),
+)
+
+async_dispatcher = AsyncDispatcher(
+    concurrency    = int(os.getenv("ASYNC_CONCURRENCY", 1000)),
+    max_queue      = int(os.getenv("ASYNC_MAX_QUEUE", 10000)),
+    max_per_sender = int(os.getenv("DISPATCH_MAX_PER_SENDER", 20)),
+)
@@ -0,0 +1,126 @@
+"""
+faq_index.py — Local BM25 search over the bot's own product & FAQ texts
+Built once at startup. A free-text question that clearly matches one of our
+documents is answered in-process (well under a millisecond); only questions
+we are not confident about go to Gemini.
+
+Confidence = BM25 score of the best document is at least `min_score` AND
+at least `min_coverage` of the question's keywords appear in it AND, unless
+the question is a single keyword, at least `min_matched` of them do. One
+shared word is not enough: "how much is the processing fee" only meets the
+Personal Loan text on "fees" (school fees), and "cancel my application" only
+meets "How to apply" on "application" — both belong with Gemini.
+"""
+
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+from ai_cache import normalize
+
+STOPWORDS = {
+    "a", "an", "and", "are", "be", "can", "do", "does", "for", "from", "get",
+    "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "please",
+    "the", "there", "to", "u", "what", "when", "which", "who", "will", "with",
+    "you", "your", "we", "our", "us", "any", "about", "tell", "want", "need",
+    "xtenda", "hello", "hi", "am", "have", "has", "this", "that", "so",
+    "much", "thank", "thanks",
+}
+
+_NUMBERISH = re.compile(r"^\d")
+
+
+def _stem(word: str) -> str:
+    # Tiny plural stripper — "loans"→"loan", "rates"→"rate", "fees" stays
+    # whole-word safe for "business", "status", "basis"
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        _stem(w) for w in normalize(text).split()
+        if w not in STOPWORDS and not _NUMBERISH.match(w)
+    ]
+
+
+class FaqIndex:
+    """
+    docs = [{"id": "...", "text": "searchable text", "answer": "reply to send"}, ...]
+    """
+
+    K1 = 1.5
+    B  = 0.75
+
+    def __init__(self, docs: list[dict], min_score: float = 1.5, min_coverage: float = 0.5,
+                 min_matched: int = 2):
+        self.docs         = docs
+        self.min_score    = min_score
+        self.min_coverage = min_coverage
+        self.min_matched  = max(1, min_matched)
+
+        self._lengths: list[int] = []
+        self._postings: dict[str, list[tuple[int, int]]] = defaultdict(list)  # term → [(doc, tf)]
+        for i, doc in enumerate(docs):
+            terms = tokenize(doc["text"])
+            self._lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self._postings[term].append((i, tf))
+
+        n = len(docs)
+        self._avg_len = sum(self._lengths) / n if n else 0.0
+        self._idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self._postings.items()
+        }
+
+    def _score(self, terms: set[str]) -> tuple[dict[int, float], dict[int, int]]:
+        """BM25 score and number of matched question terms, per document."""
+        scores:  dict[int, float] = defaultdict(float)
+        matched: dict[int, int]   = defaultdict(int)
+        for term in terms:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self._postings[term]:
+                norm = self.K1 * (1 - self.B + self.B * self._lengths[doc_id] / self._avg_len)
+                scores[doc_id]  += idf * tf * (self.K1 + 1) / (tf + norm)
+                matched[doc_id] += 1
+        return scores, matched
+
+    def search(self, question: str, k: int = 3) -> list[tuple[float, float, dict]]:
+        """Top-k documents as (score, keyword coverage, doc)."""
+        terms = set(tokenize(question))
+        if not terms:
+            return []
+        scores, matched = self._score(terms)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(scores[d], matched[d] / len(terms), self.docs[d]) for d in best]
+
+    def answer(self, question: str) -> dict | None:
+        """The best document if we are confident enough, else None."""
+        terms = set(tokenize(question))
+        if not terms:
+            return None
+        scores, matched = self._score(terms)
+        if not scores:
+            return None
+        best = max(scores, key=scores.get)
+        if scores[best] < self.min_score or matched[best] / len(terms) < self.min_coverage:
+            return None
+        if matched[best] < min(self.min_matched, len(terms)):
+            return None
+        return self.docs[best]
+
+
+def build_index(docs: list[dict]) -> FaqIndex:
+    return FaqIndex(
+        docs,
+        min_score    = float(os.getenv("FAQ_MIN_SCORE", 1.5)),
+        min_coverage = float(os.getenv("FAQ_MIN_COVERAGE", 0.5)),
+        min_matched  = int(os.getenv("FAQ_MIN_MATCHED", 2)),
+    )
@@ -0,0 +1,169 @@
+"""
+ingest.py — Webhook payload parsing
+Meta may batch several entries / changes / messages into ONE webhook POST.
+Everything here walks the whole payload so no message is dropped.
+
+Payload shape (trimmed):
+    {"entry": [{"changes": [{"value": {
+        "contacts": [{"wa_id": "2609...", "profile": {"name": "..."}}],
+        "messages": [{"from": "2609...", "id": "wamid...", "type": "text", ...}],
+        "statuses": [{"id": "wamid...", "status": "delivered", "timestamp": "1717000000"}]
+    }}]}]}
+
+Messages go to the dispatcher; statuses (replies to OUR messages) are matched
+in-line against delivery.py — cheap, no queueing. Images and documents start
+downloading on media.py's pool right here; the customer's lane gets the
+finished download once it is stored (its reply may follow their later texts).
+"""
+
+import threading
+
+from bot_flow import handle_document, handle_message
+from dedup import dedup
+from dispatcher import dispatcher
+from delivery import delivery
+from media import media_store
+
+
+# ── Batch counters (how often does Meta batch in production?) ───────────────
+_lock = threading.Lock()
+batch_stats = {
+    "batches":          0,   # webhook POSTs carrying at least one message
+    "messages":         0,   # messages found across all batches
+    "multi_batches":    0,   # POSTs carrying more than one message
+    "max_batch_size":   0,
+    "dispatched":       0,
+    "duplicates":       0,   # Meta redeliveries dropped by dedup
+    "rejected":         0,   # dispatcher full → Meta will redeliver
+    "parse_errors":     0,
+}
+
+
+def _bump(**counts):
+    with _lock:
+        for k, v in counts.items():
+            batch_stats[k] += v
+        if counts.get("messages", 0) > batch_stats["max_batch_size"]:
+            batch_stats["max_batch_size"] = counts["messages"]
+
+
+def extract_text(message: dict) -> str:
+    """Text body, or the id of a tapped button / list row. Anything else → ""."""
+    msg_type = message.get("type")
+    if msg_type == "text":
+        return message["text"]["body"].strip()
+    if msg_type == "interactive":
+        interactive = message["interactive"]
+        if interactive["type"] == "button_reply":
+            return interactive["button_reply"]["id"]
+        if interactive["type"] == "list_reply":
+            return interactive["list_reply"]["id"]
+    return ""
+
+
+def extract_media(message: dict) -> dict | None:
+    """An image / document upload → {"type", "id", "mime_type", "sha256", "filename"}."""
+    msg_type = message.get("type")
+    if msg_type not in ("image", "document"):
+        return None
+    media = message[msg_type]
+    return {
+        "type":      msg_type,
+        "id":        media["id"],
+        "mime_type": media.get("mime_type", ""),
+        "sha256":    media.get("sha256"),
+        "filename":  media.get("filename"),
+    }
+
+
+def iter_messages(data: dict):
+    """
+    Yield (message, display_name) for every message in the payload.
+    Each message is matched to its contact by wa_id, not by position.
+    """
+    for entry in data.get("entry", []):
+        for change in entry.get("changes", []):
+            value = change.get("value", {})
+            messages = value.get("messages")
+            if not messages:
+                continue     # status updates (delivered, read receipts)
+
+            names = {
+                c.get("wa_id"): c.get("profile", {}).get("name", "")
+                for c in value.get("contacts", [])
+            }
+            for message in messages:
+                yield message, names.get(message.get("from"), "")
+
+
+def track_statuses(data: dict) -> int:
+    """Feed every delivered/read/failed status in the payload to the tracker."""
+    n = 0
+    for entry in data.get("entry", []):
+        for change in entry.get("changes", []):
+            for status in change.get("value", {}).get("statuses") or ():
+                try:
+                    delivery.status(status["id"], status["status"], float(status["timestamp"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                n += 1
+    return n
+
+
+def dispatch_batch(data: dict, queue=None, handler=None, document_handler=None) -> dict:
+    """
+    Parse the whole webhook payload and queue every message in one pass.
+    Returns per-batch counts: {"messages": n, "dispatched": n, "rejected": n}.
+    queue / handler / document_handler default to the threaded dispatcher,
+    handle_message and handle_document; asgi.py passes the async versions.
+    """
+    queue            = queue or dispatcher
+    handler          = handler or handle_message
+    document_handler = document_handler or handle_document
+    counts = {"messages": 0, "dispatched": 0, "duplicates": 0,
+              "rejected": 0, "parse_errors": 0}
+
+    for message, display_name in iter_messages(data):
+        counts["messages"] += 1
+        try:
+            phone_number = message["from"]          # e.g. 260971234567
+            user_text    = extract_text(message)
+            media        = extract_media(message) if media_store is not None else None
+        except (KeyError, TypeError) as e:
+            counts["parse_errors"] += 1
+            print(f"⚠️  Parse error: {e}")
+            continue
+
+        # Redelivery of a message we already queued → drop it
+        msg_id = message.get("id")
+        if not dedup.first_seen(msg_id):
+            counts["duplicates"] += 1
+            print(f"♻️  Duplicate {msg_id} from {phone_number} — skipped")
+            continue
+
+        if media is not None:
+            print(f"📎 From {display_name} ({phone_number}): {media['type']} "
+                  f"{media['filename'] or media['mime_type']}")
+            download = media_store.submit(media)
+            queued = download is not None
+            if queued:
+                # The handler is queued once the file is stored — no worker waits on it
+                queue.submit_when_done(download, phone_number, document_handler,
+                                       phone_number, display_name)
+        else:
+            print(f"📩 From {display_name} ({phone_number}): {user_text}")
+            queued = queue.submit(phone_number, handler, phone_number, display_name, user_text)
+
+        if queued:
+            counts["dispatched"] += 1
+        else:
+            # Not queued → Meta's redelivery must not be treated as a duplicate
+            dedup.forget(msg_id)
+            counts["rejected"] += 1
+
+    if counts["messages"]:
+        _bump(batches=1, multi_batches=int(counts["messages"] > 1), **counts)
+        if counts["messages"] > 1:
+            print(f"📦 Batch of {counts['messages']} messages "
+                  f"({counts['dispatched']} dispatched, {counts['rejected']} rejected)")
+    return counts
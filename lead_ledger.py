@@ -0,0 +1,130 @@
+"""
+lead_ledger.py — Local record of every lead, indexed for quick lookups
+Google Sheets is where the sales team works, but it is far too slow to ask
+"did this number apply an hour ago?" on every completed flow. The ledger keeps
+one SQLite row per lead with B-tree indexes on (phone, loan_type, time),
+(loan_type, time) and (day, loan_type), so:
+
+    • repeat-applicant check  → one index seek, however many rows
+    • leads per product per day → answered from the index alone
+
+Check-and-insert runs in one write transaction, so two gunicorn workers can't
+both accept the same repeat application.
+
+Tuning (environment variables):
+    LEAD_LEDGER_PATH       → SQLite file ("" = off)                    (default "leads.db")
+    LEAD_DUPLICATE_WINDOW  → Seconds a repeat application is refused   (default 86400)
+"""
+
+import json
+import os
+import time
+import uuid
+
+from sqlite_db import SQLiteDB
+
+
+LEDGER_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS leads (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        lead_id     TEXT    NOT NULL UNIQUE,
+        phone       TEXT    NOT NULL,
+        loan_type   TEXT    NOT NULL,
+        day         TEXT    NOT NULL,
+        created_at  REAL    NOT NULL,
+        lead        TEXT    NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS leads_phone ON leads(phone, loan_type, created_at);
+    CREATE INDEX IF NOT EXISTS leads_type  ON leads(loan_type, created_at);
+    CREATE INDEX IF NOT EXISTS leads_day   ON leads(day, loan_type);
+"""
+
+def _day(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+class LeadLedger:
+    def __init__(self, path: str = "leads.db", duplicate_window: float = 86400):
+        self.path             = path
+        self.duplicate_window = duplicate_window
+        self._db              = SQLiteDB(path, LEDGER_SCHEMA)
+
+    # ── Writes ───────────────────────────────────────────────────────────────
+    def record(self, lead: dict, now: float | None = None) -> dict | None:
+        """
+        Add the lead unless the same phone applied for the same loan type
+        within the duplicate window. Returns None when recorded (and sets
+        lead["lead_id"]), or the earlier lead when this one is a repeat.
+        """
+        now       = time.time() if now is None else now
+        phone     = lead.get("phone", "")
+        loan_type = lead.get("loan_type", "")
+        db = self._db.conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT lead FROM leads WHERE phone = ? AND loan_type = ?"
+                " AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+                (phone, loan_type, now - self.duplicate_window),
+            ).fetchone()
+            if row is None:
+                lead.setdefault("lead_id", uuid.uuid4().hex[:12])
+                db.execute(
+                    "INSERT INTO leads (lead_id, phone, loan_type, day, created_at, lead)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (lead["lead_id"], phone, loan_type, _day(now), now,
+                     json.dumps(lead, ensure_ascii=False)),
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return json.loads(row[0]) if row else None
+
+    def forget(self, lead_id: str):
+        """Undo record() for a lead that could not be saved anywhere."""
+        self._db.conn().execute("DELETE FROM leads WHERE lead_id = ?", (lead_id,))
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+    def recent(self, phone: str, within: float | None = None, limit: int = 10) -> list[dict]:
+        """This phone's leads, newest first."""
+        within = self.duplicate_window if within is None else within
+        rows = self._db.conn().execute(
+            "SELECT lead FROM leads WHERE phone = ? AND created_at >= ?"
+            " ORDER BY created_at DESC LIMIT ?",
+            (phone, time.time() - within, limit),
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def daily_counts(self, since: str, until: str | None = None) -> dict[str, dict[str, int]]:
+        """{"2024-05-01": {"Personal Loan": 12, ...}, ...} for days since..until (inclusive)."""
+        rows = self._db.conn().execute(
+            "SELECT day, loan_type, COUNT(*) FROM leads WHERE day >= ? AND day <= ?"
+            " GROUP BY day, loan_type",
+            (since, until or "9999-12-31"),
+        ).fetchall()
+        counts: dict[str, dict[str, int]] = {}
+        for day, loan_type, n in rows:
+            counts.setdefault(day, {})[loan_type] = n
+        return counts
+
+    def count_by_type(self, loan_type: str, since: float, until: float | None = None) -> int:
+        return self._db.conn().execute(
+            "SELECT COUNT(*) FROM leads WHERE loan_type = ? AND created_at >= ? AND created_at < ?",
+            (loan_type, since, until if until is not None else time.time() + 1),
+        ).fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._db.shared() as db:
+            return {
+                "leads": db.execute("SELECT COUNT(*) FROM leads").fetchone()[0],
+                "today": db.execute("SELECT COUNT(*) FROM leads WHERE day = ?",
+                                    (_day(time.time()),)).fetchone()[0],
+            }
+
+
+_ledger_path = os.getenv("LEAD_LEDGER_PATH", "leads.db")
+lead_ledger = LeadLedger(
+    path             = _ledger_path,
+    duplicate_window = float(os.getenv("LEAD_DUPLICATE_WINDOW", 86400)),
+) if _ledger_path else None
@@ -0,0 +1,241 @@
+"""
+lead_spool.py — Write-behind lead saving
+_save_and_confirm used to wait for a Google Sheets round trip per lead.
+Now a lead is written to a local SQLite spool (fsynced) and the customer gets
+their confirmation straight away. A background flusher groups spooled leads
+into ONE batched Sheets append per round and retries failures with backoff.
+
+Every lead gets a stable lead_id when spooled, and the flush is idempotent
+by it. A row whose append may or may not have reached Sheets is marked
+"in doubt": its round was interrupted (crash, kill — found still 'flushing'
+after its lease) or the append raised (e.g. a timeout after Google accepted
+it). Before an in-doubt lead is appended again, saved(lead_ids) asks the
+sheet which of them are already there; those are marked done, not re-sent.
+Without a saved() lookup, in-doubt leads are held in the spool (status
+'held', counted in stats) rather than risk a duplicate row.
+
+Tuning (environment variables):
+    LEAD_SPOOL_PATH      → SQLite spool file ("" = save synchronously) (default "leads_spool.db")
+    LEAD_FLUSH_INTERVAL  → Seconds between flush rounds               (default 2)
+    LEAD_FLUSH_BATCH     → Max leads per Sheets append                (default 50)
+    LEAD_FLUSH_LEASE     → Seconds before a stuck round is retried    (default 120)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable
+
+from sqlite_db import SQLiteDB
+
+
+LEAD_SPOOL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS lead_spool (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        lead        TEXT    NOT NULL,
+        status      TEXT    NOT NULL DEFAULT 'pending',
+        attempts    INTEGER NOT NULL DEFAULT 0,
+        due_at      REAL    NOT NULL,
+        created_at  REAL    NOT NULL,
+        flushed_at  REAL,
+        in_doubt    INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS lead_spool_due ON lead_spool(status, due_at);
+"""
+
+
+def _migrate(db):
+    # Spool files from before the in-doubt marker
+    columns = {row[1] for row in db.execute("PRAGMA table_info(lead_spool)")}
+    if "in_doubt" not in columns:
+        db.execute("ALTER TABLE lead_spool ADD COLUMN in_doubt INTEGER NOT NULL DEFAULT 0")
+
+
+class LeadSpool:
+    BACKOFF_BASE = 5.0       # seconds; doubles per failed round
+    BACKOFF_CAP  = 900.0
+    KEEP_DONE    = 7 * 86400   # seconds flushed rows are kept for reference
+
+    def __init__(self, path: str, write: Callable, interval: float = 2.0,
+                 batch: int = 50, lease: float = 120, saved: Callable | None = None):
+        """
+        write(leads) → how many leads (from the front) were saved.
+        saved(lead_ids) → the subset already in the sheet, or None if it can't tell.
+        """
+        self.path     = path
+        self.write    = write
+        self.saved    = saved
+        self.interval = interval
+        self.batch    = max(1, batch)
+        self.lease    = lease
+
+        self._db      = SQLiteDB(path, LEAD_SPOOL_SCHEMA, synchronous="FULL",   # a spooled lead must survive a crash
+                                 migrate=_migrate)
+        self._wake    = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.flushed      = 0
+        self.failures     = 0
+        self.skipped      = 0       # in-doubt leads found already in the sheet
+        self.flush_total  = 0.0     # seconds spent in Sheets appends
+        self.flush_max    = 0.0
+        self.flush_rounds = 0
+
+    # ── Request path ─────────────────────────────────────────────────────────
+    def enqueue(self, lead: dict) -> bool:
+        """Durably spool one lead. False only if the local write itself failed."""
+        lead = dict(lead)
+        lead.setdefault("lead_id", uuid.uuid4().hex[:12])
+        now = time.time()
+        try:
+            self._db.conn().execute(
+                "INSERT INTO lead_spool (lead, due_at, created_at) VALUES (?, ?, ?)",
+                (json.dumps(lead, ensure_ascii=False), now, now),
+            )
+        except sqlite3.Error as e:
+            print(f"❌ Lead spool write failed: {e}")
+            return False
+        self.start()
+        self._wake.set()
+        return True
+
+    # ── Flusher ──────────────────────────────────────────────────────────────
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lead-flusher",
+                                                daemon=True)
+                self._thread.start()
+
+    def _claim(self) -> list[tuple[int, dict, int, bool]]:
+        """Rows as (id, lead, attempts, in doubt)."""
+        db  = self._db.conn()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, lead, attempts, status, in_doubt FROM lead_spool"
+                " WHERE status IN ('pending', 'flushing') AND due_at <= ?"
+                " ORDER BY id LIMIT ?", (now, self.batch),
+            ).fetchall()
+            db.executemany(
+                "UPDATE lead_spool SET status = 'flushing', due_at = ?, attempts = attempts + 1"
+                " WHERE id = ?", [(now + self.lease, r[0]) for r in rows],
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        # Still 'flushing' → that round never finished and may have reached Sheets
+        return [(row_id, json.loads(lead), attempts, bool(in_doubt) or status == "flushing")
+                for row_id, lead, attempts, status, in_doubt in rows]
+
+    def _hold(self, rows: list[tuple]):
+        # No way to check the sheet: keep in-doubt leads back rather than duplicate them
+        for _, lead, _, _ in rows:
+            print(f"⚠️  Lead {lead.get('lead_id')} held: its last append may have"
+                  f" reached Sheets and the sheet can't be checked")
+        self._db.conn().executemany(
+            "UPDATE lead_spool SET status = 'held' WHERE id = ?", [(r[0],) for r in rows],
+        )
+
+    def flush_once(self) -> int:
+        """Push one batch to Sheets. Returns how many leads were saved (or found saved)."""
+        rows = self._claim()
+        if not rows:
+            return 0
+
+        # In-doubt leads already in the sheet are marked done, not appended again
+        doubtful = [r for r in rows if r[3]]
+        rows     = [r for r in rows if not r[3]]
+        skipped, retry = [], []
+        if doubtful:
+            try:
+                ids     = [r[1].get("lead_id") for r in doubtful]
+                present = self.saved(ids) if self.saved is not None else None
+            except Exception as e:
+                print(f"⚠️  Sheets lead lookup failed: {e}")
+                retry = doubtful
+            else:
+                if present is None:
+                    self._hold(doubtful)
+                else:
+                    skipped = [r for r in doubtful if r[1].get("lead_id") in present]
+                    rows   += [r for r in doubtful if r[1].get("lead_id") not in present]
+
+        start, raised, saved = time.monotonic(), False, 0
+        if rows:
+            try:
+                saved = max(0, min(len(rows), self.write([r[1] for r in rows])))
+            except Exception as e:
+                print(f"⚠️  Sheets batch append failed: {e}")
+                raised = True       # part of the batch may still have been appended
+        elapsed = time.monotonic() - start
+
+        db, now = self._db.conn(), time.time()
+        db.execute("BEGIN IMMEDIATE")
+        db.executemany(
+            "UPDATE lead_spool SET status = 'done', flushed_at = ?, in_doubt = 0 WHERE id = ?",
+            [(now, r[0]) for r in skipped + rows[:saved]],
+        )
+        db.executemany(
+            "UPDATE lead_spool SET status = 'pending', due_at = ?, in_doubt = ? WHERE id = ?",
+            [(now + min(self.BACKOFF_CAP, self.BACKOFF_BASE * 2 ** attempts),
+              int(raised or in_doubt), row_id)
+             for row_id, _, attempts, in_doubt in rows[saved:] + retry],
+        )
+        db.execute("COMMIT")
+
+        with self._stats_lock:
+            self.flushed      += saved
+            self.skipped      += len(skipped)
+            self.failures     += len(rows) - saved + len(retry)
+            self.flush_rounds += 1
+            self.flush_total  += elapsed
+            self.flush_max     = max(self.flush_max, elapsed)
+        if saved:
+            print(f"📊 Saved {saved} lead(s) to Google Sheets in {elapsed * 1000:.0f} ms")
+        if skipped:
+            print(f"📊 {len(skipped)} lead(s) were already in Google Sheets — not appended again")
+        return saved + len(skipped)
+
+    def _run(self):
+        pruned_at = 0.0
+        while True:
+            try:
+                while self.flush_once() == self.batch:
+                    pass      # full batch → more may be waiting
+                if time.monotonic() - pruned_at > 3600:
+                    pruned_at = time.monotonic()
+                    self._db.conn().execute(
+                        "DELETE FROM lead_spool WHERE status = 'done' AND flushed_at < ?",
+                        (time.time() - self.KEEP_DONE,),
+                    )
+            except Exception as e:
+                print(f"⚠️  Lead flush error: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stats(self) -> dict:
+        with self._db.shared() as db:
+            counts = dict(db.execute(
+                "SELECT status, COUNT(*) FROM lead_spool WHERE status != 'done' GROUP BY status"
+            ).fetchall())
+        held = counts.pop("held", 0)
+        with self._stats_lock:
+            rounds = self.flush_rounds
+            return {
+                "depth":            sum(counts.values()),
+                "held":             held,
+                "flushed":          self.flushed,
+                "skipped":          self.skipped,
+                "failures":         self.failures,
+                "flush_avg_ms":     round(1000 * self.flush_total / rounds, 2) if rounds else 0.0,
+                "flush_max_ms":     round(1000 * self.flush_max, 2),
+            }
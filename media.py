@@ -0,0 +1,240 @@
+"""
+media.py — Customer document uploads (NRC, payslips, bank statements)
+An image or document message only carries a media id. Getting the file takes
+two Graph API calls, off the webhook path on a small bounded pool:
+
+    GET {API_URL}/{media_id}   → {"url", "mime_type", "sha256", "file_size"}
+    GET url (same bearer token) → the bytes, streamed in MEDIA_CHUNK_SIZE
+                                  chunks to a .part file and hashed as they
+                                  arrive — a 20 MB statement never sits in memory
+
+Files are stored by content: MEDIA_DIR/<sha256>.<ext>. The folder is the
+dedup index — the same payslip sent twice (or by two customers) is one file,
+and when Meta's webhook already tells us the hash of a file we have, nothing
+is downloaded at all.
+
+submit() starts the download straight away and returns a Future; ingest.py
+has the dispatcher queue bot_flow's handler on the customer's lane once it
+finishes, so dispatcher workers never wait on a download.
+
+Tuning (environment variables):
+    MEDIA_DIR          → Folder for uploaded files (empty = uploads ignored)  (default "media")
+    MEDIA_WORKERS      → Downloads running at once                          (default 2)
+    MEDIA_MAX_PENDING  → Downloads queued or running before 503 to Meta     (default 50)
+    MEDIA_MAX_BYTES    → Largest file accepted                              (default 20 MB)
+    MEDIA_CHUNK_SIZE   → Bytes read and written per chunk                   (default 65536)
+    WHATSAPP_* timeouts and WHATSAPP_API_URL apply as in whatsapp.py
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from whatsapp import API_URL, HEADERS, TIMEOUT
+from metrics import stage
+
+# What customers send us → stored extension. Anything else is turned away.
+EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "image/jpeg":      ".jpg",
+    "image/png":       ".png",
+    "image/webp":      ".webp",
+    "image/heic":      ".heic",
+}
+
+
+class MediaError(Exception):
+    """A download that did not produce a file. reason → what we tell the customer."""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason      # "unsupported" | "too_large" | "failed"
+
+
+def _hex_digest(value: str | None) -> str | None:
+    """Meta's sha256 field as lowercase hex (it may arrive hex or base64)."""
+    if not value:
+        return None
+    value = value.strip()
+    if len(value) == 64:
+        try:
+            bytes.fromhex(value)
+            return value.lower()
+        except ValueError:
+            pass
+    try:
+        raw = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return raw.hex() if len(raw) == 32 else None
+
+
+class MediaStore:
+    def __init__(self, folder: str, workers: int = 2, max_pending: int = 50,
+                 max_bytes: int = 20 * 1024 * 1024, chunk_size: int = 64 * 1024):
+        self.folder      = folder
+        self.workers     = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.max_bytes   = max_bytes
+        self.chunk_size  = max(1024, chunk_size)
+        os.makedirs(folder, exist_ok=True)
+
+        # Its own connection pool: media URLs live on a different host, and
+        # sharing whatsapp.http (one host pool) would evict the Graph API's
+        # keep-alive connections on every download.
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.workers)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        self.http.headers.update({"Authorization": HEADERS["Authorization"]})
+
+        self._pool    = None            # started on first upload
+        self._lock    = threading.Lock()
+        self._pending = 0
+
+        self.downloaded  = 0
+        self.deduped     = 0            # already stored (by Meta's hash or ours)
+        self.bytes       = 0            # bytes downloaded
+        self.failed      = 0
+        self.refused     = 0            # unsupported type / too large
+        self.rejected    = 0            # pool full → Meta redelivers
+
+    # ── Pool ─────────────────────────────────────────────────────────────────
+    def submit(self, media: dict) -> Future | None:
+        """Start fetching `media` (see ingest.extract_media). None → pool full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return None
+            self._pending += 1
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="media")
+        future = self._pool.submit(self.fetch, media)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    # ── One upload ───────────────────────────────────────────────────────────
+    def fetch(self, media: dict) -> dict:
+        """
+        Resolve, download and store one upload. Returns the stored file:
+        {"sha256", "path", "mime_type", "size", "filename", "kind"}.
+        Raises MediaError if there is nothing to store.
+        """
+        mime = (media.get("mime_type") or "").split(";")[0].strip().lower()
+        ext  = EXTENSIONS.get(mime)
+        if ext is None:
+            self._count("refused")
+            raise MediaError("unsupported", mime or "no mime type")
+
+        # Meta told us the hash and we already have that file → no download
+        known = _hex_digest(media.get("sha256"))
+        if known and os.path.exists(self._path(known, ext)):
+            self._count("deduped")
+            return self._stored(media, mime, known, ext)
+
+        with stage("media_download"):
+            digest, size = self._download(media["id"], ext, known)
+        self._count("downloaded", nbytes=size)
+        return self._stored(media, mime, digest, ext, size)
+
+    def _download(self, media_id: str, ext: str, known: str | None) -> tuple[str, int]:
+        try:
+            r = self.http.get(f"{API_URL}/{media_id}", timeout=TIMEOUT)
+            info = r.json() if r.status_code == 200 else {}
+        except (requests.RequestException, ValueError) as e:
+            self._count("failed")
+            raise MediaError("failed", f"resolve {media_id}: {e}") from e
+        url = info.get("url")
+        if not url:
+            self._count("failed")
+            raise MediaError("failed", f"resolve {media_id}: HTTP {r.status_code}")
+        if int(info.get("file_size") or 0) > self.max_bytes:
+            self._count("refused")
+            raise MediaError("too_large", f"{info['file_size']} bytes")
+
+        part = os.path.join(self.folder, f".{media_id}.{threading.get_ident()}.part")
+        sha  = hashlib.sha256()
+        size = 0
+        try:
+            with self.http.get(url, stream=True, timeout=TIMEOUT) as r, open(part, "wb") as f:
+                if r.status_code != 200:
+                    raise MediaError("failed", f"download {media_id}: HTTP {r.status_code}")
+                for chunk in r.iter_content(self.chunk_size):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        # file_size was missing or wrong — stop reading
+                        self._count("refused")
+                        raise MediaError("too_large", f"over {self.max_bytes} bytes")
+                    sha.update(chunk)
+                    f.write(chunk)
+
+            digest = sha.hexdigest()
+            if known and digest != known:
+                raise MediaError("failed", f"download {media_id}: sha256 mismatch")
+            final = self._path(digest, ext)
+            if os.path.exists(final):
+                self._count("deduped")
+            else:
+                os.replace(part, final)     # atomic: a half-written file is never visible
+            return digest, size
+        except MediaError as e:
+            if e.reason == "failed":
+                self._count("failed")
+            raise
+        except (requests.RequestException, OSError) as e:
+            self._count("failed")
+            raise MediaError("failed", f"download {media_id}: {e}") from e
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+
+    def _path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.folder, digest + ext)
+
+    def _stored(self, media: dict, mime: str, digest: str, ext: str, size: int | None = None) -> dict:
+        path = self._path(digest, ext)
+        return {
+            "sha256":    digest,
+            "path":      path,
+            "mime_type": mime,
+            "size":      size if size is not None else os.path.getsize(path),
+            "filename":  media.get("filename") or f"{media.get('type', 'file')}{ext}",
+            "kind":      media.get("type", "document"),
+        }
+
+    def _count(self, name: str, nbytes: int = 0):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self.bytes += nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending":    self._pending,
+                "downloaded": self.downloaded,
+                "deduped":    self.deduped,
+                "bytes":      self.bytes,
+                "failed":     self.failed,
+                "refused":    self.refused,
+                "rejected":   self.rejected,
+            }
+
+
+_media_dir = os.getenv("MEDIA_DIR", "media")
+media_store = MediaStore(
+    folder      = _media_dir,
+    workers     = int(os.getenv("MEDIA_WORKERS", 2)),
+    max_pending = int(os.getenv("MEDIA_MAX_PENDING", 50)),
+    max_bytes   = int(os.getenv("MEDIA_MAX_BYTES", 20 * 1024 * 1024)),
+    chunk_size  = int(os.getenv("MEDIA_CHUNK_SIZE", 64 * 1024)),
+) if _media_dir else None
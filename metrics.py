@@ -0,0 +1,228 @@
+"""
+metrics.py — Per-stage latency histograms, counters and gauges for /metrics
+Cheap enough to leave on: recording a stage is two perf_counter() calls, one
+bisect and two short lock holds — microseconds per message in total
+(measure with benchmarks/bench_metrics.py).
+
+    with stage("gemini"):            → xtenda_stage_seconds{stage="gemini"}
+        ...                            xtenda_stage_in_flight{stage="gemini"}
+    MESSAGES.inc("ai_mode")          → xtenda_bot_messages_total{state="ai_mode"}
+    collect("dispatcher", fn)        → every number in fn() as a gauge at scrape time
+
+render() produces the Prometheus text format. Each gunicorn worker keeps its
+own numbers, so a scrape sees the worker that answered it.
+
+Tuning (environment variables):
+    METRICS_ENABLED  → "0" turns recording off and /metrics returns 404   (default on)
+"""
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+
+ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+PREFIX  = "xtenda_"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NAME_JUNK = re.compile(r"[^a-zA-Z0-9_]+")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _label_text(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = PREFIX + name, help, labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(self.labelnames, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = PREFIX + name, help, labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels → [count per bucket (last = +Inf)..., sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        if not ENABLED:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._add(labels, i, value)
+
+    def _add(self, labels: tuple, i: int, value: float):
+        # Called with the lock held
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[i]  += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series):
+                running += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                text = _label_text(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{text} {running}")
+            text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{text} {series[-1]!r}")
+            lines.append(f"{self.name}_count{text} {running}")
+        return lines
+
+
+class StageTimer(Histogram):
+    """Latency histogram + in-flight gauge per stage, sharing one lock."""
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help, ("stage",))
+        self._in_flight: dict[tuple, int] = {}
+
+    def enter(self, key: tuple):
+        with self._lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+
+    def exit(self, key: tuple, elapsed: float):
+        i = bisect_left(self.buckets, elapsed)
+        with self._lock:
+            self._in_flight[key] -= 1
+            self._add(key, i, elapsed)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._in_flight.items())
+        gauge = PREFIX + "stage_in_flight"
+        lines += [f"# HELP {gauge} Calls currently inside each stage", f"# TYPE {gauge} gauge"]
+        lines += [f"{gauge}{_label_text(self.labelnames, k)} {v}" for k, v in items]
+        return lines
+
+
+# ── The bot's metrics ────────────────────────────────────────────────────────
+STAGES        = StageTimer("stage_seconds", "Time spent per processing stage")
+MESSAGES      = Counter("bot_messages_total", "Inbound messages by conversation state", ("state",))
+SENT          = Counter("whatsapp_messages_total", "Outbound messages by type", ("kind",))
+ANSWERS       = Counter("bot_answers_total", "Free-text answers by source", ("source",))
+
+_METRICS: list = [STAGES, MESSAGES, SENT, ANSWERS]
+_collectors: list[tuple[str, Callable[[], dict]]] = []
+
+
+def register(metric):
+    """Add a metric defined elsewhere (e.g. delivery.py) to /metrics."""
+    _METRICS.append(metric)
+    return metric
+
+
+class _Stage:
+    __slots__ = ("key", "start")
+
+    def __init__(self, name: str):
+        self.key = (name,)
+
+    def __enter__(self):
+        STAGES.enter(self.key)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGES.exit(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """Context manager timing one stage (webhook, handler, graph_send, gemini, sheets…)."""
+    return _Stage(name) if ENABLED else _NO_STAGE
+
+
+def collect(component: str, stats: Callable[[], dict]):
+    """Expose every number in stats() as xtenda_<component>_<key> gauges at scrape time."""
+    _collectors.append((component, stats))
+
+
+def _flatten(prefix: str, value, out: list[str]):
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            _flatten(f"{prefix}_{key}", inner, out)
+    elif isinstance(value, (int, float)):      # bools count too; strings are skipped
+        name = PREFIX + _NAME_JUNK.sub("_", prefix).strip("_")
+        out.append(f"# TYPE {name} gauge")
+        out.append(f"{name} {_number(value if not isinstance(value, bool) else int(value))}")
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in _METRICS:
+        lines += metric.render()
+    for component, stats in _collectors:
+        try:
+            _flatten(component, stats(), lines)
+        except Exception as e:
+            print(f"⚠️  Metrics collector '{component}' failed: {e}")
+    return "\n".join(lines) + "\n"
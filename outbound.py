@@ -0,0 +1,293 @@
+"""
+outbound.py — Rate-limited, prioritised send queue for the Graph API
+Meta limits how many messages per second each business phone number may send.
+Every send goes through a token bucket per PHONE_NUMBER_ID, and a priority
+queue makes sure replies to live conversations go out before bulk traffic.
+
+Priorities (lower number = sent first):
+    INTERACTIVE → Replies to a customer who is chatting right now
+    FOLLOW_UP   → Reminders, confirmations sent later
+    BULK        → Campaigns
+
+When Meta answers 429 / error 130429 (rate limit hit) the job is put back in
+the queue, the phone number pauses with exponential backoff and its rate is
+halved; it climbs back to the configured rate as sends succeed again.
+
+Tuning (environment variables):
+    OUTBOUND_RATE         → Messages/sec per phone number id  (default 80, 0 = off)
+    OUTBOUND_BURST        → Bucket size (short bursts)        (default 20)
+    OUTBOUND_SENDERS      → Sender threads                    (default WHATSAPP_POOL_SIZE)
+    OUTBOUND_MAX_RETRIES  → Rate-limit retries before giving up (default 5)
+
+AsyncOutboundScheduler is the same queue on an event loop (asgi.py): sender
+tasks instead of threads, a coroutine send(), awaitable submit().
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+INTERACTIVE = 0
+FOLLOW_UP   = 1
+BULK        = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", FOLLOW_UP: "follow_up", BULK: "bulk"}
+
+# Graph API error codes meaning "slow down"
+RATE_LIMIT_CODES = {4, 80007, 130429, 131048, 131056}
+
+
+class TokenBucket:
+    """Classic token bucket with an adjustable rate (AIMD on rate limits)."""
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate    = rate
+        self.rate        = rate
+        self.burst       = max(1, burst)
+        self.tokens      = float(self.burst)
+        self.updated     = time.monotonic()
+        self.pause_until = 0.0
+        self.strikes     = 0          # consecutive rate-limit responses
+        self._lock       = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token → 0.0, or the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.pause_until:
+                return self.pause_until - now
+            self.tokens  = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until one token is available."""
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+    def throttled(self, base: float = 1.0, cap: float = 60.0) -> float:
+        """Meta said slow down → pause with exponential backoff, halve the rate."""
+        with self._lock:
+            self.strikes += 1
+            delay = min(cap, base * 2 ** (self.strikes - 1)) * random.uniform(0.8, 1.2)
+            self.pause_until = max(self.pause_until, time.monotonic() + delay)
+            self.rate   = max(1.0, self.rate / 2)
+            self.tokens = 0.0
+            return delay
+
+    def succeeded(self):
+        with self._lock:
+            self.strikes = 0
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class _Job:
+    __slots__ = ("sender_id", "payload", "priority", "enqueued", "attempts",
+                 "done", "result")
+
+    def __init__(self, sender_id: str, payload, priority: int):
+        self.sender_id = sender_id
+        self.payload   = payload
+        self.priority  = priority
+        self.enqueued  = time.monotonic()
+        self.attempts  = 0
+        self.done      = threading.Event()
+        self.result    = None
+
+
+class OutboundScheduler:
+    """
+    send(sender_id, payload) → (status, body) does the actual HTTP call.
+    submit() queues a payload, blocks until it has been sent and returns
+    the same (status, body).
+    """
+
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, send: Callable, rate: float = 80, burst: int = 20,
+                 senders: int = 8, max_retries: int = 5):
+        self._send       = send
+        self.rate        = rate
+        self.burst       = burst
+        self.senders     = max(1, senders)
+        self.max_retries = max_retries
+
+        self._buckets: dict[str, TokenBucket] = {}
+        self._heap: list = []
+        self._seq  = itertools.count()
+        self._lock = threading.Lock()
+        self._has_jobs = threading.Condition(self._lock)
+        self._threads: list[threading.Thread] = []
+
+        # Queue latency (enqueue → first send attempt), per priority
+        self._latency = {p: deque(maxlen=self.LATENCY_SAMPLES) for p in PRIORITY_NAMES}
+        self.sent         = 0
+        self.rate_limited = 0
+        self.gave_up      = 0
+
+    def _bucket(self, sender_id: str) -> TokenBucket:
+        bucket = self._buckets.get(sender_id)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(sender_id,
+                                                  TokenBucket(self.rate, self.burst))
+        return bucket
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.senders):
+                t = threading.Thread(target=self._run, name=f"outbound-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, sender_id: str, payload, priority: int = INTERACTIVE):
+        """Queue payload and wait for Meta's answer."""
+        if not self._threads:
+            self._start()
+        job = _Job(sender_id, payload, priority)
+        self._push(job, next(self._seq))
+        job.done.wait()
+        return job.result
+
+    def _push(self, job: _Job, seq: int):
+        with self._lock:
+            heapq.heappush(self._heap, (job.priority, seq, job))
+            self._has_jobs.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._has_jobs.wait_for(lambda: self._heap)
+                _, seq, job = heapq.heappop(self._heap)
+
+            bucket = self._bucket(job.sender_id)
+            bucket.acquire()
+            if job.attempts == 0:
+                self._latency[job.priority].append(time.monotonic() - job.enqueued)
+            job.attempts += 1
+
+            try:
+                status, body = self._send(job.sender_id, job.payload)
+            except Exception as e:
+                print(f"❌ Outbound send error: {e}")
+                status, body = "error", {"error": {"message": str(e)}}
+
+            if self._retry(job, seq, bucket, status, body):
+                continue
+            job.result = (status, body)
+            job.done.set()
+
+    def _retry(self, job: _Job, seq: int, bucket: TokenBucket, status, body) -> bool:
+        """Book-keeping after one attempt. True → rate limited and queued again."""
+        error_code = body.get("error", {}).get("code") if isinstance(body, dict) else None
+        if status == 429 or error_code in RATE_LIMIT_CODES:
+            with self._lock:
+                self.rate_limited += 1
+            if job.attempts <= self.max_retries:
+                delay = bucket.throttled()
+                print(f"🐢 Rate limited on {job.sender_id} — backing off {delay:.1f}s "
+                      f"(now {bucket.rate:.1f} msg/s)")
+                self._push(job, seq)     # same seq → keeps its place in line
+                return True
+            with self._lock:
+                self.gave_up += 1
+            print(f"❌ Gave up after {job.attempts} rate-limited attempts")
+        else:
+            bucket.succeeded()
+            with self._lock:
+                self.sent += 1
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            depth = {PRIORITY_NAMES[p]: 0 for p in PRIORITY_NAMES}
+            for p, _, _ in self._heap:
+                depth[PRIORITY_NAMES[p]] += 1
+        latency = {}
+        for p, samples in self._latency.items():
+            s = sorted(samples)
+            latency[PRIORITY_NAMES[p]] = {
+                "p50_ms": round(1000 * s[len(s) // 2], 2) if s else 0.0,
+                "p95_ms": round(1000 * s[int(len(s) * 0.95)], 2) if s else 0.0,
+                "max_ms": round(1000 * s[-1], 2) if s else 0.0,
+            }
+        return {
+            "queued":        depth,
+            "queue_latency": latency,
+            "sent":          self.sent,
+            "rate_limited":  self.rate_limited,
+            "gave_up":       self.gave_up,
+            "current_rate":  {k: round(b.rate, 2) for k, b in self._buckets.items()},
+        }
+
+
+class AsyncOutboundScheduler(OutboundScheduler):
+    """
+    send(sender_id, payload) is a coroutine here; `senders` tasks drain the
+    queue and `await submit()` returns (status, body). Everything runs on
+    one event loop, so a job's done signal is an asyncio future.
+    """
+
+    def __init__(self, send: Callable, rate: float = 80, burst: int = 20,
+                 senders: int = 8, max_retries: int = 5):
+        super().__init__(send, rate, burst, senders, max_retries)
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._run_async()) for _ in range(self.senders)]
+
+    async def submit(self, sender_id: str, payload, priority: int = INTERACTIVE):
+        if not self._tasks:
+            self._start()
+        job = _Job(sender_id, payload, priority)
+        job.done = asyncio.get_running_loop().create_future()
+        self._push(job, next(self._seq))
+        return await job.done
+
+    def _push(self, job: _Job, seq: int):
+        with self._lock:
+            heapq.heappush(self._heap, (job.priority, seq, job))
+        self._wakeup.set()
+
+    async def _run_async(self):
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            with self._lock:
+                _, seq, job = heapq.heappop(self._heap)
+
+            bucket = self._bucket(job.sender_id)
+            await bucket.acquire_async()
+            if job.attempts == 0:
+                self._latency[job.priority].append(time.monotonic() - job.enqueued)
+            job.attempts += 1
+
+            try:
+                status, body = await self._send(job.sender_id, job.payload)
+            except Exception as e:
+                print(f"❌ Outbound send error: {e}")
+                status, body = "error", {"error": {"message": str(e)}}
+
+            if self._retry(job, seq, bucket, status, body):
+                continue
+            job.result = (status, body)
+            if not job.done.done():      # the caller may have been cancelled
+                job.done.set_result(job.result)
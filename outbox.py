@@ -0,0 +1,263 @@
+"""
+outbox.py — Durable outbox for WhatsApp sends that must not be lost
+A send is written to a local SQLite file FIRST, then background workers
+deliver it. Transient failures are retried with exponential backoff; after
+OUTBOX_MAX_ATTEMPTS (or a permanent 4xx error) the message moves to the
+dead-letter table for a human to look at.
+
+Row life cycle:
+    pending → sending → sent            (delivered, never sent again)
+                      ↘ pending         (transient failure, retried later)
+                      ↘ outbox_dead     (gave up)
+
+Crash safety: rows marked "sent" are never replayed. A row left in "sending"
+by a crashed process is only picked up again once its lease expires — that
+small window is the one case where a message may be delivered twice. A batch
+is claimed under one lease but each row's lease is renewed (compare-and-set)
+just before its send, so a slow batch never races a drainer that re-claimed
+its expired rows.
+
+Tuning (environment variables):
+    OUTBOX_DB_PATH       → SQLite file ("" disables the outbox)  (default "outbox.db")
+    OUTBOX_WORKERS       → Drain threads                         (default 1)
+    OUTBOX_BATCH         → Rows claimed per drain round          (default 20)
+    OUTBOX_MAX_ATTEMPTS  → Attempts before dead-lettering        (default 6)
+    OUTBOX_LEASE         → Seconds before a stuck row is retried (default 120)
+    OUTBOX_KEEP_SENT     → Seconds delivered rows are kept       (default 604800)
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+from sqlite_db import SQLiteDB
+
+# HTTP statuses worth retrying; other 4xx are permanent (bad number, bad payload…)
+RETRYABLE = {"timeout", "network", "error", 429, 500, 502, 503, 504}
+
+
+OUTBOX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        payload     TEXT    NOT NULL,
+        priority    INTEGER NOT NULL,
+        kind        TEXT    NOT NULL DEFAULT 'other',
+        status      TEXT    NOT NULL DEFAULT 'pending',
+        attempts    INTEGER NOT NULL DEFAULT 0,
+        due_at      REAL    NOT NULL,
+        created_at  REAL    NOT NULL,
+        sent_at     REAL,
+        wa_id       TEXT,
+        last_error  TEXT
+    );
+    CREATE INDEX IF NOT EXISTS outbox_due ON outbox(status, due_at, priority);
+    CREATE TABLE IF NOT EXISTS outbox_dead (
+        id          INTEGER PRIMARY KEY,
+        payload     TEXT    NOT NULL,
+        attempts    INTEGER NOT NULL,
+        created_at  REAL    NOT NULL,
+        failed_at   REAL    NOT NULL,
+        last_error  TEXT
+    );
+"""
+
+
+def _migrate(db):
+    # Outbox files from before messages kept their kind (for delivery.py)
+    columns = {row[1] for row in db.execute("PRAGMA table_info(outbox)")}
+    if "kind" not in columns:
+        db.execute("ALTER TABLE outbox ADD COLUMN kind TEXT NOT NULL DEFAULT 'other'")
+
+
+class Outbox:
+    POLL_INTERVAL = 1.0      # seconds between checks for due retries
+    BACKOFF_BASE  = 2.0      # seconds; doubles every attempt
+    BACKOFF_CAP   = 600.0
+    PRUNE_INTERVAL = 300.0   # seconds between clean-ups of delivered rows
+
+    def __init__(self, path: str, deliver: Callable, workers: int = 1, batch: int = 20,
+                 max_attempts: int = 6, lease: float = 120, keep_sent: float = 604800):
+        """deliver(payload, priority, kind) → (status, body) sends one message."""
+        self.path         = path
+        self.deliver      = deliver
+        self.workers      = max(1, workers)
+        self.batch        = max(1, batch)
+        self.max_attempts = max(1, max_attempts)
+        self.lease        = lease
+        self.keep_sent    = keep_sent
+        self._pruned_at   = 0.0
+
+        self._db      = SQLiteDB(path, OUTBOX_SCHEMA, synchronous="FULL",   # enqueue must survive a crash
+                                 migrate=_migrate)
+        self._wake    = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+    # ── Producer side (request path: one small INSERT) ───────────────────────
+    def enqueue(self, payload, priority: int, kind: str = "other") -> int:
+        if isinstance(payload, bytes):
+            payload = payload.decode()
+        elif not isinstance(payload, str):
+            payload = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        now = time.time()
+        cur = self._db.conn().execute(
+            "INSERT INTO outbox (payload, priority, kind, due_at, created_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (payload, priority, kind, now, now),
+        )
+        self._ensure_workers()
+        self._wake.set()
+        return cur.lastrowid
+
+    # ── Worker side ──────────────────────────────────────────────────────────
+    def _ensure_workers(self):
+        if self._threads and all(t.is_alive() for t in self._threads):
+            return
+        with self._start_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                t = threading.Thread(target=self._run, name=f"outbox-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def start(self):
+        """Drain leftovers from a previous run without waiting for a new send."""
+        self._ensure_workers()
+
+    def _claim(self) -> list[tuple]:
+        """Atomically mark up to `batch` due rows as ours, all under one lease."""
+        db  = self._db.conn()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, payload, priority, kind, attempts FROM outbox"
+                " WHERE (status = 'pending' AND due_at <= ?)"
+                "    OR (status = 'sending' AND due_at <= ?)"     # lease expired
+                " ORDER BY priority, id LIMIT ?",
+                (now, now, self.batch),
+            ).fetchall()
+            if rows:
+                db.executemany(
+                    "UPDATE outbox SET status = 'sending', due_at = ?, attempts = attempts + 1"
+                    " WHERE id = ?",
+                    [(now + self.lease, r[0]) for r in rows],
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return [(*r, now + self.lease) for r in rows]
+
+    def _renew(self, db, row_id: int, lease: float) -> float | None:
+        """
+        Extend our lease on one row right before sending it. The batch is sent
+        one row at a time, so by the time we reach a row its lease may have
+        run out and another drain thread (or worker) may have claimed it —
+        the compare on due_at tells us, and we leave the row to them.
+        """
+        renewed = time.time() + self.lease
+        cur = db.execute(
+            "UPDATE outbox SET due_at = ? WHERE id = ? AND status = 'sending' AND due_at = ?",
+            (renewed, row_id, lease),
+        )
+        return renewed if cur.rowcount else None
+
+    def drain_once(self) -> int:
+        """Claim and send one batch. Returns how many rows were processed."""
+        rows = self._claim()
+        if not rows:
+            return 0
+        db = self._db.conn()
+        retries, dead = [], []
+
+        for row_id, payload, priority, kind, attempts, lease in rows:
+            lease = self._renew(db, row_id, lease)
+            if lease is None:
+                continue        # lease lost: another drainer owns this row now
+            attempts += 1
+            status, body = self.deliver(payload, priority, kind)
+
+            # Every write-back below only touches the row while our lease still
+            # holds: a send can outlive it (e.g. the scheduler backing off on
+            # 429s) and by then another drainer may own — or have sent — it.
+            if status == 200 and "messages" in body:
+                # Mark delivered immediately — this is what prevents replays
+                cur = db.execute(
+                    "UPDATE outbox SET status = 'sent', sent_at = ?, wa_id = ?"
+                    " WHERE id = ? AND status = 'sending' AND due_at = ?",
+                    (time.time(), body["messages"][0].get("id"), row_id, lease),
+                )
+                if not cur.rowcount:
+                    print(f"⚠️  Outbox message {row_id} sent after its lease ran out")
+                continue
+
+            error = json.dumps(body.get("error", body))[:500]
+            if status in RETRYABLE and attempts < self.max_attempts:
+                delay = min(self.BACKOFF_CAP, self.BACKOFF_BASE * 2 ** (attempts - 1))
+                retries.append((time.time() + delay, error, row_id, lease))
+            else:
+                dead.append((row_id, lease, error))
+
+        # Failures are written back in one transaction per batch
+        if retries or dead:
+            buried = []
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "UPDATE outbox SET status = 'pending', due_at = ?, last_error = ?"
+                " WHERE id = ? AND status = 'sending' AND due_at = ?",
+                retries,
+            )
+            now = time.time()
+            for row_id, lease, error in dead:
+                db.execute(
+                    "INSERT OR REPLACE INTO outbox_dead"
+                    " (id, payload, attempts, created_at, failed_at, last_error)"
+                    " SELECT id, payload, attempts, created_at, ?, ? FROM outbox"
+                    " WHERE id = ? AND status = 'sending' AND due_at = ?",
+                    (now, error, row_id, lease),
+                )
+                cur = db.execute(
+                    "DELETE FROM outbox WHERE id = ? AND status = 'sending' AND due_at = ?",
+                    (row_id, lease),
+                )
+                if cur.rowcount:
+                    buried.append((row_id, error))
+            db.execute("COMMIT")
+            for row_id, error in buried:
+                print(f"☠️  Outbox message {row_id} dead-lettered: {error}")
+        return len(rows)
+
+    def prune(self) -> int:
+        """Forget delivered rows older than keep_sent."""
+        cur = self._db.conn().execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+            (time.time() - self.keep_sent,),
+        )
+        return cur.rowcount
+
+    def _run(self):
+        while True:
+            try:
+                while self.drain_once():
+                    pass
+                if time.monotonic() - self._pruned_at > self.PRUNE_INTERVAL:
+                    self._pruned_at = time.monotonic()
+                    self.prune()
+            except Exception as e:
+                print(f"⚠️  Outbox drain error: {e}")
+            self._wake.wait(self.POLL_INTERVAL)
+            self._wake.clear()
+
+    def stats(self) -> dict:
+        with self._db.shared() as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            dead   = db.execute("SELECT COUNT(*) FROM outbox_dead").fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "sending": counts.get("sending", 0),
+            "sent":    counts.get("sent", 0),
+            "dead":    dead,
+        }
@@ -0,0 +1,57 @@
+"""
+payload_templates.py — Pre-serialized WhatsApp payloads
+The menus and button prompts never change, so they are JSON-encoded ONCE at
+import time. Per send we only splice in the few per-customer values (the
+recipient number, the greeting name) — no dict building, no json.dumps of
+the whole payload.
+
+Usage:
+    MENU = PayloadTemplate({"to": slot("to"), "text": {"body": f"Hi {slot('name')}!"}})
+    MENU.render(to="260971234567", name="Chanda")   → bytes, ready to POST
+"""
+
+import json
+import re
+
+_SLOT = re.compile(r"@@(\w+)@@")
+_NEEDS_ESCAPE = re.compile(r'["\\\x00-\x1f]')
+
+
+def slot(name: str) -> str:
+    """Placeholder for a value filled in at render time."""
+    return f"@@{name}@@"
+
+
+def message_kind(payload: dict) -> str:
+    """"text", "list", "buttons", ... — the label used in metrics."""
+    if payload.get("type") == "interactive":
+        kind = payload.get("interactive", {}).get("type", "interactive")
+        return "buttons" if kind == "button" else kind
+    return payload.get("type", "other")
+
+
+def _escape(value: str) -> str:
+    # JSON string escaping without the surrounding quotes (phone numbers and
+    # most names need none, so skip json.dumps for them)
+    if not _NEEDS_ESCAPE.search(value):
+        return value
+    return json.dumps(value, ensure_ascii=False)[1:-1]
+
+
+class PayloadTemplate:
+    __slots__ = ("_chunks", "_slots", "kind")
+
+    def __init__(self, payload: dict):
+        self.kind    = message_kind(payload)
+        encoded = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        parts   = _SLOT.split(encoded)
+        # parts = [literal, slot, literal, slot, ..., literal]
+        self._chunks = [p.encode() for p in parts[0::2]]
+        self._slots  = parts[1::2]
+
+    def render(self, **values) -> bytes:
+        out = [self._chunks[0]]
+        for name, chunk in zip(self._slots, self._chunks[1:]):
+            out.append(_escape(values[name]).encode())
+            out.append(chunk)
+        return b"".join(out)
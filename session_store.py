@@ -0,0 +1,340 @@
+"""
+session_store.py — Where conversation sessions live between messages
+bot_flow does ONE keyed load and ONE save per incoming message.
+
+Backends:
+    memory  → Dict in this process (default; single gunicorn worker).
+              Bounded: idle sessions expire and the least recently used
+              session is evicted once the cap is reached.
+    sqlite  → One SQLite file in WAL mode, shared by every worker on the host.
+              Each session is its own row (JSON), so a save rewrites one row only.
+              A message is handled under a per-phone lease (load → route →
+              save), so two workers never overwrite each other's update for
+              the same customer; the second one waits for the first.
+
+Choose with environment variables:
+    SESSION_STORE           → "memory" or "sqlite"            (default "memory")
+    SESSION_DB_PATH         → SQLite file for "sqlite"        (default "sessions.db")
+    SESSION_TTL             → Seconds idle before expiry      (default 86400)
+    SESSION_MAX             → Max sessions kept in memory     (default 50000)
+    SESSION_SWEEP_INTERVAL  → Seconds between expiry sweeps   (default 60)
+    SESSION_LEASE           → Seconds a worker may hold a phone's session (sqlite) (default 60)
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from enum import Enum
+
+from sqlite_db import SQLiteDB
+
+
+# ── Conversation states ─────────────────────────────────────────────────────
+class State(str, Enum):
+    IDLE                        = "idle"
+    AWAITING_LOAN_TYPE          = "awaiting_loan_type"
+    AWAITING_AMOUNT             = "awaiting_amount"
+    AWAITING_EMPLOYMENT         = "awaiting_employment"
+    AWAITING_NAME               = "awaiting_name"
+    AWAITING_CALLBACK_TIME      = "awaiting_callback_time"
+    AWAITING_CALLBACK_NAME      = "awaiting_callback_name"
+    AWAITING_CALLBACK_TIME_ONLY = "awaiting_callback_time_only"
+    AI_MODE                     = "ai_mode"
+    FINDING_CONSULTANT          = "finding_consultant"
+
+
+class Session:
+    """One customer's conversation. __slots__ keeps each instance small."""
+
+    __slots__ = ("state", "lead", "name")
+
+    def __init__(self, name: str, state: State = State.IDLE, lead: dict | None = None):
+        self.state = state
+        self.lead  = lead if lead is not None else {}
+        self.name  = name
+
+    def reset(self, name: str):
+        self.state = State.IDLE
+        self.lead  = {}
+        self.name  = name
+
+    def to_dict(self) -> dict:
+        return {"state": self.state.value, "lead": self.lead, "name": self.name}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Session":
+        try:
+            state = State(data.get("state", "idle"))
+        except ValueError:
+            state = State.IDLE      # state renamed/removed since it was stored
+        return cls(data.get("name", ""), state, data.get("lead") or {})
+
+    def size_bytes(self) -> int:
+        """Rough footprint: the object, its strings and the lead dict."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.name) + sys.getsizeof(self.lead)
+        for k, v in self.lead.items():
+            size += sys.getsizeof(k) + sys.getsizeof(v)
+        return size
+
+
+# ── Backends ────────────────────────────────────────────────────────────────
+class SessionStore:
+    """Interface every backend implements."""
+
+    LEASE_POLL     = 0.02    # seconds between tries while another worker holds a lease
+    SHARED         = False   # sessions shared between processes → leases needed
+    sweep_interval = 60.0
+
+    _sweeper: threading.Thread | None = None
+
+    def load(self, phone: str) -> Session | None:
+        raise NotImplementedError
+
+    def save(self, phone: str, session: Session):
+        raise NotImplementedError
+
+    def delete(self, phone: str):
+        raise NotImplementedError
+
+    def acquire(self, phone: str) -> str | None:
+        """
+        Try to take this phone's lease for one load → save. Returns a token
+        for release(), or None while another worker holds it. Backends used
+        by a single process rely on the dispatcher's per-sender lanes instead.
+        """
+        return ""
+
+    def release(self, phone: str, token: str):
+        pass
+
+    @contextmanager
+    def leased(self, phone: str):
+        """Hold this phone's lease for the block, waiting for it if needed."""
+        token = self.acquire(phone)
+        while token is None:
+            time.sleep(self.LEASE_POLL)
+            token = self.acquire(phone)
+        try:
+            yield
+        finally:
+            self.release(phone, token)
+
+    @asynccontextmanager
+    async def leased_async(self, phone: str):
+        """leased() for the event loop: waits, and touches the store, off the loop."""
+        if not self.SHARED:
+            yield
+            return
+        token = await asyncio.to_thread(self.acquire, phone)
+        while token is None:
+            await asyncio.sleep(self.LEASE_POLL)
+            token = await asyncio.to_thread(self.acquire, phone)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self.release, phone, token)
+
+    def sweep(self) -> int:
+        """Drop expired sessions. Returns how many were removed."""
+        return 0
+
+    def _ensure_sweeper(self):
+        # Started lazily so it runs in the gunicorn worker, not the master
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = threading.Thread(target=self._sweep_loop,
+                                             name="session-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"🧹 Expired {removed} idle session(s)")
+            except Exception as e:
+                print(f"⚠️  Session sweep error: {e}")
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    SWEEP_CHUNK  = 1000   # expired sessions dropped per lock hold
+    STATS_SAMPLE = 200    # sessions measured for the bytes estimate
+
+    def __init__(self, ttl: float = 86400, max_sessions: int = 50000,
+                 sweep_interval: float = 60):
+        self.ttl            = ttl
+        self.max_sessions   = max(1, max_sessions)
+        self.sweep_interval = sweep_interval
+        # phone → (session, last touched); oldest touch first (LRU order)
+        self._sessions: OrderedDict[str, tuple[Session, float]] = OrderedDict()
+        self._lock    = threading.Lock()
+        self.expired  = 0
+        self.evicted  = 0
+
+    def load(self, phone: str) -> Session | None:
+        with self._lock:
+            item = self._sessions.get(phone)
+            if item is None:
+                return None
+            session, touched = item
+            if time.monotonic() - touched >= self.ttl:
+                del self._sessions[phone]
+                self.expired += 1
+                return None
+            return session
+
+    def save(self, phone: str, session: Session):
+        self._ensure_sweeper()
+        with self._lock:
+            self._sessions[phone] = (session, time.monotonic())
+            self._sessions.move_to_end(phone)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+
+    def delete(self, phone: str):
+        with self._lock:
+            self._sessions.pop(phone, None)
+
+    def sweep(self) -> int:
+        # LRU order means expired sessions sit at the front. Work in small
+        # chunks so request threads never wait on a long lock hold.
+        removed = 0
+        while True:
+            with self._lock:
+                cutoff = time.monotonic() - self.ttl
+                n = 0
+                while self._sessions and n < self.SWEEP_CHUNK:
+                    _, touched = next(iter(self._sessions.values()))
+                    if touched > cutoff:
+                        break
+                    self._sessions.popitem(last=False)
+                    n += 1
+                self.expired += n
+            removed += n
+            if n < self.SWEEP_CHUNK:
+                return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            count  = len(self._sessions)
+            sample = [s for s, _ in list(self._sessions.values())[-self.STATS_SAMPLE:]]
+        avg = sum(s.size_bytes() for s in sample) / len(sample) if sample else 0
+        return {
+            "sessions":       count,
+            "bytes_estimate": int(avg * count),
+            "expired":        self.expired,
+            "evicted":        self.evicted,
+        }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+SESSION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        phone       TEXT PRIMARY KEY,
+        data        TEXT NOT NULL,
+        updated_at  REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated_at);
+    CREATE TABLE IF NOT EXISTS session_leases (
+        phone       TEXT PRIMARY KEY,
+        token       TEXT NOT NULL,
+        expires_at  REAL NOT NULL
+    ) WITHOUT ROWID;
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    SHARED = True
+
+    def __init__(self, path: str = "sessions.db", ttl: float = 86400,
+                 sweep_interval: float = 60, lease: float = 60):
+        self.path           = path
+        self.ttl            = ttl
+        self.sweep_interval = sweep_interval
+        self.lease          = lease
+        self._db            = SQLiteDB(path, SESSION_SCHEMA, timeout=5)
+
+    def load(self, phone: str) -> Session | None:
+        row = self._db.conn().execute(
+            "SELECT data FROM sessions WHERE phone = ? AND updated_at >= ?",
+            (phone, time.time() - self.ttl),
+        ).fetchone()
+        return Session.from_dict(json.loads(row[0])) if row else None
+
+    def save(self, phone: str, session: Session):
+        self._ensure_sweeper()
+        self._db.conn().execute(
+            "INSERT OR REPLACE INTO sessions (phone, data, updated_at) VALUES (?, ?, ?)",
+            (phone, json.dumps(session.to_dict(), separators=(",", ":")), time.time()),
+        )
+
+    def delete(self, phone: str):
+        self._db.conn().execute("DELETE FROM sessions WHERE phone = ?", (phone,))
+
+    def acquire(self, phone: str) -> str | None:
+        # Taken if nobody holds it or the holder's lease ran out (worker died)
+        token, now = uuid.uuid4().hex, time.time()
+        cur = self._db.conn().execute(
+            "INSERT INTO session_leases (phone, token, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(phone) DO UPDATE SET token = excluded.token,"
+            " expires_at = excluded.expires_at WHERE session_leases.expires_at < ?",
+            (phone, token, now + self.lease, now),
+        )
+        return token if cur.rowcount else None
+
+    def release(self, phone: str, token: str):
+        self._db.conn().execute(
+            "DELETE FROM session_leases WHERE phone = ? AND token = ?", (phone, token),
+        )
+
+    def sweep(self) -> int:
+        db, now = self._db.conn(), time.time()
+        db.execute("DELETE FROM session_leases WHERE expires_at < ?", (now,))
+        cur = db.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        with self._db.shared() as db:
+            count, size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions"
+            ).fetchone()
+        return {"sessions": count, "bytes_estimate": size}
+
+    def __len__(self) -> int:
+        with self._db.shared() as db:
+            return db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def make_store() -> SessionStore:
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    ttl     = float(os.getenv("SESSION_TTL", 86400))
+    sweep   = float(os.getenv("SESSION_SWEEP_INTERVAL", 60))
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            os.getenv("SESSION_DB_PATH", "sessions.db"),
+            ttl            = ttl,
+            sweep_interval = sweep,
+            lease          = float(os.getenv("SESSION_LEASE", 60)),
+        )
+    if backend != "memory":
+        print(f"⚠️  Unknown SESSION_STORE '{backend}' — using memory")
+    return MemorySessionStore(
+        ttl            = ttl,
+        max_sessions   = int(os.getenv("SESSION_MAX", 50000)),
+        sweep_interval = sweep,
+    )
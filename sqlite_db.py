@@ -0,0 +1,71 @@
+"""
+sqlite_db.py — The SQLite connection handling every local store shares
+(sessions, outbox, lead spool, lead ledger, consultant counters, dedup ids,
+AI answer cache).
+
+    conn()    → this thread's connection. One per thread, so worker threads
+                never wait on each other's cursors; reopened after a
+                gunicorn fork (a connection must not cross a fork).
+    shared()  → one locked connection for occasional calls from any thread —
+                stats() read by /metrics, whose request threads come and go
+                and would otherwise each open (and set up) a connection.
+
+Every connection is in WAL mode (readers never block the writer) with
+autocommit (isolation_level=None): transactions are explicit BEGIN / COMMIT.
+The schema (and the optional migrate step for columns added since a file
+was created) runs once per process, not once per connection.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+
+class SQLiteDB:
+    def __init__(self, path: str, schema: str, synchronous: str = "NORMAL",
+                 timeout: float = 10, migrate: Callable | None = None):
+        """
+        schema: CREATE … IF NOT EXISTS statements (a script); synchronous:
+        NORMAL or FULL; migrate(db) upgrades a file made by an older version.
+        """
+        self.path        = path
+        self.schema      = schema
+        self.synchronous = synchronous
+        self.timeout     = timeout
+        self.migrate     = migrate
+
+        self._local       = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_pid  = None
+        self._shared_lock = threading.Lock()
+        self._shared      = None
+        self._shared_pid  = None
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, **kwargs)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(f"PRAGMA synchronous={self.synchronous}")
+        if self._schema_pid != os.getpid():
+            with self._schema_lock:
+                if self._schema_pid != os.getpid():
+                    db.executescript(self.schema)
+                    if self.migrate is not None:
+                        self.migrate(db)
+                    self._schema_pid = os.getpid()
+        return db
+
+    def conn(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.db, local.pid = self._connect(), os.getpid()
+        return local.db
+
+    @contextmanager
+    def shared(self):
+        with self._shared_lock:
+            if self._shared_pid != os.getpid():
+                self._shared = self._connect(check_same_thread=False)
+                self._shared_pid = os.getpid()
+            yield self._shared
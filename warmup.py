@@ -0,0 +1,138 @@
+"""
+warmup.py — Background warm-up after boot, reported by /ready
+On Render's free tier the instance sleeps when idle; the customer who wakes
+it should not also pay for importing the Google client libraries and opening
+TLS connections. A thread started at boot does that work while the server is
+already accepting requests:
+
+    graph_api → open keep-alive connections to the Graph API (first menu goes out on a warm connection)
+    gemini    → import gemini_ai (google-generativeai, client set-up)
+    sheets    → import sheets (gspread, google-auth)
+
+Nothing waits on it: a message arriving before its step finishes just does
+the same work itself (Python's import lock stops it happening twice).
+
+GET /healthz → 200 while the process is up (liveness)
+GET /ready   → 200 once every step has finished (or WARMUP_TIMEOUT passed),
+               503 before that; both list each step's state and duration
+
+Tuning (environment variables):
+    WARMUP_ENABLED      → "0" skips warm-up (steps show as skipped)  (default 1)
+    WARMUP_CONNECTIONS  → Graph API connections opened at boot       (default 2)
+    WARMUP_TIMEOUT      → Seconds after which /ready stops waiting   (default 30)
+"""
+
+import importlib
+import os
+import threading
+import time
+from typing import Awaitable, Callable
+
+
+class _Step:
+    __slots__ = ("fn", "state", "began", "seconds", "error")
+
+    def __init__(self, fn: Callable | None):
+        self.fn      = fn
+        self.state   = "pending"      # pending → running → done | failed | skipped
+        self.began   = 0.0
+        self.seconds = None
+        self.error   = None
+
+
+class Warmup:
+    def __init__(self, enabled: bool = True, timeout: float = 30):
+        self.enabled  = enabled
+        self.timeout  = timeout
+        self.started  = time.monotonic()
+        self._steps: dict[str, _Step] = {}
+        self._lock    = threading.Lock()
+        self._thread  = None
+
+    def add(self, name: str, fn: Callable | None = None):
+        """fn runs on the warm-up thread; fn=None → run later with run_async()."""
+        with self._lock:
+            self._steps[name] = _Step(fn)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            if not self.enabled:
+                for step in self._steps.values():
+                    step.state = "skipped"
+                return
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for name, step in list(self._steps.items()):
+            if step.fn is not None and step.state == "pending":
+                self._begin(step)
+                try:
+                    step.fn()
+                except Exception as e:       # a broken optional module must not stop the rest
+                    self._end(name, step, e)
+                else:
+                    self._end(name, step)
+
+    async def run_async(self, name: str, make: Callable[[], Awaitable]):
+        """Run a step on the event loop (asgi.py's async connection pool)."""
+        step = self._steps[name]
+        if not self.enabled:
+            step.state = "skipped"
+            return
+        self._begin(step)
+        try:
+            await make()
+        except Exception as e:
+            self._end(name, step, e)
+        else:
+            self._end(name, step)
+
+    def _begin(self, step: _Step):
+        step.state = "running"
+        step.began = time.monotonic()
+
+    def _end(self, name: str, step: _Step, error: Exception | None = None):
+        step.seconds = time.monotonic() - step.began
+        if error is None:
+            step.state = "done"
+            print(f"🔥 Warm-up: {name} ready in {1000 * step.seconds:.0f} ms")
+        else:
+            step.state = "failed"
+            step.error = str(error)
+            print(f"⚠️  Warm-up: {name} failed after {1000 * step.seconds:.0f} ms: {error}")
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            finished = all(s.state in ("done", "failed", "skipped")
+                           for s in self._steps.values())
+        return finished or time.monotonic() - self.started >= self.timeout
+
+    def stats(self) -> dict:
+        with self._lock:
+            steps = {
+                name: {"state": s.state,
+                       "ms": round(1000 * s.seconds) if s.seconds is not None else None,
+                       **({"error": s.error} if s.error else {})}
+                for name, s in self._steps.items()
+            }
+        return {
+            "ready":    self.ready,
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "steps":    steps,
+        }
+
+
+def import_module(name: str) -> Callable[[], None]:
+    """A step that imports `name` — the module does its own client set-up."""
+    return lambda: importlib.import_module(name)
+
+
+warmup = Warmup(
+    enabled = os.getenv("WARMUP_ENABLED", "1") != "0",
+    timeout = float(os.getenv("WARMUP_TIMEOUT", 30)),
+)
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", 2))
@@ -1,12 +1,36 @@
 """
 whatsapp.py — All WhatsApp Cloud API message senders
 Handles: text, buttons (up to 3), list menus (up to 10 options)
+
+All sends share ONE pooled, keep-alive HTTP session, so consecutive messages
+reuse the same TLS connection to graph.facebook.com.
+
+Tuning (environment variables):
+    WHATSAPP_POOL_SIZE       → Keep-alive connections  (default DISPATCH_WORKERS)
+    WHATSAPP_CONNECT_TIMEOUT → Seconds to connect      (default 3)
+    WHATSAPP_READ_TIMEOUT    → Seconds to wait a reply (default 10)
+    WHATSAPP_API_URL         → Graph API base URL      (default https://graph.facebook.com/v19.0;
+                               point at benchmarks/fake_graph.py for load tests)
+
+Inside `with capture() as sends:` nothing is sent — every send_* call just
+appends its payload. The async engine (whatsapp_async.py) sends them instead.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 
-API_URL = "https://graph.facebook.com/v19.0"
+from outbound import OutboundScheduler, INTERACTIVE
+from outbox import Outbox
+from payload_templates import PayloadTemplate, message_kind, slot
+from metrics import SENT, stage
+from delivery import delivery
+
+API_URL = os.getenv("WHATSAPP_API_URL", "https://graph.facebook.com/v19.0")
 PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
 ACCESS_TOKEN    = os.getenv("WHATSAPP_ACCESS_TOKEN")
 
@@ -15,31 +39,233 @@ HEADERS = {
     "Content-Type":  "application/json",
 }
 
+POOL_SIZE = int(os.getenv("WHATSAPP_POOL_SIZE", os.getenv("DISPATCH_WORKERS", 8)))
+TIMEOUT   = (
+    float(os.getenv("WHATSAPP_CONNECT_TIMEOUT", 3)),
+    float(os.getenv("WHATSAPP_READ_TIMEOUT", 10)),
+)
+
+
+# ── Shared HTTP session (thread-safe connection pool) ───────────────────────
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    # One host, so a single pool sized to the number of worker threads;
+    # block=True makes extra threads wait for a free connection, not open more.
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)      # local fake Graph API in tests
+    session.headers.update(HEADERS)
+    return session
+
+
+http = _make_session()
+
+
+def warm_connections(n: int = 2) -> int:
+    """
+    Open n keep-alive connections before the first customer needs one
+    (warm-up at boot). A cheap authenticated GET on our phone number id —
+    it also shows straight away whether the token is accepted.
+    Returns how many requests got an answer.
+    """
+    url = f"{API_URL}/{PHONE_NUMBER_ID}"
+    answered = []
+
+    def one():
+        try:
+            # Body read in full (no stream=True) → the connection goes back to the pool
+            answered.append(http.get(url, timeout=TIMEOUT).status_code)
+        except requests.RequestException as e:
+            print(f"⚠️  Graph API warm-up failed: {e}")
+
+    # Concurrently, or the pool would hand the same connection back each time
+    threads = [threading.Thread(target=one) for _ in range(max(1, min(n, POOL_SIZE)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if 401 in answered:
+        print("❌ Graph API rejected WHATSAPP_ACCESS_TOKEN (401)")
+    return len(answered)
+
+
+# ── Per-call stats ───────────────────────────────────────────────────────────
+_stats_lock = threading.Lock()
+_stats = {
+    "calls":         0,
+    "errors":        0,      # non-200 responses + network failures
+    "latency_total": 0.0,    # seconds
+    "latency_max":   0.0,
+    "status":        {},     # {200: n, 400: n, ..., "timeout": n}
+}
+
+
+def _record(status, latency: float):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["errors"] += status != 200
+        _stats["latency_total"] += latency
+        _stats["latency_max"] = max(_stats["latency_max"], latency)
+        _stats["status"][status] = _stats["status"].get(status, 0) + 1
+
+
+def http_stats() -> dict:
+    with _stats_lock:
+        calls = _stats["calls"]
+        return {
+            "calls":          calls,
+            "errors":         _stats["errors"],
+            "latency_avg_ms": round(1000 * _stats["latency_total"] / calls, 2) if calls else 0.0,
+            "latency_max_ms": round(1000 * _stats["latency_max"], 2),
+            "status":         dict(_stats["status"]),
+        }
+
 
-def _post(payload: dict):
-    url = f"{API_URL}/{PHONE_NUMBER_ID}/messages"
-    r   = requests.post(url, json=payload, headers=HEADERS)
+def _send_now(phone_number_id: str, payload) -> tuple:
+    """One HTTP call to the Graph API. Returns (status, body).
+    payload is a dict, or an already-encoded JSON str/bytes."""
+    url   = f"{API_URL}/{phone_number_id}/messages"
+    if isinstance(payload, str):
+        payload = payload.encode()
+    start = time.perf_counter()
+    try:
+        with stage("graph_send"):
+            if isinstance(payload, bytes):
+                r = http.post(url, data=payload, timeout=TIMEOUT)
+            else:
+                r = http.post(url, json=payload, timeout=TIMEOUT)
+    except requests.Timeout:
+        _record("timeout", time.perf_counter() - start)
+        print("❌ WhatsApp API timeout")
+        return "timeout", {"error": {"message": "timeout"}}
+    except requests.RequestException as e:
+        _record("network", time.perf_counter() - start)
+        print(f"❌ WhatsApp API network error: {e}")
+        return "network", {"error": {"message": str(e)}}
+
+    _record(r.status_code, time.perf_counter() - start)
     if r.status_code != 200:
         print(f"❌ WhatsApp API error: {r.text}")
-    return r.json()
+    try:
+        return r.status_code, r.json()
+    except ValueError:
+        return r.status_code, {"error": {"message": r.text}}
+
+
+# ── Outbound scheduler (rate limit + priority) — see outbound.py ────────────
+_rate = float(os.getenv("OUTBOUND_RATE", 80))
+scheduler = OutboundScheduler(
+    send        = _send_now,
+    rate        = _rate,
+    burst       = int(os.getenv("OUTBOUND_BURST", 20)),
+    senders     = int(os.getenv("OUTBOUND_SENDERS", POOL_SIZE)),
+    max_retries = int(os.getenv("OUTBOUND_MAX_RETRIES", 5)),
+) if _rate > 0 else None
+
+
+def _deliver(payload, priority: int = INTERACTIVE) -> tuple:
+    """Send now (through the scheduler if enabled). Returns (status, body)."""
+    if scheduler is None:
+        return _send_now(PHONE_NUMBER_ID, payload)
+    return scheduler.submit(PHONE_NUMBER_ID, payload, priority)
+
+
+def _message_id(body) -> str | None:
+    # {"messages": [{"id": "wamid..."}]} on success
+    try:
+        return body["messages"][0]["id"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _deliver_durable(payload, priority: int = INTERACTIVE, kind: str = "other") -> tuple:
+    status, body = _deliver(payload, priority)
+    delivery.sent(_message_id(body), kind)
+    return status, body
+
+
+# ── Durable outbox for sends that must not be lost — see outbox.py ──────────
+_outbox_path = os.getenv("OUTBOX_DB_PATH", "outbox.db")
+outbox = Outbox(
+    path         = _outbox_path,
+    deliver      = _deliver_durable,
+    workers      = int(os.getenv("OUTBOX_WORKERS", 1)),
+    batch        = int(os.getenv("OUTBOX_BATCH", 20)),
+    max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6)),
+    lease        = float(os.getenv("OUTBOX_LEASE", 120)),
+    keep_sent    = float(os.getenv("OUTBOX_KEEP_SENT", 604800)),
+) if _outbox_path else None
+
+
+# ── Capture instead of send (async mode) ────────────────────────────────────
+# Context-local: other threads and tasks keep sending as usual.
+_captured: ContextVar[list | None] = ContextVar("whatsapp_captured", default=None)
+
+
+@contextmanager
+def capture():
+    """Collect (payload, priority, durable, kind) for every send in the block."""
+    sends = []
+    token = _captured.set(sends)
+    try:
+        yield sends
+    finally:
+        _captured.reset(token)
+
+
+def captured() -> list | None:
+    """The list sends are being captured into, or None when sending for real."""
+    return _captured.get()
+
+
+def _kind(payload, kind: str | None) -> str:
+    return kind or (message_kind(payload) if isinstance(payload, dict) else "other")
+
+
+def _post(payload: dict | bytes, priority: int = INTERACTIVE, durable: bool = False,
+          kind: str | None = None):
+    """
+    durable=True → write to the outbox and return at once; a background
+    worker delivers it with retries. Returns {"outbox_id": n} in that case.
+    kind labels the message in metrics (taken from a dict payload if not given).
+    """
+    sends = _captured.get()
+    if sends is not None:
+        sends.append((payload, priority, durable, kind))
+        return None
+    if durable and outbox is not None:
+        kind = _kind(payload, kind)
+        SENT.inc(kind)
+        return {"outbox_id": outbox.enqueue(payload, priority, kind)}
+    return send_payload(payload, priority, kind)[1]
+
+
+def send_payload(payload: dict | bytes, priority: int = INTERACTIVE,
+                 kind: str | None = None) -> tuple:
+    """Send one payload and return (status, body) — for callers that need the outcome (campaign.py)."""
+    kind = _kind(payload, kind)
+    SENT.inc(kind)
+    with stage("send"):      # scheduler queue + HTTP call
+        status, body = _deliver(payload, priority)
+    # wamid → type, so Meta's delivered/read statuses can be timed (delivery.py)
+    delivery.sent(_message_id(body), kind)
+    return status, body
 
 
 # ── 1. Plain text message ───────────────────────────────────────────────────
-def send_text(to: str, body: str):
+def send_text(to: str, body: str, priority: int = INTERACTIVE, durable: bool = False,
+              kind: str = "text"):
     return _post({
         "messaging_product": "whatsapp",
         "to": to,
         "type": "text",
         "text": {"preview_url": False, "body": body},
-    })
+    }, priority, durable, kind)
 
 
 # ── 2. Button message (max 3 buttons) ──────────────────────────────────────
-def send_buttons(to: str, body: str, buttons: list[dict]):
-    """
-    buttons = [{"id": "btn_id", "title": "Label"}, ...]  — max 3
-    """
-    return _post({
+def _buttons_payload(to: str, body: str, buttons: list[dict]) -> dict:
+    return {
         "messaging_product": "whatsapp",
         "to": to,
         "type": "interactive",
@@ -53,20 +279,19 @@ def send_buttons(to: str, body: str, buttons: list[dict]):
                 ]
             },
         },
-    })
+    }
 
 
-# ── 3. List message (max 10 rows) ───────────────────────────────────────────
-def send_list(to: str, body: str, button_label: str, sections: list[dict]):
+def send_buttons(to: str, body: str, buttons: list[dict], priority: int = INTERACTIVE):
     """
-    sections = [
-        {
-            "title": "Section Title",
-            "rows": [{"id": "row_id", "title": "Row Label", "description": "Optional"}, ...]
-        }
-    ]
+    buttons = [{"id": "btn_id", "title": "Label"}, ...]  — max 3
     """
-    return _post({
+    return _post(_buttons_payload(to, body, buttons), priority)
+
+
+# ── 3. List message (max 10 rows) ───────────────────────────────────────────
+def _list_payload(to: str, body: str, button_label: str, sections: list[dict]) -> dict:
+    return {
         "messaging_product": "whatsapp",
         "to": to,
         "type": "interactive",
@@ -78,103 +303,136 @@ def send_list(to: str, body: str, button_label: str, sections: list[dict]):
                 "sections": sections,
             },
         },
-    })
+    }
+
+
+def send_list(to: str, body: str, button_label: str, sections: list[dict],
+              priority: int = INTERACTIVE):
+    """
+    sections = [
+        {
+            "title": "Section Title",
+            "rows": [{"id": "row_id", "title": "Row Label", "description": "Optional"}, ...]
+        }
+    ]
+    """
+    return _post(_list_payload(to, body, button_label, sections), priority)
+
+
+# ── Static menus — encoded once at import, see payload_templates.py ─────────
+MAIN_MENU = PayloadTemplate(_list_payload(
+    to   = slot("to"),
+    body = (
+        f"Hello {slot('name')}! 👋 Welcome to *Xtenda Finance*.\n\n"
+        "We offer fast, affordable loans in Zambia 🇿🇲\n"
+        "How can we help you today?"
+    ),
+    button_label = "Choose an Option",
+    sections = [{
+        "title": "Main Menu",
+        "rows": [
+            {"id": "menu_products",    "title": "💰 Our Loan Products",   "description": "View all loan types & rates"},
+            {"id": "menu_eligibility", "title": "✅ Check Eligibility",   "description": "See if you qualify"},
+            {"id": "menu_apply",       "title": "📋 Apply / Get a Quote", "description": "Start your loan application"},
+            {"id": "menu_callback",    "title": "📞 Book a Callback",     "description": "Speak to our sales team"},
+            {"id": "menu_consultant",  "title": "📍 Find a Consultant",   "description": "Your nearest branch & consultant"},
+            {"id": "menu_ai",          "title": "❓ Ask a Question",      "description": "Ask us anything"},
+        ],
+    }],
+))
+
+PRODUCT_MENU = PayloadTemplate(_list_payload(
+    to   = slot("to"),
+    body = "We have 4 loan products 👇\nSelect one to see details:",
+    button_label = "View Product",
+    sections = [{
+        "title": "Loan Products",
+        "rows": [
+            {"id": "prod_personal",  "title": "💳 Personal Loan",       "description": "ZMW 1,000 – 50,000 | 3–24 months"},
+            {"id": "prod_business",  "title": "🏢 Business Loan",       "description": "ZMW 5,000 – 500,000 | 6–36 months"},
+            {"id": "prod_salary",    "title": "💼 Salary-Backed Loan",  "description": "Up to 3× net salary | Fastest approval"},
+            {"id": "prod_asset",     "title": "🚗 Asset Finance",       "description": "Vehicles & equipment | Up to 60 months"},
+            {"id": "menu_main",      "title": "🔙 Back to Main Menu",   "description": ""},
+        ],
+    }],
+))
+
+LOAN_TYPE_MENU = PayloadTemplate(_list_payload(
+    to   = slot("to"),
+    body = "Great! Let's get you started 🚀\n\nWhich type of loan are you applying for?",
+    button_label = "Select Loan Type",
+    sections = [{
+        "title": "Loan Type",
+        "rows": [
+            {"id": "apply_personal",  "title": "💳 Personal Loan"},
+            {"id": "apply_business",  "title": "🏢 Business Loan"},
+            {"id": "apply_salary",    "title": "💼 Salary-Backed Loan"},
+            {"id": "apply_asset",     "title": "🚗 Asset Finance"},
+        ],
+    }],
+))
+
+EMPLOYMENT_BUTTONS = PayloadTemplate(_buttons_payload(
+    to      = slot("to"),
+    body    = "What is your employment status?",
+    buttons = [
+        {"id": "emp_employed",   "title": "🏦 Employed"},
+        {"id": "emp_selfemployed","title": "🏪 Self-Employed"},
+        {"id": "emp_civil",      "title": "🏛️ Civil Servant"},
+    ],
+))
+
+CALLBACK_TIME_BUTTONS = PayloadTemplate(_buttons_payload(
+    to      = slot("to"),
+    body    = "When would you prefer our team to call you?",
+    buttons = [
+        {"id": "time_morning",   "title": "🌅 Morning (8–12)"},
+        {"id": "time_afternoon", "title": "☀️ Afternoon (12–17)"},
+        {"id": "time_evening",   "title": "🌆 Evening (17–19)"},
+    ],
+))
+
+BACK_PROMPT_BUTTONS = PayloadTemplate(_buttons_payload(
+    to      = slot("to"),
+    body    = "What would you like to do next?",
+    buttons = [
+        {"id": "menu_apply",    "title": "📋 Apply Now"},
+        {"id": "menu_callback", "title": "📞 Book Callback"},
+        {"id": "menu_main",     "title": "🔙 Main Menu"},
+    ],
+))
 
 
 # ── Helper: Main Menu ────────────────────────────────────────────────────────
 def send_main_menu(to: str, name: str):
-    send_list(
-        to   = to,
-        body = (
-            f"Hello {name}! 👋 Welcome to *Xtenda Finance*.\n\n"
-            "We offer fast, affordable loans in Zambia 🇿🇲\n"
-            "How can we help you today?"
-        ),
-        button_label = "Choose an Option",
-        sections = [{
-            "title": "Main Menu",
-            "rows": [
-                {"id": "menu_products",    "title": "💰 Our Loan Products",   "description": "View all loan types & rates"},
-                {"id": "menu_eligibility", "title": "✅ Check Eligibility",   "description": "See if you qualify"},
-                {"id": "menu_apply",       "title": "📋 Apply / Get a Quote", "description": "Start your loan application"},
-                {"id": "menu_callback",    "title": "📞 Book a Callback",     "description": "Speak to our sales team"},
-                {"id": "menu_ai",          "title": "❓ Ask a Question",      "description": "Ask us anything"},
-            ],
-        }],
-    )
+    _post(MAIN_MENU.render(to=to, name=name), kind=MAIN_MENU.kind)
 
 
 # ── Helper: Loan Product Menu ────────────────────────────────────────────────
 def send_product_menu(to: str):
-    send_list(
-        to   = to,
-        body = "We have 4 loan products 👇\nSelect one to see details:",
-        button_label = "View Product",
-        sections = [{
-            "title": "Loan Products",
-            "rows": [
-                {"id": "prod_personal",  "title": "💳 Personal Loan",       "description": "ZMW 1,000 – 50,000 | 3–24 months"},
-                {"id": "prod_business",  "title": "🏢 Business Loan",       "description": "ZMW 5,000 – 500,000 | 6–36 months"},
-                {"id": "prod_salary",    "title": "💼 Salary-Backed Loan",  "description": "Up to 3× net salary | Fastest approval"},
-                {"id": "prod_asset",     "title": "🚗 Asset Finance",       "description": "Vehicles & equipment | Up to 60 months"},
-                {"id": "menu_main",      "title": "🔙 Back to Main Menu",   "description": ""},
-            ],
-        }],
-    )
+    _post(PRODUCT_MENU.render(to=to), kind=PRODUCT_MENU.kind)
 
 
 # ── Helper: Apply — Loan Type Selection ──────────────────────────────────────
 def send_loan_type_selection(to: str):
-    send_list(
-        to   = to,
-        body = "Great! Let's get you started 🚀\n\nWhich type of loan are you applying for?",
-        button_label = "Select Loan Type",
-        sections = [{
-            "title": "Loan Type",
-            "rows": [
-                {"id": "apply_personal",  "title": "💳 Personal Loan"},
-                {"id": "apply_business",  "title": "🏢 Business Loan"},
-                {"id": "apply_salary",    "title": "💼 Salary-Backed Loan"},
-                {"id": "apply_asset",     "title": "🚗 Asset Finance"},
-            ],
-        }],
-    )
+    _post(LOAN_TYPE_MENU.render(to=to), kind=LOAN_TYPE_MENU.kind)
 
 
 # ── Helper: Employment Status ─────────────────────────────────────────────────
 def send_employment_status(to: str):
-    send_buttons(
-        to      = to,
-        body    = "What is your employment status?",
-        buttons = [
-            {"id": "emp_employed",   "title": "🏦 Employed"},
-            {"id": "emp_selfemployed","title": "🏪 Self-Employed"},
-            {"id": "emp_civil",      "title": "🏛️ Civil Servant"},
-        ],
-    )
+    _post(EMPLOYMENT_BUTTONS.render(to=to), kind=EMPLOYMENT_BUTTONS.kind)
 
 
 # ── Helper: Callback Time ─────────────────────────────────────────────────────
 def send_callback_time(to: str):
-    send_buttons(
-        to      = to,
-        body    = "When would you prefer our team to call you?",
-        buttons = [
-            {"id": "time_morning",   "title": "🌅 Morning (8–12)"},
-            {"id": "time_afternoon", "title": "☀️ Afternoon (12–17)"},
-            {"id": "time_evening",   "title": "🌆 Evening (17–19)"},
-        ],
-    )
+    _post(CALLBACK_TIME_BUTTONS.render(to=to), kind=CALLBACK_TIME_BUTTONS.kind)
 
 
 # ── Helper: Back to menu prompt ───────────────────────────────────────────────
 def send_back_prompt(to: str):
-    send_buttons(
-        to      = to,
-        body    = "What would you like to do next?",
-        buttons = [
-            {"id": "menu_apply",    "title": "📋 Apply Now"},
-            {"id": "menu_callback", "title": "📞 Book Callback"},
-            {"id": "menu_main",     "title": "🔙 Main Menu"},
-        ],
-    )
+    _post(BACK_PROMPT_BUTTONS.render(to=to), kind=BACK_PROMPT_BUTTONS.kind)
+
+
+# ── Helper: any pre-built template (e.g. consultant picker pages) ────────────
+def send_template(to: str, template: PayloadTemplate, **values):
+    _post(template.render(to=to, **values), kind=template.kind)
@@ -0,0 +1,166 @@
+"""
+whatsapp_async.py — The WhatsApp senders on an event loop (asgi.py)
+Payloads still come from whatsapp.py: each send_* here runs the sync helper
+under whatsapp.capture(), so menus, templates and message kinds are defined
+once. Only the network I/O is different:
+
+    • ONE pooled httpx.AsyncClient — thousands of sends can wait on the
+      Graph API at once without a thread each
+    • the same rate limit, priorities and 429 back-off (AsyncOutboundScheduler)
+    • durable sends still go to the outbox (local SQLite, own worker thread)
+    • the same http_stats, SENT counter, stages and delivery tracking
+
+httpx is imported on first use — sync deployments never load it.
+
+Tuning (environment variables):
+    ASYNC_POOL_SIZE → Keep-alive connections to the Graph API  (default 100)
+    WHATSAPP_* timeouts, WHATSAPP_API_URL and OUTBOUND_* apply as in whatsapp.py
+"""
+
+import asyncio
+import functools
+import os
+import time
+
+import whatsapp
+from whatsapp import (
+    API_URL, HEADERS, PHONE_NUMBER_ID, TIMEOUT,
+    _kind, _message_id, _rate, _record, capture, outbox,
+)
+from outbound import AsyncOutboundScheduler, INTERACTIVE
+from metrics import SENT, stage
+from delivery import delivery
+
+POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", 100))
+
+_client = None
+
+
+def _get_client():
+    # Created on the running loop the first time something is sent
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.AsyncClient(
+            headers = HEADERS,
+            limits  = httpx.Limits(max_connections=POOL_SIZE,
+                                   max_keepalive_connections=POOL_SIZE),
+            # pool=None → wait for a free connection rather than fail
+            timeout = httpx.Timeout(TIMEOUT[1], connect=TIMEOUT[0], pool=None),
+        )
+    return _client
+
+
+async def aclose():
+    """Close the connection pool (ASGI shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def warm_connections(n: int = 2) -> int:
+    """whatsapp.warm_connections for the async pool (run from asgi.py's startup)."""
+    import httpx
+    url = f"{API_URL}/{PHONE_NUMBER_ID}"
+    results = await asyncio.gather(*(_get_client().get(url)
+                                     for _ in range(max(1, min(n, POOL_SIZE)))),
+                                   return_exceptions=True)
+    answered = [r.status_code for r in results if isinstance(r, httpx.Response)]
+    for e in results:
+        if isinstance(e, Exception):
+            print(f"⚠️  Graph API warm-up failed: {e}")
+    if 401 in answered:
+        print("❌ Graph API rejected WHATSAPP_ACCESS_TOKEN (401)")
+    return len(answered)
+
+
+async def _send_now(phone_number_id: str, payload) -> tuple:
+    """One HTTP call to the Graph API. Returns (status, body), like whatsapp._send_now."""
+    import httpx
+    url = f"{API_URL}/{phone_number_id}/messages"
+    if isinstance(payload, str):
+        payload = payload.encode()
+    start = time.perf_counter()
+    try:
+        with stage("graph_send"):
+            if isinstance(payload, bytes):
+                r = await _get_client().post(url, content=payload)
+            else:
+                r = await _get_client().post(url, json=payload)
+    except httpx.TimeoutException:
+        _record("timeout", time.perf_counter() - start)
+        print("❌ WhatsApp API timeout")
+        return "timeout", {"error": {"message": "timeout"}}
+    except httpx.HTTPError as e:
+        _record("network", time.perf_counter() - start)
+        print(f"❌ WhatsApp API network error: {e}")
+        return "network", {"error": {"message": str(e)}}
+
+    _record(r.status_code, time.perf_counter() - start)
+    if r.status_code != 200:
+        print(f"❌ WhatsApp API error: {r.text}")
+    try:
+        return r.status_code, r.json()
+    except ValueError:
+        return r.status_code, {"error": {"message": r.text}}
+
+
+# ── Outbound scheduler (same settings as whatsapp.scheduler) ────────────────
+scheduler = AsyncOutboundScheduler(
+    send        = _send_now,
+    rate        = _rate,
+    burst       = int(os.getenv("OUTBOUND_BURST", 20)),
+    senders     = int(os.getenv("OUTBOUND_SENDERS", POOL_SIZE)),
+    max_retries = int(os.getenv("OUTBOUND_MAX_RETRIES", 5)),
+) if _rate > 0 else None
+
+
+async def _deliver(payload, priority: int = INTERACTIVE) -> tuple:
+    if scheduler is None:
+        return await _send_now(PHONE_NUMBER_ID, payload)
+    return await scheduler.submit(PHONE_NUMBER_ID, payload, priority)
+
+
+async def post(payload: dict | bytes, priority: int = INTERACTIVE, durable: bool = False,
+               kind: str | None = None):
+    """whatsapp._post, awaited. Takes exactly what capture() collects."""
+    kind = _kind(payload, kind)
+    SENT.inc(kind)
+    if durable and outbox is not None:
+        # An fsynced SQLite INSERT — kept off the event loop
+        return {"outbox_id": await asyncio.to_thread(outbox.enqueue, payload, priority, kind)}
+    with stage("send"):
+        body = (await _deliver(payload, priority))[1]
+    delivery.sent(_message_id(body), kind)
+    return body
+
+
+async def post_all(sends: list[tuple]):
+    """Send captured messages in order. Returns the last response body."""
+    body = None
+    for send in sends:
+        body = await post(*send)
+    return body
+
+
+def _async(send):
+    @functools.wraps(send)
+    async def send_async(*args, **kwargs):
+        with capture() as sends:
+            send(*args, **kwargs)
+        return await post_all(sends)
+    return send_async
+
+
+# ── Every sender from whatsapp.py, awaitable ────────────────────────────────
+send_text                = _async(whatsapp.send_text)
+send_buttons             = _async(whatsapp.send_buttons)
+send_list                = _async(whatsapp.send_list)
+send_main_menu           = _async(whatsapp.send_main_menu)
+send_product_menu        = _async(whatsapp.send_product_menu)
+send_loan_type_selection = _async(whatsapp.send_loan_type_selection)
+send_employment_status   = _async(whatsapp.send_employment_status)
+send_callback_time       = _async(whatsapp.send_callback_time)
+send_back_prompt         = _async(whatsapp.send_back_prompt)
+send_template            = _async(whatsapp.send_template)